@@ -0,0 +1,115 @@
+import math
+import statistics
+
+# Valores críticos t de Student (dos colas, 95%) por grados de libertad
+_T_95 = {
+    1: 12.706,
+    2: 4.303,
+    3: 3.182,
+    4: 2.776,
+    5: 2.571,
+    6: 2.447,
+    7: 2.365,
+    8: 2.306,
+    9: 2.262,
+    10: 2.228,
+    11: 2.201,
+    12: 2.179,
+    13: 2.160,
+    14: 2.145,
+    15: 2.131,
+    16: 2.120,
+    17: 2.110,
+    18: 2.101,
+    19: 2.093,
+    20: 2.086,
+    21: 2.080,
+    22: 2.074,
+    23: 2.069,
+    24: 2.064,
+    25: 2.060,
+    26: 2.056,
+    27: 2.052,
+    28: 2.048,
+    29: 2.045,
+    30: 2.042,
+    40: 2.021,
+    60: 2.000,
+    120: 1.980,
+}
+
+
+def t_critical(df):
+    """Valor crítico t al 95% para df grados de libertad"""
+    for limit in sorted(_T_95):
+        if df <= limit:
+            return _T_95[limit]
+    return 1.960
+
+
+def percentile(sorted_values, q):
+    """Percentil q (0-100) con interpolación lineal sobre valores ordenados"""
+    if not sorted_values:
+        return float("nan")
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return sorted_values[lower]
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def summarize(samples_ns):
+    """Resumen estadístico de una lista de tiempos en nanosegundos, en milisegundos"""
+    values = sorted(sample / 1e6 for sample in samples_ns)
+    n = len(values)
+    mean = statistics.fmean(values)
+    stddev = statistics.stdev(values) if n > 1 else 0.0
+    margin = t_critical(n - 1) * stddev / math.sqrt(n) if n > 1 else 0.0
+    return {
+        "n": n,
+        "min_ms": values[0],
+        "max_ms": values[-1],
+        "media_ms": mean,
+        "mediana_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "desviacion_ms": stddev,
+        "ic95_inferior_ms": mean - margin,
+        "ic95_superior_ms": mean + margin,
+    }
+
+
+# Límites superiores (ms) de los buckets de los histogramas de latencia
+HISTOGRAM_EDGES_MS = [
+    0.1,
+    0.2,
+    0.5,
+    1,
+    2,
+    5,
+    10,
+    20,
+    50,
+    100,
+    200,
+    500,
+    1000,
+    2000,
+    5000,
+]
+
+
+def histogram(values_ms, edges=HISTOGRAM_EDGES_MS):
+    """Contar latencias por bucket; la clave es el límite superior ("inf" al final)"""
+    counts = {str(edge): 0 for edge in edges}
+    counts["inf"] = 0
+    for value in values_ms:
+        for edge in edges:
+            if value <= edge:
+                counts[str(edge)] += 1
+                break
+        else:
+            counts["inf"] += 1
+    return counts
@@ -0,0 +1,231 @@
+import http.client
+import os
+import random
+import socket
+import subprocess
+import time
+
+import psycopg2
+
+from db import DB_SETTINGS
+from load_generator import execute_operation
+from load_report import flush_stats
+
+# Estado de la caché antes de medir cada consulta:
+#   none:   el que haya (por ejemplo, todo en memoria justo después de poblar)
+#   cold:   PostgreSQL reiniciado y caché del sistema operativo vaciada antes de cada repetición
+#   warm:   todas las tablas e índices cargados en shared buffers con pg_prewarm
+#   steady: caché moldeada por la mezcla de operaciones (working set), sin calentar la consulta
+CACHE_MODES = ("none", "cold", "warm", "steady")
+
+# Socket de Docker (montado en el contenedor de benchmark para el modo cold)
+DOCKER_SOCKET = "/var/run/docker.sock"
+
+# Bloques de tablas, índices y TOAST servidos desde shared buffers (hit) o pedidos
+# al sistema operativo (read), y tiempo de lectura de la base (track_io_timing)
+BUFFERS_SQL = """
+SELECT COALESCE(SUM(heap_blks_hit + COALESCE(idx_blks_hit, 0)
+                    + COALESCE(toast_blks_hit, 0) + COALESCE(tidx_blks_hit, 0)), 0),
+       COALESCE(SUM(heap_blks_read + COALESCE(idx_blks_read, 0)
+                    + COALESCE(toast_blks_read, 0) + COALESCE(tidx_blks_read, 0)), 0),
+       (SELECT blk_read_time FROM pg_stat_database WHERE datname = current_database())
+FROM pg_statio_user_tables
+"""
+
+# Tablas, índices y vistas materializadas del schema (las tablas e índices
+# particionados no tienen almacenamiento propio: se cargan sus particiones)
+PREWARM_SQL = """
+SELECT COUNT(*), COALESCE(SUM(pg_prewarm(c.oid)), 0)
+FROM pg_class c
+WHERE c.relnamespace = 'public'::regnamespace AND c.relkind IN ('r', 'i', 'm')
+"""
+
+
+class BufferAccounting:
+    """Bloques leídos de shared buffers y del sistema operativo por ejecución
+
+    Los contadores de pg_statio_user_tables y pg_stat_database se leen antes y
+    después de cada repetición. Requiere PostgreSQL 15 o superior: cada sesión
+    publica sus estadísticas como mucho una vez por segundo y after_query()
+    fuerza la publicación en la conexión que ejecutó la consulta. El tiempo de I/O se
+    mide con track_io_timing activado solo en la transacción medida (requiere
+    superusuario). Los contadores son globales: otra sesión activa en la base
+    se suma a la consulta.
+    """
+
+    def __init__(self, conn):
+        self.io_timing = True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL track_io_timing = on")
+        except psycopg2.Error:
+            self.io_timing = False
+        conn.rollback()
+
+    def before_query(self, cursor):
+        """Activar track_io_timing en la transacción de la consulta"""
+        if self.io_timing:
+            cursor.execute("SET LOCAL track_io_timing = on")
+
+    def after_query(self, conn):
+        """Publicar las estadísticas pendientes de la sesión (conexión de la consulta)"""
+        with conn.cursor() as cursor:
+            flush_stats(cursor)
+        conn.rollback()
+
+    def snapshot(self, conn):
+        """(bloques hit, bloques read, ms de lectura) acumulados en el servidor"""
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_stat_clear_snapshot()")
+            cursor.execute(BUFFERS_SQL)
+            hit, read, read_ms = cursor.fetchone()
+        conn.rollback()
+        return int(hit), int(read), float(read_ms or 0.0)
+
+
+def _docker_restart(container, timeout=10):
+    """Reiniciar un contenedor con la API de Docker a través de su socket"""
+
+    class DockerConnection(http.client.HTTPConnection):
+        def connect(self):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(DOCKER_SOCKET)
+
+    connection = DockerConnection("localhost", timeout=timeout + 30)
+    try:
+        connection.request("POST", f"/containers/{container}/restart?t={timeout}")
+        response = connection.getresponse()
+        if response.status != 204:
+            raise RuntimeError(
+                f"Docker no reinició {container}: {response.status} {response.read().decode()}"
+            )
+    finally:
+        connection.close()
+
+
+def drop_os_cache():
+    """Vaciar la caché de páginas del sistema operativo; None si se pudo, si no el motivo
+
+    Requiere escribir en /proc/sys/vm/drop_caches (root fuera de un
+    contenedor, o un contenedor privilegiado: la caché es la del host).
+    """
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return None
+    except OSError as e:
+        return e.strerror or str(e)
+
+
+def wait_until_ready(timeout=120):
+    """Esperar, sin imprimir, a que PostgreSQL acepte conexiones después de reiniciarlo"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            psycopg2.connect(**DB_SETTINGS).close()
+            return
+        except psycopg2.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+class ColdCache:
+    """Reinicia PostgreSQL (shared buffers vacíos) y vacía la caché del sistema operativo
+
+    El reinicio se hace con un comando de shell (restart_command) o, desde
+    el contenedor de benchmark, reiniciando el contenedor de PostgreSQL por el
+    socket de Docker (restart_container). Las conexiones existentes se pierden.
+    """
+
+    def __init__(self, restart_command=None, restart_container=None):
+        self.restart_command = restart_command
+        self.restart_container = restart_container
+        self.resets = 0
+        self.os_cache_error = None
+
+    def reset(self):
+        if self.restart_command:
+            subprocess.run(self.restart_command, shell=True, check=True)
+        else:
+            _docker_restart(self.restart_container)
+        self.os_cache_error = drop_os_cache()
+        wait_until_ready()
+        self.resets += 1
+
+    def describe(self):
+        return {
+            "reinicio": self.restart_command
+            or f"contenedor {self.restart_container} (Docker)",
+            "reinicios": self.resets,
+            "cache_so_vaciada": self.os_cache_error is None,
+            "cache_so_error": self.os_cache_error,
+        }
+
+
+def prewarm(conn):
+    """Cargar tablas e índices en shared buffers con pg_prewarm
+
+    Devuelve (relaciones, bloques cargados, bloques de shared_buffers) o None
+    si la extensión no está disponible. Si los datos no caben en
+    shared_buffers, los últimos bloques cargados desplazan a los primeros.
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_prewarm")
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        return None
+    with conn.cursor() as cursor:
+        cursor.execute(PREWARM_SQL)
+        relations, blocks = cursor.fetchone()
+        cursor.execute(
+            "SELECT setting::BIGINT FROM pg_settings WHERE name = 'shared_buffers'"
+        )
+        shared_buffers = cursor.fetchone()[0]
+    conn.rollback()
+    return relations, int(blocks), shared_buffers
+
+
+class SteadyState:
+    """Caché en estado estable según un working set: la mezcla de operaciones
+
+    Antes de cada consulta se ejecutan `operations` operaciones elegidas según
+    la mezcla (como load_generator.py, terminando con ROLLBACK) y entre
+    repeticiones `interleave` más: las páginas de la consulta medida siguen en
+    caché solo si ella o la mezcla las usan con frecuencia.
+    """
+
+    def __init__(self, operations, mix, sampler, burst, interleave, seed):
+        self.operations = [operations[key] for key in mix]
+        self.weights = [mix[key] for key in mix]
+        self.sampler = sampler
+        self.burst = burst
+        self.interleave = interleave
+        self.rng = random.Random(f"{seed}:estable")
+        self.executed = 0
+
+    def run(self, conn, count):
+        """Ejecutar count operaciones de la mezcla con ROLLBACK"""
+        for operation in self.rng.choices(self.operations, self.weights, k=count):
+            execute_operation(
+                conn, operation, self.sampler.draw(operation, self.rng), commit=False
+            )
+        # Publicar sus estadísticas ya, para que no se sumen a la consulta medida
+        with conn.cursor() as cursor:
+            flush_stats(cursor)
+        conn.rollback()
+        self.executed += count
+
+    def describe(self):
+        return {
+            "mezcla": {
+                operation["clave"]: weight
+                for operation, weight in zip(self.operations, self.weights)
+            },
+            "operaciones_por_consulta": self.burst,
+            "operaciones_entre_repeticiones": self.interleave,
+            "operaciones_ejecutadas": self.executed,
+        }
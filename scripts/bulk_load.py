@@ -0,0 +1,245 @@
+import threading
+import time
+
+import psycopg2
+
+from db import connect_db
+
+# Tablas que carga populate_db.py (con sus particiones, si las hay)
+LOADED_TABLES = (
+    "usuario",
+    "vendedor",
+    "direccion",
+    "carrito",
+    "producto",
+    "inventario",
+    "resena",
+    "pedido",
+    "pedido_item",
+    "pago",
+)
+
+# Memoria de cada CREATE INDEX al reconstruir (los índices GIN la aprovechan)
+MAINTENANCE_WORK_MEM = "256MB"
+
+# Índices secundarios: ni primarios, ni únicos, ni respaldo de una restricción,
+# ni índices de partición (se recrean con el índice de la tabla particionada)
+SECONDARY_INDEXES_SQL = """
+SELECT i.indexrelid::regclass::TEXT, i.indrelid::regclass::TEXT, pg_get_indexdef(i.indexrelid)
+FROM pg_index i
+WHERE i.indrelid = ANY(%s::regclass[])
+  AND NOT i.indisprimary
+  AND NOT i.indisunique
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+  AND NOT EXISTS (SELECT 1 FROM pg_inherits h WHERE h.inhrelid = i.indexrelid)
+ORDER BY 1
+"""
+
+# Claves foráneas definidas en las tablas cargadas (no las heredadas por particiones)
+FOREIGN_KEYS_SQL = """
+SELECT conname, conrelid::regclass::TEXT, pg_get_constraintdef(oid)
+FROM pg_constraint
+WHERE contype = 'f' AND conparentid = 0 AND conrelid = ANY(%s::regclass[])
+ORDER BY 2, 1
+"""
+
+# Triggers de calificación de resena (schema optimizado)
+RATING_TRIGGERS_SQL = """
+SELECT tgname
+FROM pg_trigger
+WHERE tgrelid = to_regclass('resena') AND tgfoid = to_regproc('actualizar_promedio_calificacion')
+"""
+
+
+class BulkLoad:
+    """Carga masiva sin mantenimiento de índices, claves foráneas ni calificaciones
+
+    prepare() guarda las definiciones y elimina los índices secundarios y las
+    claves foráneas de las tablas cargadas, y deshabilita los triggers de
+    calificación. Después de la carga, steps() devuelve las tareas que
+    reconstruyen todo en pasadas sobre conjuntos: calificaciones, índices en
+    paralelo, claves foráneas, triggers, VACUUM ANALYZE y la vista
+    materializada. Si la carga falla, restore() recrea índices y claves sin
+    validarlas para no dejar el schema incompleto.
+    """
+
+    def __init__(self, conn, index_workers=4, tables=LOADED_TABLES):
+        self.conn = conn
+        self.index_workers = index_workers
+        self.tables = list(tables)
+        self.indexes = []
+        self.foreign_keys = []
+        self.triggers = []
+
+    def prepare(self):
+        """Eliminar índices secundarios y claves foráneas y deshabilitar triggers"""
+        with self.conn.cursor() as cursor:
+            cursor.execute(SECONDARY_INDEXES_SQL, (self.tables,))
+            self.indexes = cursor.fetchall()
+            cursor.execute(FOREIGN_KEYS_SQL, (self.tables,))
+            self.foreign_keys = cursor.fetchall()
+            cursor.execute(RATING_TRIGGERS_SQL)
+            self.triggers = [row[0] for row in cursor.fetchall()]
+
+            for name, table, _ in self.foreign_keys:
+                cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+            for name, _, _ in self.indexes:
+                cursor.execute(f"DROP INDEX {name}")
+            for name in self.triggers:
+                cursor.execute(f"ALTER TABLE resena DISABLE TRIGGER {name}")
+        self.conn.commit()
+        print(
+            f"Carga masiva: {len(self.indexes)} índices secundarios y {len(self.foreign_keys)} claves foráneas eliminados, {len(self.triggers)} triggers de calificación deshabilitados"
+        )
+
+    def steps(self, recalculate_ratings):
+        """Tareas posteriores a la carga, en orden: (nombre, función)
+
+        Las calificaciones se recalculan antes de reconstruir los índices: el
+        UPDATE sobre producto no tiene que mantenerlos.
+        """
+        steps = []
+        if self.triggers:
+            steps.append(("calificaciones", lambda: recalculate_ratings(self.conn)))
+        steps += [
+            ("indices", self.rebuild_indexes),
+            ("claves_foraneas", self.restore_foreign_keys),
+        ]
+        if self.triggers:
+            steps.append(("triggers", self.enable_triggers))
+        steps += [
+            ("vacuum_analyze", self.vacuum_analyze),
+            ("vista_materializada", self.refresh_views),
+        ]
+        return steps
+
+    def rebuild_indexes(self):
+        """Recrear los índices con index_workers conexiones, los de tablas más grandes primero"""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname, pg_total_relation_size(oid) FROM pg_class WHERE relname = ANY(%s)",
+                (self.tables,),
+            )
+            sizes = dict(cursor.fetchall())
+        self.conn.commit()
+        pending = sorted(self.indexes, key=lambda index: -sizes.get(index[1], 0))
+        lock = threading.Lock()
+        errors = []
+        durations = {}
+
+        def build():
+            conn = connect_db()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"SET maintenance_work_mem = '{MAINTENANCE_WORK_MEM}'"
+                    )
+                while not errors:
+                    with lock:
+                        if not pending:
+                            return
+                        name, _, definition = pending.pop(0)
+                    start = time.perf_counter()
+                    # IF NOT EXISTS: restore() puede repetir una reconstrucción a medias; un
+                    # índice de tabla particionada se crea también en sus particiones
+                    definition = definition.replace(
+                        "CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1
+                    ).replace(" ON ONLY ", " ON ")
+                    with conn.cursor() as cursor:
+                        cursor.execute(definition)
+                    conn.commit()
+                    durations[name] = time.perf_counter() - start
+            except psycopg2.Error as e:
+                errors.append(e)
+            finally:
+                conn.close()
+
+        threads = [
+            threading.Thread(target=build)
+            for _ in range(min(self.index_workers, len(pending)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        slowest = sorted(durations.items(), key=lambda item: -item[1])[:3]
+        print(
+            f"  {len(durations)} índices reconstruidos con {len(threads)} conexiones; más lentos: "
+            + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in slowest)
+        )
+
+    def restore_foreign_keys(self, validate=True):
+        """Recrear las claves foráneas que falten; cada una se valida con una sola consulta"""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT conname FROM pg_constraint WHERE contype = 'f' AND conrelid = ANY(%s::regclass[])",
+                (self.tables,),
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            for name, table, definition in self.foreign_keys:
+                if name in existing:
+                    continue
+                cursor.execute(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}"
+                    + ("" if validate else " NOT VALID")
+                )
+        self.conn.commit()
+
+    def enable_triggers(self):
+        with self.conn.cursor() as cursor:
+            for name in self.triggers:
+                cursor.execute(f"ALTER TABLE resena ENABLE TRIGGER {name}")
+        self.conn.commit()
+
+    def vacuum_analyze(self):
+        """VACUUM ANALYZE de las tablas cargadas.
+
+        Además de las estadísticas, deja el mapa de visibilidad al día (index
+        only scans) y limpia las tuplas muertas del recálculo de calificaciones.
+        """
+        self.conn.autocommit = True
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"VACUUM (ANALYZE) {', '.join(self.tables)}")
+        finally:
+            self.conn.autocommit = False
+
+    def refresh_views(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('mv_metricas_vendedor')")
+            if cursor.fetchone()[0] is not None:
+                cursor.execute("REFRESH MATERIALIZED VIEW mv_metricas_vendedor")
+        self.conn.commit()
+
+    def restore(self):
+        """Tras una carga fallida: recrear índices, claves (sin validar) y triggers"""
+        self.conn.rollback()
+        self.rebuild_indexes()
+        self.restore_foreign_keys(validate=False)
+        self.enable_triggers()
+        print(
+            "Carga masiva interrumpida: índices, claves foráneas y triggers restaurados"
+        )
+
+
+def compare_reports(previous, current):
+    """Tiempo de reloj total y por fase frente a un reporte de carga anterior"""
+    before = {phase["fase"]: phase["pared_s"] for phase in previous["fases"]}
+    after = {phase["fase"]: phase["pared_s"] for phase in current["fases"]}
+    total_before = sum(before.values())
+    total_after = sum(after.values())
+    return {
+        "referencia": previous.get("configuracion"),
+        "pared_referencia_s": total_before,
+        "pared_s": total_after,
+        "ahorro_s": total_before - total_after,
+        "ahorro_pct": (
+            100 * (total_before - total_after) / total_before if total_before else 0
+        ),
+        "fases": {
+            name: {"referencia_s": before.get(name), "actual_s": after.get(name)}
+            for name in list(before) + [name for name in after if name not in before]
+        },
+    }
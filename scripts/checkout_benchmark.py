@@ -0,0 +1,744 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import psycopg2
+from psycopg2 import errors
+from psycopg2.extensions import (
+    ISOLATION_LEVEL_READ_COMMITTED,
+    ISOLATION_LEVEL_REPEATABLE_READ,
+    ISOLATION_LEVEL_SERIALIZABLE,
+)
+
+from benchmark_stats import histogram, summarize
+from db import connect_db, wait_for_db
+from populate_db import CENT, MAX_ITEMS_PER_ORDER
+
+ISOLATION_LEVELS = {
+    "read-committed": ISOLATION_LEVEL_READ_COMMITTED,
+    "repeatable-read": ISOLATION_LEVEL_REPEATABLE_READ,
+    "serializable": ISOLATION_LEVEL_SERIALIZABLE,
+}
+
+# Orden en que se reserva el inventario de un carrito:
+#   producto: por producto_id, todas las transacciones bloquean en el mismo orden
+#   carrito:  en el orden en que se agregaron los items (puede producir deadlocks)
+LOCK_ORDERS = ("producto", "carrito")
+
+# Errores que abortan la transacción y se resuelven reintentando
+RETRYABLE_ERRORS = {
+    errors.DeadlockDetected: "deadlock",
+    errors.SerializationFailure: "serializacion",
+}
+
+# Estados del checkout (tablas estado_pedido y estado_pago)
+PEDIDO_PENDIENTE = 1
+PEDIDO_CONFIRMADO = 2
+PAGO_COMPLETADO = 3
+
+# Pasos medidos del checkout; cada sentencia lleva su paso en un comentario
+# para reconocer en pg_stat_activity qué paso espera un bloqueo
+STEPS = ("carrito", "reservar", "pedido", "confirmar", "vaciar", "fin")
+STEP_COMMENT = re.compile(r"/\* checkout:(\w+) \*/")
+
+CART_SQL = """/* checkout:carrito */
+SELECT producto_id, cantidad, precio_unitario
+FROM carrito_item
+WHERE carrito_id = %s
+ORDER BY carrito_item_id
+"""
+
+RESERVE_SQL = """/* checkout:reservar */
+UPDATE inventario
+SET cantidad_disponible = cantidad_disponible - %(cantidad)s,
+    cantidad_reservada = cantidad_reservada + %(cantidad)s,
+    fecha_actualizacion = CURRENT_TIMESTAMP
+WHERE producto_id = %(producto_id)s AND cantidad_disponible >= %(cantidad)s
+"""
+
+ORDER_SQL = """/* checkout:pedido */
+INSERT INTO pedido (usuario_id, direccion_id, estado_pedido_id, monto_subtotal, monto_impuesto, monto_envio, monto_total)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+RETURNING pedido_id, fecha_pedido
+"""
+
+HISTORY_SQL = """/* checkout:{step} */
+INSERT INTO historial_estado_pedido (pedido_id, estado_anterior_id, estado_nuevo_id, usuario_id, razon)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+ITEMS_SQL = """/* checkout:pedido */
+INSERT INTO pedido_item (pedido_id, producto_id, cantidad, precio_unitario, subtotal)
+SELECT %s, producto_id, cantidad, precio_unitario, cantidad * precio_unitario
+FROM unnest(%s::INT[], %s::INT[], %s::DECIMAL[]) AS i(producto_id, cantidad, precio_unitario)
+"""
+
+PAYMENT_SQL = """/* checkout:pedido */
+INSERT INTO pago (pedido_id, metodo_pago_id, estado_pago_id, monto, referencia_pago)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+# El pago confirmado descuenta la reserva: el stock sale del inventario
+CONFIRM_STOCK_SQL = """/* checkout:confirmar */
+UPDATE inventario i
+SET cantidad_reservada = i.cantidad_reservada - c.cantidad
+FROM unnest(%s::INT[], %s::INT[]) AS c(producto_id, cantidad)
+WHERE i.producto_id = c.producto_id
+"""
+
+CONFIRM_ORDER_SQL = """/* checkout:confirmar */
+UPDATE pedido
+SET estado_pedido_id = %s, fecha_actualizacion = CURRENT_TIMESTAMP
+WHERE pedido_id = %s AND fecha_pedido = %s
+"""
+
+CLEAR_CART_SQL = """/* checkout:vaciar */
+DELETE FROM carrito_item WHERE carrito_id = %s
+"""
+
+TOUCH_CART_SQL = """/* checkout:vaciar */
+UPDATE carrito SET fecha_actualizacion = CURRENT_TIMESTAMP WHERE carrito_id = %s
+"""
+
+# Clientes de este benchmark esperando un bloqueo, con el paso que ejecutan
+LOCK_WAITS_SQL = """
+SELECT wait_event, query
+FROM pg_stat_activity
+WHERE datname = current_database()
+  AND wait_event_type = 'Lock'
+  AND query LIKE '/* checkout:%'
+"""
+
+
+class OutOfStock(Exception):
+    """Un producto del carrito no tiene stock suficiente"""
+
+
+def fetch_buyers(conn):
+    """(carrito_id, usuario_id, direccion_id) de los usuarios con carrito y dirección"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT ON (c.usuario_id) c.carrito_id, c.usuario_id, d.direccion_id
+            FROM carrito c
+            JOIN direccion d ON d.usuario_id = c.usuario_id
+            ORDER BY c.usuario_id, d.es_principal DESC, d.direccion_id
+            """)
+        buyers = cursor.fetchall()
+    conn.rollback()
+    return buyers
+
+
+def fetch_catalog(conn, size, seed):
+    """Productos activos con stock y su precio, del más al menos popular
+
+    La popularidad es una permutación aleatoria (semilla) de los size
+    primeros productos: los productos calientes no son los de ID más bajo.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT p.producto_id, p.precio
+            FROM producto p
+            JOIN inventario i ON i.producto_id = p.producto_id
+            WHERE p.activo AND p.precio > 0 AND i.cantidad_disponible > 0
+            ORDER BY p.producto_id
+            LIMIT %s
+            """,
+            (size,),
+        )
+        catalog = cursor.fetchall()
+    conn.rollback()
+    random.Random(seed).shuffle(catalog)
+    return catalog
+
+
+def zipf_weights(n, skew):
+    """Pesos acumulados de una Zipf acotada a n rangos (skew 0 = uniforme)"""
+    cumulative, total = [], 0.0
+    for rank in range(1, n + 1):
+        total += rank**-skew
+        cumulative.append(total)
+    return cumulative
+
+
+def prepare_partitions(conn):
+    """Crear la partición del mes actual de las tablas particionadas que escribe el checkout"""
+    with conn.cursor() as cursor:
+        for table in ("pedido", "historial_estado_pedido"):
+            cursor.execute(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+                (table,),
+            )
+            if cursor.fetchone() is not None:
+                cursor.execute(
+                    "SELECT crear_particiones_mensuales(%s, CURRENT_TIMESTAMP::TIMESTAMP, CURRENT_TIMESTAMP::TIMESTAMP)",
+                    (table,),
+                )
+    conn.commit()
+
+
+def server_counters(conn):
+    """Deadlocks y transacciones confirmadas/revertidas de la base (pg_stat_database)"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_stat_clear_snapshot()")
+        cursor.execute(
+            "SELECT deadlocks, xact_commit, xact_rollback FROM pg_stat_database WHERE datname = current_database()"
+        )
+        row = cursor.fetchone()
+    conn.commit()
+    return dict(zip(("deadlocks", "commits", "rollbacks"), row))
+
+
+class LockMonitor(threading.Thread):
+    """Muestrear pg_stat_activity y contar los clientes que esperan un bloqueo
+
+    Cada muestra registra, por paso del checkout y tipo de espera (tuple,
+    transactionid, relation...), cuántos clientes estaban bloqueados. El
+    promedio por muestra estima cuántos clientes hay esperando en cada paso.
+    """
+
+    def __init__(self, interval, measure_from):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.measure_from = measure_from
+        self.samples = 0
+        self.waits = {}
+        self.before = None
+        self._done = threading.Event()
+
+    def run(self):
+        conn = connect_db()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                while not self._done.wait(self.interval):
+                    if time.perf_counter() < self.measure_from:
+                        continue
+                    if self.before is None:
+                        self.before = server_counters(conn)
+                    cursor.execute(LOCK_WAITS_SQL)
+                    self.samples += 1
+                    for wait_event, query in cursor.fetchall():
+                        match = STEP_COMMENT.match(query)
+                        key = (match.group(1) if match else "otro", wait_event)
+                        self.waits[key] = self.waits.get(key, 0) + 1
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def report(self):
+        """Clientes esperando un bloqueo por paso y tipo de espera"""
+        waits = [
+            {
+                "paso": step,
+                "espera": wait_event,
+                "muestras": count,
+                "clientes_esperando": count / self.samples if self.samples else 0,
+            }
+            for (step, wait_event), count in self.waits.items()
+        ]
+        waits.sort(key=lambda wait: wait["muestras"], reverse=True)
+        return {
+            "muestras": self.samples,
+            "clientes_esperando": sum(wait["clientes_esperando"] for wait in waits),
+            "por_paso": waits,
+        }
+
+
+class CheckoutClient:
+    """Un comprador concurrente: llena su carrito y ejecuta el checkout en bucle
+
+    Cada iteración llena el carrito en su propia transacción (sin medir) y
+    después ejecuta el checkout: reservar stock de cada producto, crear el
+    pedido con sus items, pago e historial, confirmar (la reserva se
+    descuenta y el pedido pasa a Confirmado) y vaciar el carrito. Los
+    deadlocks y fallos de serialización se reintentan hasta max_retries veces;
+    la latencia incluye los reintentos.
+    """
+
+    def __init__(self, index, buyers, catalog, weights, options):
+        self.buyers = buyers
+        self.catalog = catalog
+        self.weights = weights
+        self.options = options
+        self.rng = random.Random(options["seed"] * 1000 + index)
+        self.latencies = []
+        self.steps = {step: [] for step in STEPS}
+        self.outcomes = {"completados": 0, "sin_stock": 0, "abortados": 0}
+        self.retries = {name: 0 for name in RETRYABLE_ERRORS.values()}
+        self.errors = {}
+        self.attempts = []
+        self.demand = {}
+        self.carts = set()
+
+    def fill_cart(self, conn, cart_id):
+        """Reemplazar el contenido del carrito por productos elegidos con sesgo de popularidad"""
+        count = self.rng.randint(1, MAX_ITEMS_PER_ORDER)
+        chosen = {}
+        while len(chosen) < min(count, len(self.catalog)):
+            product_id, price = self.rng.choices(
+                self.catalog, cum_weights=self.weights
+            )[0]
+            chosen.setdefault(product_id, (self.rng.randint(1, 3), price))
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM carrito_item WHERE carrito_id = %s", (cart_id,))
+            for product_id, (quantity, price) in chosen.items():
+                cursor.execute(
+                    "INSERT INTO carrito_item (carrito_id, producto_id, cantidad, precio_unitario) VALUES (%s, %s, %s, %s)",
+                    (cart_id, product_id, quantity, price),
+                )
+        conn.commit()
+        self.carts.add(cart_id)
+        return chosen
+
+    def checkout(self, conn, cart_id, user_id, address_id):
+        """Una transacción de checkout; devuelve el tiempo de cada paso en ns"""
+        timings = {}
+        clock = time.perf_counter_ns()
+
+        def step(name):
+            nonlocal clock
+            now = time.perf_counter_ns()
+            timings[name] = now - clock
+            clock = now
+
+        with conn.cursor() as cursor:
+            if self.options["seller_metrics"]:
+                cursor.execute(
+                    "SET LOCAL eshopify.metricas_vendedor = %s",
+                    (self.options["seller_metrics"],),
+                )
+            cursor.execute(CART_SQL, (cart_id,))
+            items = cursor.fetchall()
+            step("carrito")
+
+            ordered = items
+            if self.options["lock_order"] == "producto":
+                ordered = sorted(items)
+            for product_id, quantity, _ in ordered:
+                cursor.execute(
+                    RESERVE_SQL, {"producto_id": product_id, "cantidad": quantity}
+                )
+                if cursor.rowcount == 0:
+                    raise OutOfStock(product_id)
+            step("reservar")
+
+            subtotal = sum(quantity * price for _, quantity, price in items)
+            tax = (subtotal * Decimal("0.19")).quantize(CENT)  # 19% IVA
+            shipping = Decimal(self.rng.uniform(5, 50)).quantize(CENT)
+            total = subtotal + tax + shipping
+            cursor.execute(
+                ORDER_SQL,
+                (
+                    user_id,
+                    address_id,
+                    PEDIDO_PENDIENTE,
+                    subtotal,
+                    tax,
+                    shipping,
+                    total,
+                ),
+            )
+            order_id, order_date = cursor.fetchone()
+            cursor.execute(
+                HISTORY_SQL.format(step="pedido"),
+                (order_id, None, PEDIDO_PENDIENTE, user_id, "Checkout"),
+            )
+            product_ids = [item[0] for item in items]
+            quantities = [item[1] for item in items]
+            cursor.execute(
+                ITEMS_SQL,
+                (order_id, product_ids, quantities, [item[2] for item in items]),
+            )
+            cursor.execute(
+                PAYMENT_SQL,
+                (
+                    order_id,
+                    self.rng.randint(1, 5),
+                    PAGO_COMPLETADO,
+                    total,
+                    f"CHK-{order_id}",
+                ),
+            )
+            step("pedido")
+
+            cursor.execute(CONFIRM_STOCK_SQL, (product_ids, quantities))
+            cursor.execute(CONFIRM_ORDER_SQL, (PEDIDO_CONFIRMADO, order_id, order_date))
+            cursor.execute(
+                HISTORY_SQL.format(step="confirmar"),
+                (
+                    order_id,
+                    PEDIDO_PENDIENTE,
+                    PEDIDO_CONFIRMADO,
+                    user_id,
+                    "Pago confirmado",
+                ),
+            )
+            step("confirmar")
+
+            cursor.execute(CLEAR_CART_SQL, (cart_id,))
+            cursor.execute(TOUCH_CART_SQL, (cart_id,))
+            step("vaciar")
+        if self.options["commit"]:
+            conn.commit()
+        else:
+            conn.rollback()
+        step("fin")
+        return timings
+
+    def run(self, measure_from, stop_at):
+        """Bucle del cliente hasta stop_at; solo cuenta lo iniciado después de measure_from"""
+        conn = connect_db()
+        conn.set_session(isolation_level=ISOLATION_LEVELS[self.options["isolation"]])
+        try:
+            while time.perf_counter() < stop_at:
+                cart_id, user_id, address_id = self.rng.choice(self.buyers)
+                try:
+                    chosen = self.fill_cart(conn, cart_id)
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    self.count_error(e, time.perf_counter() >= measure_from)
+                    continue
+                started = time.perf_counter()
+                measured = started >= measure_from
+                start = time.perf_counter_ns()
+                attempt = 0
+                while True:
+                    try:
+                        timings = self.checkout(conn, cart_id, user_id, address_id)
+                        outcome = "completados"
+                        break
+                    except OutOfStock:
+                        conn.rollback()
+                        timings, outcome = None, "sin_stock"
+                        break
+                    except tuple(RETRYABLE_ERRORS) as e:
+                        conn.rollback()
+                        if measured:
+                            self.retries[RETRYABLE_ERRORS[type(e)]] += 1
+                        if attempt >= self.options["max_retries"]:
+                            timings, outcome = None, "abortados"
+                            break
+                        attempt += 1
+                        # Espera aleatoria creciente: los que chocaron no reintentan a la vez
+                        time.sleep(
+                            self.rng.uniform(0, self.options["backoff"] * 2**attempt)
+                        )
+                    except psycopg2.Error as e:
+                        conn.rollback()
+                        self.count_error(e, measured)
+                        timings, outcome = None, None
+                        break
+                elapsed = time.perf_counter_ns() - start
+                if not measured or outcome is None:
+                    continue
+                self.outcomes[outcome] += 1
+                self.attempts.append(attempt + 1)
+                if outcome == "completados":
+                    self.latencies.append(elapsed)
+                    for name, value in timings.items():
+                        self.steps[name].append(value)
+                    for product_id, (quantity, _) in chosen.items():
+                        self.demand[product_id] = (
+                            self.demand.get(product_id, 0) + quantity
+                        )
+        finally:
+            conn.close()
+
+    def count_error(self, error, measured):
+        if measured:
+            name = type(error).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def clear_carts(conn, cart_ids):
+    """Vaciar los carritos usados por el benchmark"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM carrito_item WHERE carrito_id = ANY(%s)", (list(cart_ids),)
+        )
+    conn.commit()
+
+
+def run_checkout(conn, options):
+    """Lanzar los compradores concurrentes y combinar sus mediciones"""
+    buyers = fetch_buyers(conn)
+    catalog = fetch_catalog(conn, options["catalog"], options["seed"])
+    if not buyers or not catalog:
+        raise RuntimeError(
+            "No hay compradores o productos con stock: ejecuta populate_db.py primero"
+        )
+    if options["clients"] > len(buyers):
+        # Cada cliente necesita al menos un comprador propio (carrito y dirección)
+        raise RuntimeError(
+            f"--clients {options['clients']} supera los {len(buyers)} compradores con"
+            " carrito y dirección: usa menos clientes o un --scale-factor mayor"
+        )
+    prepare_partitions(conn)
+    weights = zipf_weights(len(catalog), options["skew"])
+
+    # Cada cliente compra con sus propios carritos: no compiten por carrito_item
+    clients = [
+        CheckoutClient(i, buyers[i :: options["clients"]], catalog, weights, options)
+        for i in range(options["clients"])
+    ]
+    start = time.perf_counter()
+    measure_from = start + options["ramp_up"]
+    stop_at = measure_from + options["duration"]
+    monitor = LockMonitor(options["sample_interval"], measure_from)
+    monitor.start()
+    threads = [
+        threading.Thread(target=client.run, args=(measure_from, stop_at))
+        for client in clients
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    monitor.stop()
+    # Contadores del servidor desde el inicio de la medición (sin la rampa)
+    before = monitor.before or server_counters(conn)
+    after = server_counters(conn)
+    clear_carts(conn, set().union(*(client.carts for client in clients)))
+    return build_report(
+        clients, catalog, options["duration"], before, after, monitor.report()
+    )
+
+
+def build_report(clients, catalog, duration, before, after, lock_waits):
+    """TPS, latencias, reintentos, bloqueos y concentración de la demanda"""
+    latencies = [value for client in clients for value in client.latencies]
+    outcomes, retries, errors_by_type, demand = {}, {}, {}, {}
+    attempts = []
+    for client in clients:
+        for source, target in (
+            (client.outcomes, outcomes),
+            (client.retries, retries),
+            (client.errors, errors_by_type),
+            (client.demand, demand),
+        ):
+            for key, value in source.items():
+                target[key] = target.get(key, 0) + value
+        attempts.extend(client.attempts)
+
+    report = {
+        "tps": outcomes["completados"] / duration,
+        "resultados": outcomes,
+        "reintentos": retries,
+        "errores": errors_by_type,
+        "intentos_por_checkout": sum(attempts) / len(attempts) if attempts else 0,
+        "servidor": {key: after[key] - before[key] for key in before},
+        "esperas_bloqueo": lock_waits,
+    }
+    if latencies:
+        report["latencia"] = summarize(latencies)
+        report["histograma_ms"] = histogram([value / 1e6 for value in latencies])
+        report["pasos"] = {
+            step: summarize(values)
+            for step in STEPS
+            for values in [[v for c in clients for v in c.steps[step]]]
+            if values
+        }
+
+    units = sum(demand.values())
+    hottest = sorted(demand.items(), key=lambda item: -item[1])[:5]
+    report["demanda"] = {
+        "productos_catalogo": len(catalog),
+        "productos_vendidos": len(demand),
+        "unidades": units,
+        "mas_vendidos": [
+            {
+                "producto_id": product_id,
+                "unidades": quantity,
+                "fraccion": quantity / units,
+            }
+            for product_id, quantity in hottest
+        ],
+    }
+    return report
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark concurrente de checkout con contención de inventario"
+    )
+    parser.add_argument(
+        "--clients", type=int, default=8, help="compradores concurrentes (conexiones)"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30, help="segundos de medición"
+    )
+    parser.add_argument(
+        "--ramp-up", type=float, default=5, help="segundos iniciales sin medir"
+    )
+    parser.add_argument(
+        "--catalog",
+        type=int,
+        default=1000,
+        help="productos activos con stock que se pueden comprar",
+    )
+    parser.add_argument(
+        "--skew",
+        type=float,
+        default=1.0,
+        help="exponente Zipf de la demanda por producto (0 = uniforme)",
+    )
+    parser.add_argument(
+        "--lock-order",
+        choices=LOCK_ORDERS,
+        default="producto",
+        help="orden de la reserva de inventario (carrito puede producir deadlocks)",
+    )
+    parser.add_argument(
+        "--isolation",
+        choices=ISOLATION_LEVELS,
+        default="read-committed",
+        help="nivel de aislamiento del checkout",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=5,
+        help="reintentos tras deadlock o fallo de serialización",
+    )
+    parser.add_argument(
+        "--backoff",
+        type=float,
+        default=0.005,
+        help="segundos base de la espera aleatoria entre reintentos",
+    )
+    parser.add_argument(
+        "--seller-metrics",
+        choices=("inmediato", "diferido"),
+        help="modo de las métricas de vendedores en el checkout (schema optimizado)",
+    )
+    parser.add_argument(
+        "--commit",
+        action="store_true",
+        help="confirmar los checkouts (por defecto terminan con ROLLBACK)",
+    )
+    parser.add_argument(
+        "--sample-interval",
+        type=float,
+        default=0.05,
+        help="segundos entre muestras de esperas de bloqueo",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="semilla de la demanda")
+    parser.add_argument(
+        "--label", default="checkout", help="etiqueta del run (baseline, optimized)"
+    )
+    parser.add_argument("--output-json", help="ruta del JSON de resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+    options = {
+        "clients": args.clients,
+        "duration": args.duration,
+        "ramp_up": args.ramp_up,
+        "catalog": args.catalog,
+        "skew": args.skew,
+        "lock_order": args.lock_order,
+        "isolation": args.isolation,
+        "max_retries": args.max_retries,
+        "backoff": args.backoff,
+        "seller_metrics": args.seller_metrics,
+        "commit": args.commit,
+        "sample_interval": args.sample_interval,
+        "seed": args.seed,
+    }
+    conn = connect_db()
+    try:
+        print(
+            f"\n{args.clients} compradores, {args.ramp_up:g} s de rampa + {args.duration:g} s medidos,"
+            f" {args.catalog} productos (Zipf {args.skew:g}), reserva por {args.lock_order},"
+            f" {args.isolation} ({'COMMIT' if args.commit else 'ROLLBACK'})"
+        )
+        report = run_checkout(conn, options)
+    except RuntimeError as e:
+        print(e)
+        return
+    finally:
+        conn.close()
+
+    outcomes = report["resultados"]
+    print(
+        f"\nTPS: {report['tps']:.1f}  ({outcomes['completados']} completados,"
+        f" {outcomes['sin_stock']} sin stock, {outcomes['abortados']} abortados)"
+    )
+    if "latencia" in report:
+        latency = report["latencia"]
+        print(
+            f"Latencia: mediana {latency['mediana_ms']:.2f} ms, p95 {latency['p95_ms']:.2f} ms,"
+            f" p99 {latency['p99_ms']:.2f} ms, máx {latency['max_ms']:.2f} ms"
+        )
+        print(
+            "Pasos (mediana / p99 ms): "
+            + ", ".join(
+                f"{step} {summary['mediana_ms']:.2f} / {summary['p99_ms']:.2f}"
+                for step, summary in report["pasos"].items()
+            )
+        )
+    print(
+        f"Reintentos: {report['reintentos']} ({report['intentos_por_checkout']:.2f} intentos por checkout),"
+        f" deadlocks en el servidor: {report['servidor']['deadlocks']}"
+    )
+    if report["errores"]:
+        print(f"Errores: {report['errores']}")
+    waits = report["esperas_bloqueo"]
+    print(
+        f"Esperando bloqueo: {waits['clientes_esperando']:.2f} clientes en promedio"
+        f" ({waits['muestras']} muestras)"
+    )
+    for wait in waits["por_paso"][:5]:
+        print(
+            f"  {wait['paso']:>10} / {wait['espera']:<14} {wait['clientes_esperando']:.2f} clientes"
+        )
+    hottest = report["demanda"]["mas_vendidos"]
+    if hottest:
+        print(
+            "Más vendidos: "
+            + ", ".join(
+                f"{item['producto_id']} ({item['fraccion']:.1%})" for item in hottest
+            )
+        )
+
+    if args.output_json:
+        document = {
+            "etiqueta": args.label,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "configuracion": {
+                "clientes": args.clients,
+                "duracion_s": args.duration,
+                "rampa_s": args.ramp_up,
+                "catalogo": args.catalog,
+                "asimetria": args.skew,
+                "orden_reserva": args.lock_order,
+                "aislamiento": args.isolation,
+                "reintentos_max": args.max_retries,
+                "metricas_vendedor": args.seller_metrics,
+                "commit": args.commit,
+                "semilla": args.seed,
+            },
+        }
+        document.update(report)
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados JSON guardados en {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
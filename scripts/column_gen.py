@@ -0,0 +1,563 @@
+import math
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from faker import Faker
+
+from populate_db import (
+    MAX_ITEMS_PER_ORDER,
+    ORDER_HISTORY,
+    PAGO_COLUMNS,
+    PEDIDO_COLUMNS,
+    PEDIDO_ITEM_COLUMNS,
+    PRODUCT_NAMES,
+    REFERENCE_DATE,
+    copy_rows,
+    derive_seed,
+    load_rows,
+)
+
+# Entradas de cada pool de vocabulario (se generan con Faker una vez por proceso)
+POOL_SIZE = 2000
+
+# Pools ya construidos en este proceso, por (semilla, tamaño, nombre)
+_POOLS = {}
+
+# Generadores de cada pool; las frases se filtran por longitud en sentences()
+_POOL_BUILDERS = {
+    "nombres": lambda fake: fake.name(),
+    "usuarios": lambda fake: fake.user_name(),
+    "dominios": lambda fake: fake.free_email_domain(),
+    "telefonos": lambda fake: fake.phone_number()[:20],
+    "calles": lambda fake: fake.street_address(),
+    "ciudades": lambda fake: fake.city(),
+    "paises": lambda fake: fake.country(),
+    "empresas": lambda fake: fake.company(),
+    "palabras": lambda fake: fake.word().capitalize(),
+    "frases": lambda fake: fake.sentence(),
+    "imagenes": lambda fake: fake.image_url()[:255],
+}
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def as_array(ids):
+    """Rango o lista de IDs como array int64 (un range se convierte sin iterar)"""
+    if isinstance(ids, range):
+        return np.arange(ids.start, ids.stop, ids.step, dtype=np.int64)
+    return np.asarray(ids, dtype=np.int64)
+
+
+def mix64(values):
+    """splitmix64 vectorizado; mismo resultado que populate_db._mix64 elemento a elemento"""
+    values = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return (values ^ (values >> np.uint64(31))) & _MASK64
+
+
+def unit_values(attributes, product_ids, field):
+    """ProductAttributes._unit para un array de IDs"""
+    mixed = mix64(np.uint64(attributes.salt) ^ mix64(product_ids * 8 + field))
+    return mixed.astype(np.float64) / 2.0**64
+
+
+def price_cents(attributes, product_ids):
+    """Precio de cada producto en centavos (entero), derivado de su ID"""
+    return np.rint((10 + unit_values(attributes, product_ids, 0) * 1990) * 100).astype(
+        np.int64
+    )
+
+
+def active_mask(attributes, product_ids):
+    """Estado activo de cada producto (75% activos), derivado de su ID"""
+    return unit_values(attributes, product_ids, 1) < 0.75
+
+
+def copy_text_column(column):
+    """Columna serializada en formato texto de COPY, de una vez por columna.
+
+    Los textos vienen de los pools (sin tabuladores, saltos de línea ni barras
+    invertidas) o de números, así que no hace falta escaparlos valor a valor.
+    """
+    if column.dtype == bool:
+        return np.where(column, "t", "f").tolist()
+    if np.issubdtype(column.dtype, np.datetime64):
+        return np.datetime_as_string(column).tolist()
+    if column.dtype == object:
+        return column.tolist()
+    return column.astype(str).tolist()
+
+
+def cents_text(cents):
+    """Centavos (enteros no negativos) como texto con dos decimales"""
+    return np.char.add(
+        np.char.add((cents // 100).astype(str), "."),
+        np.char.zfill((cents % 100).astype(str), 2),
+    )
+
+
+def _encode_text_row(row):
+    return ("\t".join(row) + "\n").encode("utf-8")
+
+
+def load_columns(conn, table, columns, data, loader, money=()):
+    """Cargar datos organizados por columnas (arrays de NumPy) con el loader indicado.
+
+    Las columnas de money vienen en centavos enteros. Con COPY en texto cada
+    columna se serializa de una vez y las filas llegan a COPY ya como texto;
+    con los demás loaders tolist() convierte cada array a tipos de Python (y
+    los centavos a Decimal) y las filas se arman con zip.
+    """
+    data = [
+        cents_text(column) if name in money else column
+        for name, column in zip(columns, data)
+    ]
+    if loader == "copy":
+        return copy_rows(
+            conn,
+            table,
+            columns,
+            zip(*(copy_text_column(column) for column in data)),
+            encode=_encode_text_row,
+        )
+    data = [
+        (
+            [Decimal(value) for value in column.tolist()]
+            if name in money
+            else column.tolist()
+        )
+        for name, column in zip(columns, data)
+    ]
+    return load_rows(conn, table, columns, zip(*data), loader)
+
+
+def dates_before(gen, size, span):
+    """Fechas al segundo, uniformes en los span anteriores a REFERENCE_DATE"""
+    offsets = gen.integers(0, int(span.total_seconds()), size)
+    return np.datetime64(REFERENCE_DATE, "s") - offsets.astype("timedelta64[s]")
+
+
+class ColumnSource:
+    """Vocabulario y popularidad compartidos por todos los bloques de una carga
+
+    Solo guarda la semilla y la asimetría, así que se envía barato a cada
+    proceso; los pools de texto se construyen con Faker la primera vez que un
+    proceso los usa. La popularidad sigue una Zipf acotada (rango k con
+    probabilidad proporcional a 1/k^skew) y el rango se reparte por los IDs
+    con una permutación afín derivada de la semilla: los productos y usuarios
+    populares son los mismos en todos los bloques y no son siempre los
+    primeros IDs.
+    """
+
+    def __init__(self, seed, skew=1.0, pool_size=POOL_SIZE):
+        self.seed = seed
+        self.skew = skew
+        self.pool_size = pool_size
+        self._cdfs = {}
+
+    def __getstate__(self):
+        # Las CDF se recalculan en cada proceso
+        state = dict(self.__dict__)
+        state["_cdfs"] = {}
+        return state
+
+    def pool(self, name):
+        """Pool de vocabulario como array object, sin tabuladores ni saltos de línea"""
+        key = (self.seed, self.pool_size, name)
+        if key not in _POOLS:
+            fake = Faker("es_CO")
+            fake.seed_instance(derive_seed(self.seed, "vocabulario", name))
+            values = (
+                " ".join(_POOL_BUILDERS[name](fake).replace("\\", " ").split())
+                for _ in range(self.pool_size)
+            )
+            _POOLS[key] = np.array(list(values), dtype=object)
+        return _POOLS[key]
+
+    def prepare(self):
+        """Construir todos los pools de antemano; devuelve los segundos empleados"""
+        start = time.perf_counter()
+        for name in _POOL_BUILDERS:
+            self.pool(name)
+        return time.perf_counter() - start
+
+    def choice(self, gen, name, size):
+        """size entradas al azar de un pool"""
+        pool = self.pool(name)
+        return pool[gen.integers(0, len(pool), size)]
+
+    def sentences(self, gen, size, count, max_chars):
+        """Textos de count frases del pool, sin superar max_chars caracteres"""
+        key = (self.seed, self.pool_size, "frases", max_chars // count)
+        if key not in _POOLS:
+            pool = self.pool("frases")
+            lengths = np.array([len(value) for value in pool])
+            _POOLS[key] = pool[lengths < max_chars // count]
+        pool = _POOLS[key]
+        picks = pool[gen.integers(0, len(pool), (size, count))]
+        text = picks[:, 0]
+        for j in range(1, count):
+            text = text + " " + picks[:, j]
+        return text
+
+    def _cdf(self, n):
+        if n not in self._cdfs:
+            weights = np.arange(1, n + 1, dtype=np.float64) ** -self.skew
+            cdf = np.cumsum(weights)
+            self._cdfs[n] = cdf / cdf[-1]
+        return self._cdfs[n]
+
+    def ranks(self, gen, n, size):
+        """Rangos de popularidad (0 = el más popular) con distribución Zipf acotada a n"""
+        return np.minimum(
+            np.searchsorted(self._cdf(n), gen.random(size), side="right"), n - 1
+        )
+
+    def by_popularity(self, entity, n):
+        """Índices 0..n-1 ordenados de más a menos popular para una entidad"""
+        stride = derive_seed(self.seed, "popularidad", entity) % n | 1
+        while math.gcd(stride, n) != 1:
+            stride += 2
+        offset = derive_seed(self.seed, "desplazamiento", entity) % n
+        return (np.arange(n, dtype=np.int64) * stride + offset) % n
+
+    def popular(self, gen, entity, n, size):
+        """Índices en 0..n-1 elegidos con sesgo de popularidad"""
+        return self.by_popularity(entity, n)[self.ranks(gen, n, size)]
+
+
+def numpy_rng(rng):
+    """Generator de NumPy sembrado desde el random.Random del bloque"""
+    return np.random.default_rng(rng.getrandbits(64))
+
+
+def populate_users(conn, rng, fake, loader, user_ids, columns):
+    """Poblar usuarios por columnas"""
+    gen = numpy_rng(rng)
+    ids = as_array(user_ids)
+    n = len(ids)
+    # El ID en el email garantiza unicidad sin reintentos ni conjuntos de vistos
+    emails = (
+        columns.choice(gen, "usuarios", n)
+        + "."
+        + ids.astype(str).astype(object)
+        + "@"
+        + columns.choice(gen, "dominios", n)
+    )
+    passwords = np.char.add(
+        "$2b$10$abcdefghijklmnopqrstuvwxABCDEFGHIJKLMN",
+        gen.integers(1, 1001, n).astype(str),
+    )
+    total = load_columns(
+        conn,
+        "usuario",
+        ("usuario_id", "nombre", "email", "contrasena", "telefono", "fecha_registro"),
+        (
+            ids,
+            columns.choice(gen, "nombres", n),
+            emails,
+            passwords,
+            columns.choice(gen, "telefonos", n),
+            dates_before(gen, n, timedelta(days=730)),
+        ),
+        loader,
+    )
+    return {"usuario": total}
+
+
+def populate_vendors(conn, rng, fake, loader, vendor_ids, user_ids, columns):
+    """Poblar vendedores por columnas (el k-ésimo vendedor es el k-ésimo usuario)"""
+    gen = numpy_rng(rng)
+    ids = as_array(vendor_ids)
+    n = len(ids)
+    names = (
+        columns.choice(gen, "empresas", n) + " Store " + ids.astype(str).astype(object)
+    )
+    total = load_columns(
+        conn,
+        "vendedor",
+        ("vendedor_id", "usuario_id", "nombre_tienda", "descripcion", "activo"),
+        (
+            ids,
+            as_array(user_ids),
+            names,
+            columns.sentences(gen, n, 3, 200),
+            gen.random(n) < 0.5,
+        ),
+        loader,
+    )
+    return {"vendedor": total}
+
+
+def populate_addresses(conn, rng, fake, loader, address_ids, user_ids, columns):
+    """Poblar direcciones por columnas (la k-ésima dirección es del k-ésimo usuario)"""
+    gen = numpy_rng(rng)
+    n = len(address_ids)
+    total = load_columns(
+        conn,
+        "direccion",
+        (
+            "direccion_id",
+            "usuario_id",
+            "direccion",
+            "ciudad",
+            "codigo_postal",
+            "pais",
+            "es_principal",
+        ),
+        (
+            as_array(address_ids),
+            as_array(user_ids),
+            columns.choice(gen, "calles", n),
+            columns.choice(gen, "ciudades", n),
+            gen.integers(10000, 100000, n).astype(str),
+            columns.choice(gen, "paises", n),
+            gen.random(n) < 0.5,
+        ),
+        loader,
+    )
+    return {"direccion": total}
+
+
+def populate_carts(conn, rng, fake, loader, cart_ids, user_ids, columns):
+    """Poblar carritos (uno por usuario)"""
+    total = load_columns(
+        conn,
+        "carrito",
+        ("carrito_id", "usuario_id"),
+        (as_array(cart_ids), as_array(user_ids)),
+        loader,
+    )
+    return {"carrito": total}
+
+
+def populate_products(
+    conn, rng, fake, loader, product_ids, vendor_ids, category_ids, attributes, columns
+):
+    """Poblar productos por columnas; precio y estado derivados del ID"""
+    gen = numpy_rng(rng)
+    ids = as_array(product_ids)
+    n = len(ids)
+    vendors = as_array(vendor_ids)
+    categories = as_array(category_ids)
+    base_names = np.array(PRODUCT_NAMES, dtype=object)
+    names = (
+        base_names[gen.integers(0, len(base_names), n)]
+        + " "
+        + columns.choice(gen, "palabras", n)
+    )
+    total = load_columns(
+        conn,
+        "producto",
+        (
+            "producto_id",
+            "vendedor_id",
+            "categoria_id",
+            "nombre",
+            "descripcion",
+            "precio",
+            "imagen",
+            "activo",
+        ),
+        (
+            ids,
+            vendors[gen.integers(0, len(vendors), n)],
+            categories[gen.integers(0, len(categories), n)],
+            names,
+            columns.sentences(gen, n, 8, 500),
+            price_cents(attributes, ids),
+            columns.choice(gen, "imagenes", n),
+            active_mask(attributes, ids),
+        ),
+        loader,
+        money=("precio",),
+    )
+    return {"producto": total}
+
+
+def populate_inventory(conn, rng, fake, loader, inventory_ids, product_ids, columns):
+    """Poblar inventario por columnas (uno por producto)"""
+    gen = numpy_rng(rng)
+    n = len(inventory_ids)
+    total = load_columns(
+        conn,
+        "inventario",
+        ("inventario_id", "producto_id", "cantidad_disponible", "cantidad_reservada"),
+        (
+            as_array(inventory_ids),
+            as_array(product_ids),
+            gen.integers(0, 1001, n),
+            gen.integers(0, 51, n),
+        ),
+        loader,
+    )
+    return {"inventario": total}
+
+
+def populate_reviews(
+    conn, rng, fake, loader, review_ids, user_ids, product_ids, columns
+):
+    """Poblar reseñas por columnas, concentradas en usuarios y productos populares"""
+    gen = numpy_rng(rng)
+    n = len(review_ids)
+    users = as_array(user_ids)[columns.popular(gen, "usuario", len(user_ids), n)]
+    products = as_array(product_ids)[
+        columns.popular(gen, "producto", len(product_ids), n)
+    ]
+    # Ordenadas por producto, como en populate_db.populate_reviews
+    order = np.argsort(products, kind="stable")
+    total = load_columns(
+        conn,
+        "resena",
+        (
+            "resena_id",
+            "usuario_id",
+            "producto_id",
+            "calificacion",
+            "comentario",
+            "util",
+        ),
+        (
+            as_array(review_ids),
+            users[order],
+            products[order],
+            gen.integers(1, 6, n)[order],
+            columns.sentences(gen, n, 5, 300)[order],
+            gen.integers(0, 101, n)[order],
+        ),
+        loader,
+    )
+    return {"resena": total}
+
+
+def populate_orders(
+    conn,
+    rng,
+    fake,
+    loader,
+    order_ids,
+    item_ids,
+    payment_ids,
+    user_ids,
+    address_ids,
+    product_ids,
+    attributes,
+    columns,
+    partitioned=False,
+):
+    """Poblar pedidos con sus items y pagos por columnas.
+
+    Cada pedido toma entre 1 y MAX_ITEMS_PER_ORDER productos activos distintos
+    elegidos con sesgo de popularidad: se sortean 2 * MAX_ITEMS_PER_ORDER
+    candidatos por pedido, se descartan los repetidos y se conservan los
+    primeros. Los montos se calculan en centavos enteros, así que
+    monto_subtotal coincide con SUM(pedido_item.subtotal) y el pago con
+    monto_total igual que en populate_db.populate_orders.
+    """
+    gen = numpy_rng(rng)
+    orders = as_array(order_ids)
+    n = len(orders)
+
+    # Solo compran usuarios con dirección: la k-ésima es del k-ésimo usuario
+    k = columns.popular(gen, "usuario", len(address_ids), n)
+    users = as_array(user_ids)[k]
+    addresses = as_array(address_ids)[k]
+    dates = dates_before(gen, n, ORDER_HISTORY)
+
+    # Productos activos ordenados por popularidad
+    products = as_array(product_ids)
+    ranked = products[columns.by_popularity("producto", len(products))]
+    ranked = ranked[active_mask(attributes, ranked)]
+    draws = ranked[columns.ranks(gen, len(ranked), (n, 2 * MAX_ITEMS_PER_ORDER))]
+    # El orden por producto solo detecta repetidos: el orden estable deja primero
+    # la primera aparición de cada producto, que conserva su posición de sorteo
+    by_product = np.argsort(draws, axis=1, kind="stable")
+    sorted_draws = np.take_along_axis(draws, by_product, axis=1)
+    repeated_sorted = np.zeros(draws.shape, dtype=bool)
+    repeated_sorted[:, 1:] = sorted_draws[:, 1:] == sorted_draws[:, :-1]
+    repeated = np.empty_like(repeated_sorted)
+    np.put_along_axis(repeated, by_product, repeated_sorted, axis=1)
+    # Los distintos al principio, en el orden en que se sortearon
+    candidates = np.take_along_axis(
+        draws, np.argsort(repeated, axis=1, kind="stable"), axis=1
+    )
+    num_items = np.minimum(
+        gen.integers(1, MAX_ITEMS_PER_ORDER + 1, n), (~repeated).sum(axis=1)
+    )
+    taken = np.arange(MAX_ITEMS_PER_ORDER) < num_items[:, None]
+    item_products = candidates[:, :MAX_ITEMS_PER_ORDER][taken]
+    item_order, item_position = np.nonzero(taken)
+
+    quantities = gen.integers(1, 4, len(item_products))
+    prices = price_cents(attributes, item_products)
+    item_subtotals = prices * quantities
+    subtotal = np.bincount(item_order, weights=item_subtotals, minlength=n).astype(
+        np.int64
+    )
+    tax = (subtotal * 19 + 50) // 100  # 19% IVA
+    shipping = gen.integers(500, 5001, n)
+    total = subtotal + tax + shipping
+
+    order_columns = [
+        orders,
+        users,
+        addresses,
+        gen.integers(1, 7, n),  # estado_pedido_id
+        dates,
+        subtotal,
+        tax,
+        shipping,
+        total,
+    ]
+    if partitioned:
+        # Las filas de un mismo mes llegan juntas a su partición
+        by_date = np.argsort(dates, kind="stable")
+        order_columns = [column[by_date] for column in order_columns]
+
+    counts = {
+        "pedido": load_columns(
+            conn,
+            "pedido",
+            PEDIDO_COLUMNS,
+            order_columns,
+            loader,
+            money=("monto_subtotal", "monto_impuesto", "monto_envio", "monto_total"),
+        )
+    }
+    counts["pedido_item"] = load_columns(
+        conn,
+        "pedido_item",
+        PEDIDO_ITEM_COLUMNS,
+        (
+            as_array(item_ids)[item_order * MAX_ITEMS_PER_ORDER + item_position],
+            orders[item_order],
+            item_products,
+            quantities,
+            prices,
+            item_subtotals,
+        ),
+        loader,
+        money=("precio_unitario", "subtotal"),
+    )
+    references = np.char.add(
+        np.char.add("REF-", np.char.zfill(orders.astype(str), 4)), "-2024"
+    )
+    counts["pago"] = load_columns(
+        conn,
+        "pago",
+        PAGO_COLUMNS,
+        (
+            as_array(payment_ids),
+            orders,
+            gen.integers(1, 6, n),  # metodo_pago_id
+            gen.integers(1, 6, n),  # estado_pago_id
+            total,
+            references,
+        ),
+        loader,
+        money=("monto",),
+    )
+    return counts
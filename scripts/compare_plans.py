@@ -0,0 +1,227 @@
+import argparse
+import json
+
+# Nodos que leen una tabla, con o sin índice
+SCAN_NODES = {
+    "Seq Scan",
+    "Index Scan",
+    "Index Only Scan",
+    "Bitmap Heap Scan",
+    "Bitmap Index Scan",
+}
+
+
+def walk(node, depth=0):
+    """Recorrer el árbol del plan en preorden devolviendo (profundidad, nodo)"""
+    yield depth, node
+    for child in node.get("Plans", []):
+        yield from walk(child, depth + 1)
+
+
+def misestimate(node):
+    """Factor de error de la estimación de filas (>= 1) de un nodo"""
+    estimated = max(node.get("Plan Rows", 0), 1)
+    actual = max(node.get("Actual Rows", 0) * node.get("Actual Loops", 1), 1)
+    return max(estimated / actual, actual / estimated)
+
+
+def summarize_plan(plan):
+    """Resumen comparable de un plan EXPLAIN (ANALYZE, BUFFERS) en JSON"""
+    root = plan["Plan"]
+    node_types = {}
+    indexes = set()
+    seq_scans = set()
+    worst = None
+    for _, node in walk(root):
+        node_types[node["Node Type"]] = node_types.get(node["Node Type"], 0) + 1
+        if node.get("Index Name"):
+            indexes.add(node["Index Name"])
+        if node["Node Type"] == "Seq Scan":
+            seq_scans.add(node.get("Relation Name"))
+        factor = misestimate(node)
+        if worst is None or factor > worst["factor"]:
+            worst = {
+                "nodo": node["Node Type"],
+                "relacion": node.get("Relation Name") or node.get("Index Name"),
+                "estimadas": node.get("Plan Rows", 0),
+                "reales": node.get("Actual Rows", 0) * node.get("Actual Loops", 1),
+                "factor": factor,
+            }
+    # Los buffers del nodo raíz acumulan los de todo el árbol
+    return {
+        "nodos": node_types,
+        "indices": sorted(indexes),
+        "seq_scans": sorted(seq_scans),
+        "filas_estimadas": root.get("Plan Rows", 0),
+        "filas_reales": root.get("Actual Rows", 0),
+        "peor_estimacion": worst,
+        "shared_hit": root.get("Shared Hit Blocks", 0),
+        "shared_read": root.get("Shared Read Blocks", 0),
+        "planificacion_ms": plan.get("Planning Time", 0.0),
+        "ejecucion_ms": plan.get("Execution Time", 0.0),
+    }
+
+
+def format_tree(plan):
+    """Plan como árbol de texto: tipo de nodo, relación/índice y filas est./reales"""
+    lines = []
+    for depth, node in walk(plan["Plan"]):
+        label = node["Node Type"]
+        if node.get("Index Name"):
+            label += f" using {node['Index Name']}"
+        if node.get("Relation Name"):
+            label += f" on {node['Relation Name']}"
+        rows = node.get("Actual Rows", 0) * node.get("Actual Loops", 1)
+        lines.append(
+            f"{'  ' * depth}-> {label} (est. {node.get('Plan Rows', 0)}, reales {rows})"
+        )
+    return lines
+
+
+def load_plans(path):
+    """Planes por nombre de consulta de un JSON de script_benchmark.py"""
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    plans = {
+        result["nombre"]: result["plan"]
+        for result in report["resultados"]
+        if result.get("plan")
+    }
+    return report.get("etiqueta", path), plans
+
+
+def compare(base, other):
+    """Diferencias entre los resúmenes de dos planes"""
+    base_types = set(base["nodos"])
+    other_types = set(other["nodos"])
+    return {
+        "nodos_nuevos": sorted(other_types - base_types),
+        "nodos_eliminados": sorted(base_types - other_types),
+        "indices_nuevos": sorted(set(other["indices"]) - set(base["indices"])),
+        "indices_sin_usar": sorted(set(base["indices"]) - set(other["indices"])),
+        "seq_scans_eliminados": sorted(
+            set(base["seq_scans"]) - set(other["seq_scans"])
+        ),
+        "seq_scans_nuevos": sorted(set(other["seq_scans"]) - set(base["seq_scans"])),
+    }
+
+
+def render_markdown(base_label, other_label, rows):
+    """Reporte de la comparación en Markdown"""
+    lines = [f"# Comparación de planes: {base_label} vs {other_label}", ""]
+    for name, base, other, diff, trees in rows:
+        lines += [f"## {name}", ""]
+        lines += [f"| Métrica | {base_label} | {other_label} |", "|---|---|---|"]
+        for title, key in (
+            ("Ejecución (ms)", "ejecucion_ms"),
+            ("Planificación (ms)", "planificacion_ms"),
+            ("Shared hit (bloques)", "shared_hit"),
+            ("Shared read (bloques)", "shared_read"),
+            ("Filas estimadas / reales", None),
+            ("Índices usados", "indices"),
+            ("Seq Scan sobre", "seq_scans"),
+            ("Peor estimación", "peor_estimacion"),
+        ):
+            values = []
+            for summary in (base, other):
+                if key is None:
+                    values.append(
+                        f"{summary['filas_estimadas']} / {summary['filas_reales']}"
+                    )
+                elif key == "peor_estimacion":
+                    worst = summary[key]
+                    values.append(
+                        f"x{worst['factor']:.1f} en {worst['nodo']}"
+                        f" ({worst['relacion'] or '-'}: {worst['estimadas']} est. / {worst['reales']} reales)"
+                    )
+                elif isinstance(summary[key], list):
+                    values.append(", ".join(summary[key]) or "-")
+                elif isinstance(summary[key], float):
+                    values.append(f"{summary[key]:.3f}")
+                else:
+                    values.append(str(summary[key]))
+            lines.append(f"| {title} | {values[0]} | {values[1]} |")
+        lines.append("")
+        for title, key in (
+            ("Nodos nuevos", "nodos_nuevos"),
+            ("Nodos eliminados", "nodos_eliminados"),
+            ("Índices nuevos", "indices_nuevos"),
+            ("Índices que dejan de usarse", "indices_sin_usar"),
+            ("Seq Scan eliminados", "seq_scans_eliminados"),
+            ("Seq Scan nuevos", "seq_scans_nuevos"),
+        ):
+            if diff[key]:
+                lines.append(f"- **{title}:** {', '.join(diff[key])}")
+        for label, tree in zip((base_label, other_label), trees):
+            lines += ["", f"Plan {label}:", "", "```"] + tree + ["```"]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Comparar los planes EXPLAIN de dos runs de script_benchmark.py"
+    )
+    parser.add_argument("baseline", help="JSON del run base")
+    parser.add_argument("optimized", help="JSON del run a comparar")
+    parser.add_argument("--output-md", help="ruta del reporte Markdown")
+    parser.add_argument("--output-json", help="ruta del resumen en JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    base_label, base_plans = load_plans(args.baseline)
+    other_label, other_plans = load_plans(args.optimized)
+
+    rows = []
+    for name, base_plan in base_plans.items():
+        if name not in other_plans:
+            continue
+        other_plan = other_plans[name]
+        base = summarize_plan(base_plan)
+        other = summarize_plan(other_plan)
+        diff = compare(base, other)
+        rows.append(
+            (name, base, other, diff, (format_tree(base_plan), format_tree(other_plan)))
+        )
+
+        print(
+            f"{name}: {base['ejecucion_ms']:.3f} ms -> {other['ejecucion_ms']:.3f} ms,"
+            f" buffers {base['shared_hit'] + base['shared_read']}"
+            f" -> {other['shared_hit'] + other['shared_read']}"
+        )
+        print(
+            f"  índices: {', '.join(base['indices']) or '-'}"
+            f" -> {', '.join(other['indices']) or '-'}"
+        )
+        if diff["seq_scans_eliminados"]:
+            print(f"  Seq Scan eliminados: {', '.join(diff['seq_scans_eliminados'])}")
+        if diff["seq_scans_nuevos"]:
+            print(f"  Seq Scan nuevos: {', '.join(diff['seq_scans_nuevos'])}")
+
+    if not rows:
+        print("No hay planes comunes: ¿se ejecutó el benchmark con --no-explain?")
+        return
+
+    if args.output_md:
+        with open(args.output_md, "w", encoding="utf-8") as f:
+            f.write(render_markdown(base_label, other_label, rows))
+        print(f"\nReporte Markdown guardado en {args.output_md}")
+    if args.output_json:
+        document = {
+            "base": base_label,
+            "comparado": other_label,
+            "consultas": [
+                {"nombre": name, "base": base, "comparado": other, "diferencias": diff}
+                for name, base, other, diff, _ in rows
+            ],
+        }
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+        print(f"Resumen JSON guardado en {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
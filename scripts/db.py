@@ -0,0 +1,152 @@
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+# Configuración de conexión - IP del contenedor postgres
+DB_SETTINGS = {
+    "host": "postgres",
+    "port": 5432,
+    "user": "postgres",
+    "password": "password",
+    "dbname": "e_shopify_db",
+}
+
+# Parámetros con nombre de psycopg2: %(nombre)s
+NAMED_PARAMETER = re.compile(r"%\((\w+)\)s")
+
+
+def connect_db():
+    """Conectar a la base de datos"""
+    try:
+        return psycopg2.connect(**DB_SETTINGS)
+    except Exception as e:
+        print(f"Error conectando a BD: {e}")
+        sys.exit(1)
+
+
+def wait_for_db(max_attempts=30):
+    """Espera a que la base de datos esté lista."""
+    for attempt in range(max_attempts):
+        try:
+            conn = psycopg2.connect(**DB_SETTINGS)
+            conn.close()
+            print("Base de datos lista.")
+            return True
+        except psycopg2.OperationalError:
+            print(f"Esperando BD... intento {attempt + 1}/{max_attempts}")
+            time.sleep(2)
+    return False
+
+
+def to_prepared(sql):
+    """Convertir %(nombre)s a $n para PREPARE; devuelve (sql, nombres en orden)"""
+    names = []
+
+    def placeholder(match):
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f"${names.index(match.group(1)) + 1}"
+
+    text = NAMED_PARAMETER.sub(placeholder, sql.rstrip().rstrip(";"))
+    return text.replace("%%", "%"), names
+
+
+class SimpleExecutor:
+    """Una conexión persistente; los parámetros se interpolan en el cliente"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextmanager
+    def connection(self):
+        yield self.conn
+
+    def statement(self, conn, sql, params):
+        """Sentencia y parámetros a enviar para sql"""
+        return sql, params or None
+
+    def close(self):
+        pass
+
+
+class PreparedExecutor(SimpleExecutor):
+    """Conexión persistente con PREPARE/EXECUTE: cada sentencia se analiza una vez
+
+    Los statements preparados pertenecen a la sesión y sobreviven al ROLLBACK.
+    Postgres usa planes específicos en las primeras 5 ejecuciones y después
+    puede pasar a un plan genérico (plan_cache_mode).
+    """
+
+    def __init__(self, conn):
+        super().__init__(conn)
+        self._prepared = {}
+
+    def statement(self, conn, sql, params):
+        if sql not in self._prepared:
+            name = f"benchmark_{len(self._prepared) + 1}"
+            text, names = to_prepared(sql)
+            with conn.cursor() as cursor:
+                cursor.execute(f"PREPARE {name} AS {text}")
+            self._prepared[sql] = (name, names)
+        name, names = self._prepared[sql]
+        if not names:
+            return f"EXECUTE {name}", None
+        placeholders = ", ".join(["%s"] * len(names))
+        return f"EXECUTE {name} ({placeholders})", [params[n] for n in names]
+
+
+class ConnectExecutor(SimpleExecutor):
+    """Una conexión nueva por petición (el costo de conectar entra en la medición)"""
+
+    def __init__(self):
+        super().__init__(None)
+
+    @contextmanager
+    def connection(self):
+        conn = psycopg2.connect(**DB_SETTINGS)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+class PooledExecutor(SimpleExecutor):
+    """Conexiones reutilizadas de un pool; cada petición toma y devuelve una"""
+
+    def __init__(self, minconn=1, maxconn=1):
+        super().__init__(None)
+        self.pool = ThreadedConnectionPool(minconn, maxconn, **DB_SETTINGS)
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool.getconn()
+        try:
+            yield conn
+        finally:
+            if conn.status != psycopg2.extensions.STATUS_READY:
+                conn.rollback()
+            self.pool.putconn(conn)
+
+    def close(self):
+        self.pool.closeall()
+
+
+# Modos de ejecución: simple y prepared reutilizan la conexión principal
+EXECUTION_MODES = ("simple", "prepared", "connect", "pooled")
+
+
+def make_executor(mode, conn=None, pool_size=1):
+    """Crear el ejecutor de un modo de EXECUTION_MODES"""
+    if mode == "simple":
+        return SimpleExecutor(conn or connect_db())
+    if mode == "prepared":
+        return PreparedExecutor(conn or connect_db())
+    if mode == "connect":
+        return ConnectExecutor()
+    if mode == "pooled":
+        return PooledExecutor(1, pool_size)
+    raise ValueError(f"modo de ejecución desconocido: {mode}")
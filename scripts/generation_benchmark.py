@@ -0,0 +1,231 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+from faker import Faker
+
+from benchmark_stats import percentile
+from db import connect_db, wait_for_db
+from populate_db import (
+    GENERATORS,
+    LOADERS,
+    MAX_ITEMS_PER_ORDER,
+    ProductAttributes,
+    derive_seed,
+    generator_functions,
+    reserve_range,
+    scaled_counts,
+)
+
+
+def parse_generators(value):
+    """Leer la lista de generadores separados por comas"""
+    generators = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in generators if name not in GENERATORS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"generador desconocido: {', '.join(unknown)}")
+    return generators
+
+
+def populate_all(conn, source, extra, counts, seed, loader, category_ids):
+    """Generar y cargar todas las tablas en la transacción actual; (filas, segundos) por tabla
+
+    Cada tabla se genera en un solo bloque y en un solo proceso, con las mismas
+    funciones populate_* que usa populate_db.py. pedido, pedido_item y pago se
+    generan juntos: se informan como una sola entrada con su tiempo y sus
+    filas conjuntas, como en run_stage.
+    """
+    rng = random.Random(seed)
+    fake = Faker("es_CO")
+    fake.seed_instance(seed)
+    attributes = ProductAttributes(derive_seed(seed, "ProductAttributes"))
+
+    user_ids = reserve_range(conn, "usuario", "usuario_id", counts["usuario"])
+    vendor_ids = reserve_range(conn, "vendedor", "vendedor_id", counts["vendedor"])
+    address_ids = reserve_range(conn, "direccion", "direccion_id", counts["direccion"])
+    cart_ids = reserve_range(conn, "carrito", "carrito_id", counts["usuario"] // 2)
+    product_ids = reserve_range(conn, "producto", "producto_id", counts["producto"])
+    inventory_ids = reserve_range(
+        conn, "inventario", "inventario_id", counts["producto"]
+    )
+    review_ids = reserve_range(conn, "resena", "resena_id", counts["resena"])
+    order_ids = reserve_range(conn, "pedido", "pedido_id", counts["pedido"])
+    item_ids = reserve_range(
+        conn, "pedido_item", "pedido_item_id", counts["pedido"] * MAX_ITEMS_PER_ORDER
+    )
+    payment_ids = reserve_range(conn, "pago", "pago_id", counts["pedido"])
+
+    steps = [
+        (source.populate_users, user_ids, {}),
+        (
+            source.populate_vendors,
+            vendor_ids,
+            {"user_ids": user_ids[: len(vendor_ids)]},
+        ),
+        (
+            source.populate_addresses,
+            address_ids,
+            {"user_ids": user_ids[: len(address_ids)]},
+        ),
+        (source.populate_carts, cart_ids, {"user_ids": user_ids[: len(cart_ids)]}),
+        (
+            source.populate_products,
+            product_ids,
+            {
+                "vendor_ids": vendor_ids,
+                "category_ids": category_ids,
+                "attributes": attributes,
+            },
+        ),
+        (source.populate_inventory, inventory_ids, {"product_ids": product_ids}),
+        (
+            source.populate_reviews,
+            review_ids,
+            {"user_ids": user_ids, "product_ids": product_ids},
+        ),
+        (
+            source.populate_orders,
+            order_ids,
+            {
+                "item_ids": item_ids,
+                "payment_ids": payment_ids,
+                "user_ids": user_ids,
+                "address_ids": address_ids,
+                "product_ids": product_ids,
+                "attributes": attributes,
+            },
+        ),
+    ]
+    timings = {}
+    for populate, ids, kwargs in steps:
+        start = time.perf_counter()
+        loaded = populate(conn, rng, fake, loader, ids, **kwargs, **extra)
+        elapsed = time.perf_counter() - start
+        timings[" + ".join(loaded)] = (sum(loaded.values()), elapsed)
+    return timings
+
+
+def run_benchmark(conn, generators, scale_factor, loader, repetitions, seed, skew):
+    """Filas/s por tabla de cada generador; cada repetición se revierte con ROLLBACK"""
+    counts = scaled_counts(scale_factor)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT categoria_id FROM categoria ORDER BY categoria_id")
+        category_ids = [row[0] for row in cursor.fetchall()]
+    conn.rollback()
+    if not category_ids:
+        raise RuntimeError("No hay categorías: ejecuta populate_db.py primero")
+
+    samples, preparation = {}, {}
+    for name in generators:
+        source, extra = generator_functions(name, seed, skew)
+        # Los pools de vocabulario se construyen una vez por proceso: fuera de la medición
+        preparation[name] = extra["columns"].prepare() if "columns" in extra else 0.0
+        for _ in range(repetitions):
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL eshopify.metricas_vendedor = 'diferido'")
+            timings = populate_all(
+                conn, source, extra, counts, seed, loader, category_ids
+            )
+            conn.rollback()
+            for table, (rows, elapsed) in timings.items():
+                samples.setdefault(table, {}).setdefault(name, []).append(
+                    (rows, elapsed)
+                )
+
+    report = []
+    for table, by_generator in samples.items():
+        row = {"tabla": table}
+        for name, values in by_generator.items():
+            seconds = percentile(sorted(elapsed for _, elapsed in values), 50)
+            rows = values[0][0]
+            row["filas"] = rows
+            row[name] = {
+                "mediana_ms": seconds * 1000,
+                "filas_por_segundo": rows / seconds if seconds > 0 else 0,
+            }
+        if "faker" in row and "numpy" in row and row["numpy"]["mediana_ms"] > 0:
+            row["aceleracion"] = row["faker"]["mediana_ms"] / row["numpy"]["mediana_ms"]
+        report.append(row)
+    return {"preparacion_s": preparation, "resultados": report}
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Filas/segundo por tabla de los generadores de populate_db.py"
+    )
+    parser.add_argument(
+        "--generators",
+        type=parse_generators,
+        default=list(GENERATORS),
+        help=f"generadores separados por comas ({', '.join(GENERATORS)})",
+    )
+    parser.add_argument(
+        "--scale-factor", type=float, default=1, help="tamaño de cada medición"
+    )
+    parser.add_argument(
+        "--loader", choices=LOADERS, default="copy", help="loader de la carga"
+    )
+    parser.add_argument("--repetitions", type=int, default=3, help="repeticiones")
+    parser.add_argument("--seed", type=int, default=42, help="semilla de los datos")
+    parser.add_argument(
+        "--skew", type=float, default=1.0, help="exponente Zipf del generador numpy"
+    )
+    parser.add_argument("--output-json", help="ruta del JSON de resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+    conn = connect_db()
+    try:
+        try:
+            report = run_benchmark(
+                conn,
+                args.generators,
+                args.scale_factor,
+                args.loader,
+                args.repetitions,
+                args.seed,
+                args.skew,
+            )
+        except RuntimeError as e:
+            print(e)
+            return
+        print(
+            f"\nFactor de escala {args.scale_factor:g}, loader {args.loader}, mediana de {args.repetitions} repeticiones"
+        )
+        for name, seconds in report["preparacion_s"].items():
+            if seconds:
+                print(f"Pools de vocabulario ({name}): {seconds:.2f} s por proceso")
+        for row in report["resultados"]:
+            line = f"{row['tabla']:>26} ({row['filas']:>6} filas):"
+            for name in args.generators:
+                line += f" {name} {row[name]['filas_por_segundo']:>9,.0f} filas/s"
+            if "aceleracion" in row:
+                line += f"  x{row['aceleracion']:.1f}"
+            print(line)
+        if args.output_json:
+            report["fecha"] = datetime.now().isoformat(timespec="seconds")
+            report["configuracion"] = {
+                "generadores": args.generators,
+                "factor_escala": args.scale_factor,
+                "loader": args.loader,
+                "repeticiones": args.repetitions,
+                "semilla": args.seed,
+                "asimetria": args.skew,
+            }
+            with open(args.output_json, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"\nResultados JSON guardados en {args.output_json}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
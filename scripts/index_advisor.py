@@ -0,0 +1,845 @@
+import argparse
+import json
+import random
+import re
+import time
+from datetime import datetime
+
+import psycopg2
+
+from benchmark_stats import summarize
+from compare_plans import walk
+from db import connect_db, wait_for_db
+from load_generator import DEFAULT_MIX, is_write, parse_mix
+from load_report import statements_available
+from workload import (
+    DEFAULT_WORKLOAD,
+    ParameterSampler,
+    load_workload,
+    split_supported,
+)
+
+# Nodos que leen una relación
+SCAN_NODES = ("Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+
+# Condiciones de un nodo de lectura y de un join
+SCAN_CONDITIONS = ("Filter", "Index Cond", "Recheck Cond")
+JOIN_CONDITIONS = ("Hash Cond", "Merge Cond", "Join Filter")
+
+# Operando izquierdo (columna, con alias opcional) y operador de una comparación
+LEFT_OPERAND = re.compile(
+    r"(?:\b(\w+)\.)?\b(\w+)\)?(?:::[\w ]+?)?\)?\s*(=|<>|>=|<=|>|<|~~\*?)\s"
+)
+# Operando derecho cuando es otra columna (condiciones de join)
+RIGHT_OPERAND = re.compile(r"(?:=|<>|>=|<=|>|<)\s*\(?(\w+)\.(\w+)\b")
+# Clave de un Sort: "p.precio DESC", "precio"
+SORT_KEY = re.compile(r"^(?:(\w+)\.)?(\w+)( DESC)?$")
+
+RANGE_OPERATORS = (">=", "<=", ">", "<")
+
+# Índices secundarios existentes: ni primarios, ni únicos, ni respaldo de una
+# restricción, ni índices de partición
+EXISTING_INDEXES_SQL = """
+SELECT i.indexrelid::regclass::TEXT, c.relname, am.amname, pg_get_indexdef(i.indexrelid),
+       ARRAY(SELECT a.attname FROM unnest(i.indkey) WITH ORDINALITY k(attnum, n)
+             LEFT JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+             ORDER BY k.n)::TEXT[],
+       pg_relation_size(i.indexrelid),
+       COALESCE((SELECT SUM(s.idx_scan) FROM pg_stat_user_indexes s
+                 WHERE s.indexrelid = i.indexrelid
+                    OR s.indexrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = i.indexrelid)), 0),
+       i.indisprimary OR i.indisunique
+           OR EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indrelid
+JOIN pg_class ic ON ic.oid = i.indexrelid
+JOIN pg_am am ON am.oid = ic.relam
+WHERE c.relnamespace = 'public'::regnamespace
+  AND NOT EXISTS (SELECT 1 FROM pg_inherits h WHERE h.inhrelid = i.indexrelid)
+ORDER BY 1
+"""
+
+# Columnas iniciales de las claves foráneas (un índice que empiece por ellas
+# acelera los borrados y actualizaciones de la tabla referenciada)
+FOREIGN_KEY_COLUMNS_SQL = """
+SELECT c.conrelid::regclass::TEXT,
+       ARRAY(SELECT a.attname FROM unnest(c.conkey) WITH ORDINALITY k(attnum, n)
+             JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+             ORDER BY k.n)::TEXT[]
+FROM pg_constraint c
+WHERE c.contype = 'f' AND c.conparentid = 0 AND c.connamespace = 'public'::regnamespace
+"""
+
+# Tabla raíz de cada relación (las particiones aparecen con su propio nombre en los planes)
+TABLE_COLUMNS_SQL = """
+SELECT c.relname, COALESCE(pg_partition_root(c.oid), c.oid)::regclass::TEXT,
+       ARRAY(SELECT attname FROM pg_attribute
+             WHERE attrelid = c.oid AND attnum > 0 AND NOT attisdropped)::TEXT[]
+FROM pg_class c
+WHERE c.relnamespace = 'public'::regnamespace AND c.relkind IN ('r', 'p', 'm')
+"""
+
+# Escrituras por tabla desde el último reinicio de estadísticas
+TABLE_WRITES_SQL = """
+SELECT relname, n_tup_ins + n_tup_upd - n_tup_hot_upd + n_tup_del
+FROM pg_stat_user_tables
+"""
+
+# Sentencias más costosas de pg_stat_statements en la base actual
+TOP_STATEMENTS_SQL = """
+SELECT queryid, query, calls
+FROM pg_stat_statements
+WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+  AND query ~* '^\\s*(SELECT|WITH|UPDATE|DELETE)'
+  AND query !~* '(pg_catalog|pg_stat|information_schema|EXPLAIN)'
+ORDER BY total_exec_time DESC
+LIMIT %s
+"""
+
+# Nombre máximo de un identificador en PostgreSQL
+MAX_IDENTIFIER = 63
+
+
+class Schema:
+    """Columnas, índices y claves foráneas de las tablas del schema"""
+
+    def __init__(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(TABLE_COLUMNS_SQL)
+            rows = cursor.fetchall()
+            self.root = {name: root for name, root, _ in rows}
+            self.columns = {name: set(columns) for name, _, columns in rows}
+            cursor.execute(EXISTING_INDEXES_SQL)
+            self.indexes = [
+                {
+                    "indice": row[0],
+                    "tabla": row[1],
+                    "metodo": row[2],
+                    "definicion": row[3],
+                    # None en las posiciones que son expresiones
+                    "columnas": row[4],
+                    "bytes": row[5],
+                    "idx_scan": int(row[6]),
+                    "restriccion": row[7],
+                }
+                for row in cursor.fetchall()
+            ]
+            cursor.execute(FOREIGN_KEY_COLUMNS_SQL)
+            self.foreign_keys = cursor.fetchall()
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            self.trigram = cursor.fetchone() is not None
+            cursor.execute(TABLE_WRITES_SQL)
+            self.writes = dict(cursor.fetchall())
+        conn.rollback()
+
+    def covered(self, table, columns, method):
+        """Indica si un índice existente empieza por las mismas columnas"""
+        return any(
+            index["tabla"] == table
+            and index["metodo"] == method
+            and index["columnas"][: len(columns)] == list(columns)
+            for index in self.indexes
+        )
+
+    def supports_foreign_key(self, index, dropped=()):
+        """Clave foránea cuyas columnas son las primeras del índice, si hay una
+
+        Solo cuenta si ningún otro índice (fuera de los de dropped) empieza
+        por las mismas columnas.
+        """
+        for table, columns in self.foreign_keys:
+            if table != index["tabla"]:
+                continue
+            covering = [
+                other["indice"]
+                for other in self.indexes
+                if other["tabla"] == table
+                and other["metodo"] == "btree"
+                and other["columnas"][: len(columns)] == columns
+                and other["indice"] not in dropped
+            ]
+            if covering == [index["indice"]]:
+                return ", ".join(columns)
+        return None
+
+    def redundant_with(self, index):
+        """Otro índice del mismo método que empieza por todas las columnas de este
+
+        Con las mismas columnas, solo si el otro respalda una restricción
+        (primario o único) y por lo tanto no se puede eliminar.
+        """
+        if None in index["columnas"]:
+            return None
+        for other in self.indexes:
+            if (
+                other is not index
+                and other["tabla"] == index["tabla"]
+                and other["metodo"] == index["metodo"]
+                and other["columnas"][: len(index["columnas"])] == index["columnas"]
+                and (
+                    len(other["columnas"]) > len(index["columnas"])
+                    or other["restriccion"]
+                )
+            ):
+                return other["indice"]
+        return None
+
+
+def _conditions(node, keys):
+    return " AND ".join(node[key] for key in keys if node.get(key))
+
+
+def plan_usage(plan, schema):
+    """Columnas de cada tabla usadas por un plan EXPLAIN en JSON
+
+    Devuelve {tabla: {"igualdad", "rango", "like", "join", "orden", "seq_scan"}}
+    a partir de los filtros y condiciones de índice de cada lectura, las
+    condiciones de los joins y las claves de los Sort sobre una sola tabla.
+    """
+    aliases = {}
+    usage = {}
+
+    def entry(table):
+        return usage.setdefault(
+            table,
+            {
+                "igualdad": [],
+                "rango": [],
+                "like": [],
+                "join": [],
+                "orden": [],
+                "seq_scan": False,
+            },
+        )
+
+    def add(bucket, column):
+        if column not in bucket:
+            bucket.append(column)
+
+    def resolve(alias, column, default=None):
+        table = aliases.get(alias) if alias else default
+        if table and column in schema.columns.get(table, ()):
+            return schema.root.get(table, table)
+        return None
+
+    root = plan["Plan"]
+    for _, node in walk(root):
+        if node["Node Type"] in SCAN_NODES and node.get("Relation Name"):
+            aliases[node.get("Alias", node["Relation Name"])] = node["Relation Name"]
+
+    for _, node in walk(root):
+        if node["Node Type"] in SCAN_NODES and node.get("Relation Name"):
+            relation = node["Relation Name"]
+            table = schema.root.get(relation, relation)
+            info = entry(table)
+            info["seq_scan"] |= node["Node Type"] == "Seq Scan"
+            for alias, column, operator in LEFT_OPERAND.findall(
+                _conditions(node, SCAN_CONDITIONS)
+            ):
+                if resolve(alias, column, relation) != table:
+                    continue
+                if operator == "=":
+                    add(info["igualdad"], column)
+                elif operator in RANGE_OPERATORS:
+                    add(info["rango"], column)
+                elif operator.startswith("~~"):
+                    add(info["like"], column)
+
+        condition = _conditions(node, JOIN_CONDITIONS)
+        if condition:
+            references = [(a, c) for a, c, _ in LEFT_OPERAND.findall(condition) if a]
+            references += RIGHT_OPERAND.findall(condition)
+            for alias, column in references:
+                table = resolve(alias, column)
+                if table:
+                    add(entry(table)["join"], column)
+
+        if node["Node Type"] in ("Sort", "Incremental Sort"):
+            relations = {
+                child["Relation Name"]
+                for _, child in walk(node)
+                if child["Node Type"] in SCAN_NODES and child.get("Relation Name")
+            }
+            for key in node.get("Sort Key", []):
+                match = SORT_KEY.match(key)
+                if not match:
+                    continue
+                alias, column, descending = match.groups()
+                default = next(iter(relations)) if len(relations) == 1 else None
+                table = resolve(alias, column, default)
+                if table:
+                    add(entry(table)["orden"], column + (descending or ""))
+    return usage
+
+
+def candidate_indexes(usage, schema):
+    """Índices candidatos para las columnas de uso de un plan
+
+    Por tabla: compuesto (igualdades, después el primer rango u orden),
+    columnas de join de tablas leídas con Seq Scan, igualdades sueltas y
+    trigramas para LIKE si pg_trgm está instalada. Se omiten los que ya
+    cubre un índice existente.
+    """
+    candidates = []
+    for table, info in usage.items():
+        options = []
+        trailing = info["rango"][:1] or info["orden"][:1]
+        if info["igualdad"] or trailing:
+            options.append(info["igualdad"] + trailing)
+        if info["seq_scan"]:
+            options += [[column] for column in info["join"]]
+        options += [[column] for column in info["igualdad"]]
+        for columns in options:
+            plain = [column.replace(" DESC", "") for column in columns]
+            if not schema.covered(table, plain, "btree"):
+                candidates.append((table, tuple(columns), "btree"))
+        if schema.trigram:
+            for column in info["like"]:
+                if not schema.covered(table, [column], "gin"):
+                    candidates.append((table, (column,), "gin"))
+    return candidates
+
+
+def candidate_sql(table, columns, method):
+    """Nombre y CREATE INDEX de un candidato"""
+    name = "idx_sugerido_{}_{}".format(
+        table, "_".join(column.replace(" DESC", "_desc") for column in columns)
+    )[:MAX_IDENTIFIER]
+    if method == "gin":
+        keys = ", ".join(f"{column} gin_trgm_ops" for column in columns)
+        return name, f"CREATE INDEX {name} ON {table} USING GIN ({keys})"
+    return name, f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"
+
+
+class Workload:
+    """Sentencias a evaluar, con sus pesos y parámetros
+
+    Con source="workload" son las operaciones de workload.json pesadas por la
+    mezcla de load_generator.py, con `samples` juegos de parámetros cada una, y
+    la latencia se puede medir. Con source="statements" son las sentencias de
+    pg_stat_statements pesadas por sus llamadas; se planifican con
+    EXPLAIN (GENERIC_PLAN) (PostgreSQL 16+) y solo se comparan costos.
+    """
+
+    def __init__(self, operations, measurable):
+        self.operations = operations
+        self.measurable = measurable
+
+    @classmethod
+    def from_workload(cls, conn, path, mix, samples, seed):
+        operations = [op for op in load_workload(path) if mix.get(op["clave"], 0) > 0]
+        operations, skipped = split_supported(conn, operations)
+        if skipped:
+            print(f"Sin soporte en este schema, se omiten: {', '.join(skipped)}")
+        sampler = ParameterSampler(conn)
+        sampler.prepare(operations)
+        rng = random.Random(seed)
+        for operation in operations:
+            operation["peso"] = mix[operation["clave"]]
+            operation["muestras"] = [
+                sampler.draw(operation, rng) or None for _ in range(samples)
+            ]
+        return cls(operations, measurable=True)
+
+    @classmethod
+    def from_statements(cls, conn, top):
+        if conn.server_version < 160000:
+            raise RuntimeError("--source statements requiere PostgreSQL 16+")
+        if not statements_available(conn):
+            raise RuntimeError("pg_stat_statements no está precargada en el servidor")
+        with conn.cursor() as cursor:
+            cursor.execute(TOP_STATEMENTS_SQL, (top,))
+            rows = cursor.fetchall()
+        conn.rollback()
+        operations = [
+            {
+                "clave": f"q{queryid}",
+                "nombre": " ".join(query.split())[:80],
+                "sql": query,
+                "peso": calls,
+                "muestras": [None],
+                "generico": True,
+            }
+            for queryid, query, calls in rows
+        ]
+        return cls(operations, measurable=False)
+
+    def explain(self, conn):
+        """Costo estimado medio y plan de cada operación (sin ejecutarla)"""
+        costs, plans = {}, {}
+        with conn.cursor() as cursor:
+            for operation in self.operations:
+                options = "GENERIC_PLAN, " if operation.get("generico") else ""
+                total = 0.0
+                for params in operation["muestras"]:
+                    cursor.execute(
+                        f"EXPLAIN ({options}FORMAT JSON) "
+                        + operation["sql"].rstrip().rstrip(";"),
+                        params,
+                    )
+                    plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    total += plan[0]["Plan"]["Total Cost"]
+                    plans.setdefault(operation["clave"], plan[0])
+                costs[operation["clave"]] = total / len(operation["muestras"])
+        return costs, plans
+
+    def measure(self, conn, keys, repetitions):
+        """Mediana (ms) de cada operación de keys, en un savepoint que se deshace
+
+        Se ejecuta dentro de la transacción del candidato: el índice creado o
+        eliminado sigue vigente, pero los datos modificados se descartan.
+        """
+        latencies = {}
+        with conn.cursor() as cursor:
+            for operation in self.operations:
+                if operation["clave"] not in keys:
+                    continue
+                samples = []
+                for repetition in range(repetitions + 1):
+                    params = operation["muestras"][
+                        repetition % len(operation["muestras"])
+                    ]
+                    cursor.execute("SAVEPOINT medicion")
+                    if operation.get("preparacion"):
+                        cursor.execute(operation["preparacion"])
+                    start = time.perf_counter_ns()
+                    cursor.execute(operation["sql"], params)
+                    if cursor.description is not None:
+                        cursor.fetchall()
+                    elapsed = time.perf_counter_ns() - start
+                    cursor.execute("ROLLBACK TO SAVEPOINT medicion")
+                    if repetition > 0:  # la primera calienta la caché
+                        samples.append(elapsed)
+                latencies[operation["clave"]] = summarize(samples)["mediana_ms"]
+        return latencies
+
+    def tables_written(self, operation):
+        match = re.match(
+            r"\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+(\w+)",
+            operation["sql"],
+            re.IGNORECASE,
+        )
+        return match.group(1) if match else None
+
+
+class Advisor:
+    """Evalúa índices candidatos y existentes contra la carga de trabajo
+
+    Cada evaluación abre una transacción, crea el candidato (o elimina el
+    índice existente), vuelve a planificar todas las operaciones y, si la
+    carga es medible, mide la latencia de las que cambian de costo y de las
+    escrituras sobre la tabla; al final hace ROLLBACK. CREATE INDEX y
+    DROP INDEX bloquean la tabla hasta el final de la transacción: usar contra
+    una base de pruebas.
+
+    Los candidatos se eligen de a uno (el de mayor ahorro en cada ronda) y
+    cada ronda se evalúa con los elegidos antes ya creados; las eliminaciones
+    se evalúan en orden con los índices elegidos creados y las eliminaciones
+    anteriores aplicadas. Así no se recomiendan dos índices que se sustituyen.
+    """
+
+    def __init__(self, conn, workload, schema, repetitions, threshold):
+        self.conn = conn
+        self.workload = workload
+        self.schema = schema
+        self.repetitions = repetitions
+        self.threshold = threshold
+        self.base_costs, self.base_plans = workload.explain(conn)
+        self.base_latency = {}
+        self.created = []
+        if workload.measurable:
+            self.base_latency = workload.measure(
+                conn, {op["clave"] for op in workload.operations}, repetitions
+            )
+        conn.rollback()
+
+    def candidates(self):
+        """Candidatos únicos de los planes actuales, con las operaciones que los originan"""
+        found = {}
+        for operation in self.workload.operations:
+            usage = plan_usage(self.base_plans[operation["clave"]], self.schema)
+            for candidate in candidate_indexes(usage, self.schema):
+                sources = found.setdefault(candidate, [])
+                if operation["clave"] not in sources:
+                    sources.append(operation["clave"])
+        return found
+
+    def evaluate(self, change_sql, table, size_sql, setup=()):
+        """Costos, latencias y tamaño con un cambio de índices aplicado en una transacción
+
+        Los costos y latencias de referencia se toman en la misma transacción
+        (antes del cambio, y después de deshacerlo con ROLLBACK TO SAVEPOINT),
+        así un ANALYZE automático o el ruido entre evaluaciones no se confunde
+        con el efecto del índice. setup son los cambios ya elegidos, que se
+        aplican antes de tomar la referencia.
+        """
+        try:
+            with self.conn.cursor() as cursor:
+                for sql in setup:
+                    cursor.execute(sql)
+            base_costs, _ = self.workload.explain(self.conn)
+            with self.conn.cursor() as cursor:
+                cursor.execute("SAVEPOINT cambio")
+                cursor.execute(change_sql)
+                size = None
+                if size_sql:
+                    cursor.execute(size_sql)
+                    size = cursor.fetchone()[0]
+            costs, _ = self.workload.explain(self.conn)
+            changed = {
+                key
+                for key, cost in costs.items()
+                if abs(cost - base_costs[key]) > 0.01 * base_costs[key]
+            }
+            written = {
+                op["clave"]
+                for op in self.workload.operations
+                if self.workload.tables_written(op) == table
+            }
+            base_latency = latency = {}
+            if self.workload.measurable:
+                latency = self.workload.measure(
+                    self.conn, changed | written, self.repetitions
+                )
+                with self.conn.cursor() as cursor:
+                    cursor.execute("ROLLBACK TO SAVEPOINT cambio")
+                base_latency = self.workload.measure(
+                    self.conn, changed | written, self.repetitions
+                )
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            return {"error": str(e).strip()}
+        self.conn.rollback()
+        return self.effect(base_costs, costs, base_latency, latency, size)
+
+    def effect(self, base_costs, costs, base_latency, latency, size):
+        """Ganancia de lecturas y costo de escrituras ponderados por la mezcla"""
+        operations = {op["clave"]: op for op in self.workload.operations}
+        total_weight = sum(op["peso"] for op in operations.values())
+        per_operation = {}
+        read_saved = write_added = cost_saved = 0.0
+        for key, cost in costs.items():
+            operation = operations[key]
+            base_cost = base_costs[key]
+            entry = {
+                "costo_antes": base_cost,
+                "costo_despues": cost,
+                "cambio_costo_pct": (
+                    100 * (cost - base_cost) / base_cost if base_cost else 0.0
+                ),
+            }
+            weight = operation["peso"] / total_weight
+            cost_saved += weight * (base_cost - cost)
+            if key in latency:
+                entry["latencia_antes_ms"] = base_latency[key]
+                entry["latencia_despues_ms"] = latency[key]
+                delta = base_latency[key] - latency[key]
+                if is_write(operation):
+                    write_added -= weight * delta
+                else:
+                    read_saved += weight * delta
+            if abs(entry["cambio_costo_pct"]) >= 1 or key in latency:
+                per_operation[key] = entry
+        total_cost = sum(
+            operations[key]["peso"] / total_weight * cost
+            for key, cost in base_costs.items()
+        )
+        return {
+            "ganancia_costo_pct": 100 * cost_saved / total_cost if total_cost else 0.0,
+            "mejor_mejora_pct": max(
+                (-entry["cambio_costo_pct"] for entry in per_operation.values()),
+                default=0.0,
+            ),
+            "lecturas_ahorro_ms": read_saved if latency else None,
+            "escrituras_costo_ms": write_added if latency else None,
+            "bytes": size,
+            "operaciones": per_operation,
+        }
+
+    def evaluate_candidates(self):
+        """Elegir candidatos de a uno; devuelve los elegidos y los descartados"""
+        pending = self.candidates()
+        self.created = []
+        results = []
+        while pending:
+            round_results = []
+            for (table, columns, method), sources in pending.items():
+                name, sql = candidate_sql(table, columns, method)
+                result = self.evaluate(
+                    sql,
+                    table,
+                    f"SELECT pg_relation_size('{name}')",
+                    [r["sql"] for r in self.created],
+                )
+                result.update(
+                    {
+                        "indice": name,
+                        "tabla": table,
+                        "sql": sql,
+                        "origen": sources,
+                        "escrituras_tabla": self.schema.writes.get(table, 0),
+                        "clave": (table, columns, method),
+                    }
+                )
+                result["recomendacion"] = self.recommend_create(result)
+                round_results.append(result)
+            round_results.sort(key=lambda result: -result.get("ganancia_costo_pct", 0))
+            best = round_results[0]
+            if best["recomendacion"] != "crear":
+                results += round_results
+                break
+            self.created.append(best)
+            results.append(best)
+            del pending[best["clave"]]
+        for result in results:
+            del result["clave"]
+        return results
+
+    def evaluate_existing(self):
+        """Evaluar la eliminación de cada índice secundario, acumulando las elegidas"""
+        setup = [result["sql"] for result in self.created]
+        dropped = set()
+        results = []
+        for index in self.schema.indexes:
+            if index["restriccion"]:
+                continue
+            result = self.evaluate(
+                f"DROP INDEX {index['indice']}", index["tabla"], None, setup
+            )
+            result.update(
+                {
+                    "indice": index["indice"],
+                    "tabla": index["tabla"],
+                    "sql": index["definicion"],
+                    "bytes": index["bytes"],
+                    "idx_scan": index["idx_scan"],
+                    "clave_foranea": self.schema.supports_foreign_key(index, dropped),
+                    "redundante_con": self.schema.redundant_with(index),
+                    "escrituras_tabla": self.schema.writes.get(index["tabla"], 0),
+                }
+            )
+            result["recomendacion"] = self.recommend_drop(result)
+            if result["recomendacion"] == "eliminar":
+                setup = setup + [f"DROP INDEX {index['indice']}"]
+                dropped.add(index["indice"])
+            results.append(result)
+        return results
+
+    def recommend_create(self, result):
+        """crear si alguna operación mejora al menos threshold% y el neto medido es positivo"""
+        if "error" in result or result["mejor_mejora_pct"] < self.threshold:
+            return "descartar"
+        if result["lecturas_ahorro_ms"] is not None and (
+            result["lecturas_ahorro_ms"] <= result["escrituras_costo_ms"]
+        ):
+            return "descartar"
+        return "crear"
+
+    def recommend_drop(self, result):
+        """eliminar si ninguna operación empeora threshold% o más sin el índice
+
+        Los índices que empiezan por las columnas de una clave foránea se
+        mantienen: sirven a los borrados y actualizaciones de la tabla
+        referenciada, que la carga de trabajo no ejecuta. Los que la carga no
+        necesita pero tienen lecturas en pg_stat_user_indexes quedan para
+        revisar (los usa otra consulta), salvo que otro índice los cubra.
+        """
+        if "error" in result:
+            return "mantener"
+        worst = max(
+            (entry["cambio_costo_pct"] for entry in result["operaciones"].values()),
+            default=0.0,
+        )
+        if worst >= self.threshold:
+            return "mantener"
+        if result["clave_foranea"]:
+            return "mantener (clave foránea)"
+        if result["idx_scan"] and not result["redundante_con"]:
+            return "revisar"
+        return "eliminar"
+
+
+def format_bytes(value):
+    return "-" if value is None else f"{value / 1024:,.0f} KB"
+
+
+def format_ms(value):
+    return "-" if value is None else f"{value:+.3f}"
+
+
+def render_sql(created, dropped):
+    """Script SQL con los índices recomendados"""
+    lines = ["-- Índices recomendados por index_advisor.py", ""]
+    for result in created:
+        lines.append(
+            f"-- ahorro de costo {result['ganancia_costo_pct']:.1f}% (origen: {', '.join(result['origen'])})"
+        )
+        lines.append(result["sql"] + ";")
+    for result in dropped:
+        reason = (
+            f"redundante con {result['redundante_con']}"
+            if result["redundante_con"]
+            else "sin uso en la carga de trabajo"
+        )
+        lines.append(f"-- {reason}; {format_bytes(result['bytes'])}")
+        lines.append(f"DROP INDEX IF EXISTS {result['indice']};")
+    return "\n".join(lines) + "\n"
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Proponer índices a crear y eliminar a partir de la carga de trabajo"
+    )
+    parser.add_argument(
+        "--source",
+        choices=("workload", "statements"),
+        default="workload",
+        help="workload: operaciones de workload.json (costos y latencia); statements: pg_stat_statements (solo costos, PostgreSQL 16+)",
+    )
+    parser.add_argument(
+        "--workload", default=DEFAULT_WORKLOAD, help="archivo JSON de consultas"
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="pesos clave=peso de las operaciones (por defecto la mezcla de load_generator.py)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="sentencias de pg_stat_statements con --source statements",
+    )
+    parser.add_argument(
+        "--samples", type=int, default=3, help="juegos de parámetros por operación"
+    )
+    parser.add_argument(
+        "--repetitions",
+        type=int,
+        default=10,
+        help="ejecuciones medidas por operación y cambio de índices",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="mejora (o empeoramiento) mínima del costo de una operación, en %%",
+    )
+    parser.add_argument(
+        "--no-drop",
+        action="store_true",
+        help="no evaluar la eliminación de los índices existentes",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="semilla")
+    parser.add_argument("--output-json", help="ruta del JSON de resultados")
+    parser.add_argument("--output-sql", help="ruta del script con las recomendaciones")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+
+    conn = connect_db()
+    try:
+        schema = Schema(conn)
+        if args.source == "workload":
+            workload = Workload.from_workload(
+                conn, args.workload, args.mix, args.samples, args.seed
+            )
+        else:
+            try:
+                workload = Workload.from_statements(conn, args.top)
+            except RuntimeError as e:
+                print(f"Error: {e}")
+                return
+        advisor = Advisor(conn, workload, schema, args.repetitions, args.threshold)
+        print(
+            f"\n{len(workload.operations)} operaciones, {len(schema.indexes)} índices existentes"
+        )
+
+        candidates = advisor.evaluate_candidates()
+        print(f"\nCandidatos ({len(candidates)}):")
+        for result in candidates:
+            if "error" in result:
+                print(f"  {result['indice']}: error {result['error']}")
+                continue
+            print(
+                f"  [{result['recomendacion']}] {result['sql']}\n"
+                f"      ahorro de costo {result['ganancia_costo_pct']:+.1f}% ponderado (mejor operación -{result['mejor_mejora_pct']:.1f}%),"
+                f" lecturas ahorran {format_ms(result['lecturas_ahorro_ms'])} ms, escrituras cuestan {format_ms(result['escrituras_costo_ms'])} ms,"
+                f" {format_bytes(result['bytes'])}, {result['escrituras_tabla']:,} escrituras en {result['tabla']}"
+            )
+
+        existing = [] if args.no_drop else advisor.evaluate_existing()
+        if existing:
+            print(f"\nÍndices existentes ({len(existing)}):")
+        for result in existing:
+            if "error" in result:
+                print(f"  {result['indice']}: error {result['error']}")
+                continue
+            notes = []
+            if result["redundante_con"]:
+                notes.append(f"redundante con {result['redundante_con']}")
+            if result["clave_foranea"]:
+                notes.append(f"clave foránea ({result['clave_foranea']})")
+            worst = max(
+                (e["cambio_costo_pct"] for e in result["operaciones"].values()),
+                default=0.0,
+            )
+            print(
+                f"  [{result['recomendacion']}] {result['indice']}: sin él, peor operación {worst:+.1f}% de costo,"
+                f" lecturas ahorran {format_ms(result['lecturas_ahorro_ms'])} ms, escrituras cuestan {format_ms(result['escrituras_costo_ms'])} ms,"
+                f" {format_bytes(result['bytes'])},"
+                f" idx_scan {result['idx_scan']:,}"
+                + (f"; {'; '.join(notes)}" if notes else "")
+            )
+    finally:
+        conn.close()
+
+    created = [r for r in candidates if r["recomendacion"] == "crear"]
+    dropped = [r for r in existing if r["recomendacion"] == "eliminar"]
+    print(
+        f"\nCrear: {', '.join(r['indice'] for r in created) or '-'}"
+        f"\nEliminar: {', '.join(r['indice'] for r in dropped) or '-'}"
+    )
+
+    if args.output_sql:
+        with open(args.output_sql, "w", encoding="utf-8") as f:
+            f.write(render_sql(created, dropped))
+        print(f"Recomendaciones SQL guardadas en {args.output_sql}")
+    if args.output_json:
+        report = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "configuracion": {
+                "origen": args.source,
+                "mezcla": args.mix if args.source == "workload" else None,
+                "muestras": args.samples,
+                "repeticiones": args.repetitions,
+                "umbral_pct": args.threshold,
+                "semilla": args.seed,
+            },
+            "operaciones": {
+                op["clave"]: {
+                    "peso": op["peso"],
+                    "costo": advisor.base_costs[op["clave"]],
+                    "latencia_ms": advisor.base_latency.get(op["clave"]),
+                }
+                for op in workload.operations
+            },
+            "candidatos": candidates,
+            "existentes": existing,
+        }
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Resultados JSON guardados en {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
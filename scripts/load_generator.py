@@ -0,0 +1,509 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+
+from benchmark_stats import histogram, percentile, summarize
+from db import DB_SETTINGS, connect_db, wait_for_db
+from query_cache import (
+    CacheInvalidator,
+    QueryCache,
+    SharedCache,
+    is_stale,
+    notifications_enabled,
+    read_through,
+)
+from workload import (
+    DEFAULT_WORKLOAD,
+    ParameterSampler,
+    load_workload,
+    split_supported,
+)
+
+# Sentencias que modifican datos (cuentan para TPS)
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+# Mezcla por defecto: ~80% lecturas, ~20% escrituras
+DEFAULT_MIX = {
+    "consulta1": 25,
+    "consulta2": 5,
+    "consulta3": 15,
+    "consulta4": 5,
+    "consulta5": 5,
+    "consulta6": 10,
+    "like": 15,
+    "busqueda": 15,
+    "insertar": 5,
+    "actualizar": 5,
+    "eliminar": 2,
+    "resena": 8,
+}
+
+
+def parse_mix(text):
+    """Leer una mezcla de pesos clave=peso separados por comas"""
+    mix = {}
+    for part in text.split(","):
+        key, _, weight = part.partition("=")
+        mix[key.strip()] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("la mezcla necesita al menos un peso > 0")
+    return mix
+
+
+def is_write(operation):
+    """Indica si la operación modifica datos"""
+    return operation["sql"].lstrip().upper().startswith(WRITE_STATEMENTS)
+
+
+def execute_operation(conn, operation, params, commit):
+    """Ejecutar una transacción de la operación y devolver su latencia en ns"""
+    with conn.cursor() as cursor:
+        if operation.get("preparacion"):
+            cursor.execute(operation["preparacion"])
+        start = time.perf_counter_ns()
+        cursor.execute(operation["sql"], params or None)
+        if cursor.description is not None:
+            cursor.fetchall()
+        if commit and is_write(operation):
+            conn.commit()
+        else:
+            conn.rollback()
+        return time.perf_counter_ns() - start
+
+
+def execute_cached(conn, cache, operation, params, verify, rng):
+    """Ejecutar una consulta a través de la caché; devuelve (latencia en ns, acierto, obsoleta)
+
+    Una fracción verify de los aciertos se compara con la base de datos, fuera
+    de la medición; obsoleta es None si el resultado no se verificó.
+    """
+    start = time.perf_counter_ns()
+    rows, hit = read_through(cache, conn, operation, params)
+    elapsed = time.perf_counter_ns() - start
+    stale = None
+    if hit and verify and rng.random() < verify:
+        stale = is_stale(conn, operation, params, rows)
+    return elapsed, hit, stale
+
+
+def run_client(
+    index,
+    operations,
+    mix,
+    sampler,
+    seed,
+    measure_from,
+    stop_at,
+    commit,
+    results,
+    cache=None,
+    verify=0.0,
+):
+    """Bucle de un cliente: elegir operaciones según la mezcla hasta stop_at
+
+    Los errores de base de datos de una operación se cuentan y el cliente
+    sigue. Cualquier otra excepción (o no poder conectarse) termina el
+    cliente. Queda registrada en results[index] para que el run falle en lugar
+    de reportar menos clientes.
+    """
+    keys = list(mix)
+    weights = [mix[key] for key in keys]
+    rng = random.Random(seed * 1000 + index)
+    samples = {key: [] for key in keys}
+    errors = {key: {} for key in keys}
+    cached = {
+        key: {"aciertos": [], "fallos": [], "verificadas": 0, "obsoletas": 0}
+        for key in keys
+        if cache is not None and "cache" in operations[key]
+    }
+
+    failure = None
+    conn = None
+    try:
+        # connect_db() termina el proceso con sys.exit, que en un hilo solo lo
+        # termina a él sin dejar rastro
+        conn = psycopg2.connect(**DB_SETTINGS)
+        while time.perf_counter() < stop_at:
+            key = rng.choices(keys, weights)[0]
+            params = sampler.draw(operations[key], rng)
+            started = time.perf_counter()
+            try:
+                if key in cached:
+                    elapsed, hit, stale = execute_cached(
+                        conn, cache, operations[key], params, verify, rng
+                    )
+                else:
+                    elapsed = execute_operation(conn, operations[key], params, commit)
+            except psycopg2.Error as e:
+                conn.rollback()
+                if started >= measure_from:
+                    name = type(e).__name__
+                    errors[key][name] = errors[key].get(name, 0) + 1
+                continue
+            if started >= measure_from:
+                samples[key].append(elapsed)
+                if key in cached:
+                    cached[key]["aciertos" if hit else "fallos"].append(elapsed)
+                    if stale is not None:
+                        cached[key]["verificadas"] += 1
+                        cached[key]["obsoletas"] += stale
+    except Exception as e:
+        failure = f"{type(e).__name__}: {e}".strip()
+    finally:
+        if conn is not None:
+            conn.close()
+    results[index] = (samples, errors, cached, failure)
+
+
+def run_load(
+    operations,
+    mix,
+    clients,
+    duration,
+    ramp_up,
+    seed,
+    commit,
+    sampler,
+    cache=None,
+    verify=0.0,
+):
+    """Lanzar los clientes concurrentes y combinar sus muestras
+
+    Devuelve también los clientes que terminaron con una excepción.
+    """
+    results = [None] * clients
+    start = time.perf_counter()
+    measure_from = start + ramp_up
+    stop_at = measure_from + duration
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(
+                i,
+                operations,
+                mix,
+                sampler,
+                seed,
+                measure_from,
+                stop_at,
+                commit,
+                results,
+                cache,
+                verify,
+            ),
+        )
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    samples = {key: [] for key in mix}
+    errors = {key: {} for key in mix}
+    cached = {}
+    failures = []
+    for index, result in enumerate(results):
+        if result is None:
+            failures.append({"cliente": index, "error": "terminó sin resultados"})
+            continue
+        client_samples, client_errors, client_cached, failure = result
+        if failure is not None:
+            failures.append({"cliente": index, "error": failure})
+        for key in mix:
+            samples[key].extend(client_samples[key])
+            for name, count in client_errors[key].items():
+                errors[key][name] = errors[key].get(name, 0) + count
+        for key, values in client_cached.items():
+            merged = cached.setdefault(
+                key, {"aciertos": [], "fallos": [], "verificadas": 0, "obsoletas": 0}
+            )
+            for name, value in values.items():
+                merged[name] += value
+    return samples, errors, cached, failures
+
+
+def cache_report(cached, duration):
+    """Tasa de aciertos, lecturas obsoletas y latencia ahorrada de una consulta en caché
+
+    El ahorro estima lo que habrían costado los aciertos como fallos: aciertos
+    x (latencia media de fallo - latencia media de acierto).
+    """
+    hits, misses = cached["aciertos"], cached["fallos"]
+    report = {
+        "aciertos": len(hits),
+        "fallos": len(misses),
+        "tasa_aciertos": len(hits) / (len(hits) + len(misses)) if hits or misses else 0,
+        "verificadas": cached["verificadas"],
+        "obsoletas": cached["obsoletas"],
+    }
+    if hits:
+        report["acierto_mediana_ms"] = summarize(hits)["mediana_ms"]
+    if misses:
+        report["fallo_mediana_ms"] = summarize(misses)["mediana_ms"]
+    if hits and misses:
+        saved_ms = len(hits) * (sum(misses) / len(misses) - sum(hits) / len(hits)) / 1e6
+        report["ahorro_ms"] = saved_ms
+        report["ahorro_ms_por_segundo"] = saved_ms / duration
+    return report
+
+
+def build_report(operations, mix, duration, samples, errors, cached=None):
+    """Throughput global y latencias/histograma por operación"""
+    results = []
+    for key in mix:
+        operation = operations[key]
+        result = {
+            "clave": key,
+            "nombre": operation["nombre"],
+            "descripcion": operation["descripcion"],
+            "peso": mix[key],
+            "completadas": len(samples[key]),
+            "errores": errors[key],
+            "por_segundo": len(samples[key]) / duration,
+        }
+        if samples[key]:
+            result.update(summarize(samples[key]))
+            result["histograma_ms"] = histogram(
+                [sample / 1e6 for sample in samples[key]]
+            )
+        if cached and key in cached:
+            result["cache"] = cache_report(cached[key], duration)
+        results.append(result)
+
+    total = sum(len(samples[key]) for key in mix)
+    writes = sum(len(samples[key]) for key in mix if is_write(operations[key]))
+    return {
+        "qps": total / duration,
+        "tps": writes / duration,
+        "total_operaciones": total,
+        "total_errores": sum(sum(e.values()) for e in errors.values()),
+        "operaciones": results,
+    }
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Generador de carga concurrente para e_shopify_db"
+    )
+    parser.add_argument(
+        "--clients", type=int, default=8, help="clientes concurrentes (conexiones)"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30, help="segundos de medición"
+    )
+    parser.add_argument(
+        "--ramp-up",
+        type=float,
+        default=5,
+        help="segundos iniciales de carga sin medir",
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="pesos por operación (claves del archivo de consultas),"
+        " p. ej. consulta1=50,like=30,resena=20",
+    )
+    parser.add_argument(
+        "--workload", default=DEFAULT_WORKLOAD, help="archivo JSON de consultas"
+    )
+    parser.add_argument(
+        "--fixed-params",
+        action="store_true",
+        help='usar siempre los parámetros "defecto" del archivo de consultas',
+    )
+    parser.add_argument(
+        "--commit",
+        action="store_true",
+        help="confirmar las escrituras (por defecto terminan con ROLLBACK)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="semilla de la secuencia de operaciones y sus parámetros",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help='servir desde caché las consultas con "cache" en el archivo de consultas',
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=1000, help="entradas máximas de la caché"
+    )
+    parser.add_argument(
+        "--cache-ttl", type=float, default=60, help="segundos de vida de cada entrada"
+    )
+    parser.add_argument(
+        "--cache-shared",
+        help="archivo SQLite de la caché compartida entre procesos (segundo nivel)",
+    )
+    parser.add_argument(
+        "--cache-verify",
+        type=float,
+        default=0.0,
+        help="fracción de aciertos comparados con la base de datos (lecturas obsoletas)",
+    )
+    parser.add_argument(
+        "--label", default="carga", help="etiqueta del run (baseline, optimized)"
+    )
+    parser.add_argument("--output-json", help="ruta del JSON de resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print("GENERADOR DE CARGA INICIADO")
+
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+
+    operations = {op["clave"]: op for op in load_workload(args.workload)}
+    unknown = [key for key in args.mix if key not in operations]
+    if unknown:
+        print(
+            f"Operaciones desconocidas: {', '.join(unknown)} (válidas: {', '.join(operations)})"
+        )
+        return
+
+    # Los valores de los parámetros se cargan una vez y se comparten entre hilos
+    conn = connect_db()
+    _, skipped = split_supported(conn, [operations[key] for key in args.mix])
+    if skipped:
+        print(f"Sin soporte en este schema, se omiten: {', '.join(skipped)}")
+        args.mix = {key: args.mix[key] for key in args.mix if key not in skipped}
+        if not args.mix:
+            conn.close()
+            return
+    sampler = ParameterSampler(conn, fixed=args.fixed_params)
+    sampler.prepare([operations[key] for key in args.mix])
+    cache = invalidator = None
+    if args.cache:
+        if not notifications_enabled(conn):
+            print(
+                "Sin triggers de notificación en el schema: la caché solo expira por TTL"
+            )
+        shared = SharedCache(args.cache_shared) if args.cache_shared else None
+        cache = QueryCache(args.cache_size, args.cache_ttl, shared)
+        invalidator = CacheInvalidator(cache)
+        invalidator.start()
+        invalidator.ready.wait(10)
+    conn.close()
+
+    print(
+        f"\n{args.clients} clientes, {args.ramp_up:g} s de rampa + {args.duration:g} s medidos"
+        f" ({'COMMIT' if args.commit else 'ROLLBACK'} en escrituras)"
+    )
+    print(
+        "Mezcla: " + ", ".join(f"{key}={weight:g}" for key, weight in args.mix.items())
+    )
+
+    samples, errors, cached, failures = run_load(
+        operations,
+        args.mix,
+        args.clients,
+        args.duration,
+        args.ramp_up,
+        args.seed,
+        args.commit,
+        sampler,
+        cache,
+        args.cache_verify,
+    )
+    report = build_report(operations, args.mix, args.duration, samples, errors, cached)
+    report["clientes_fallidos"] = failures
+    if invalidator is not None:
+        invalidator.stop()
+        lags = sorted(invalidator.lags_ms)
+        report["cache"] = {
+            "estadisticas": cache.stats,
+            "tasa_aciertos": cache.hit_ratio(),
+            "notificaciones": dict(invalidator.notifications),
+            "desfase_invalidacion_mediana_ms": percentile(lags, 50) if lags else None,
+            "desfase_invalidacion_p99_ms": percentile(lags, 99) if lags else None,
+        }
+
+    print(f"\nQPS: {report['qps']:.1f}  TPS (escrituras): {report['tps']:.1f}")
+    print(f"Errores: {report['total_errores']}")
+    for failure in failures:
+        print(f"Cliente {failure['cliente']} terminado: {failure['error']}")
+    for result in report["operaciones"]:
+        line = f"{result['nombre']}: {result['completadas']} ops ({result['por_segundo']:.1f}/s)"
+        if result["completadas"]:
+            line += (
+                f" - mediana {result['mediana_ms']:.3f} ms, p95 {result['p95_ms']:.3f} ms,"
+                f" p99 {result['p99_ms']:.3f} ms"
+            )
+        if result["errores"]:
+            line += f" - errores {result['errores']}"
+        if "cache" in result:
+            cached_result = result["cache"]
+            line += f" - caché {cached_result['tasa_aciertos']:.1%} aciertos"
+            if "ahorro_ms_por_segundo" in cached_result:
+                line += f", {cached_result['ahorro_ms_por_segundo']:.1f} ms ahorrados/s"
+            if cached_result["verificadas"]:
+                line += f", {cached_result['obsoletas']}/{cached_result['verificadas']} obsoletas"
+        print(line)
+    if "cache" in report:
+        cache_summary = report["cache"]
+        line = (
+            f"Caché: {cache_summary['tasa_aciertos']:.1%} aciertos,"
+            f" {cache_summary['estadisticas']['invalidadas']} entradas invalidadas"
+            f" por {sum(cache_summary['notificaciones'].values())} notificaciones"
+        )
+        if cache_summary["desfase_invalidacion_mediana_ms"] is not None:
+            line += (
+                f", desfase de invalidación mediana {cache_summary['desfase_invalidacion_mediana_ms']:.2f} ms"
+                f" (p99 {cache_summary['desfase_invalidacion_p99_ms']:.2f} ms)"
+            )
+        print(line)
+
+    if args.output_json:
+        document = {
+            "etiqueta": args.label,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "configuracion": {
+                "clientes": args.clients,
+                "duracion_s": args.duration,
+                "rampa_s": args.ramp_up,
+                "mezcla": args.mix,
+                "commit": args.commit,
+                "semilla": args.seed,
+                "carga": args.workload,
+                "parametros_fijos": args.fixed_params,
+                "cache": (
+                    {
+                        "entradas": args.cache_size,
+                        "ttl_s": args.cache_ttl,
+                        "compartida": args.cache_shared,
+                        "verificacion": args.cache_verify,
+                    }
+                    if args.cache
+                    else None
+                ),
+            },
+        }
+        document.update(report)
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados JSON guardados en {args.output_json}")
+    if failures:
+        print(
+            f"ERROR: {len(failures)} de {args.clients} clientes terminaron antes de tiempo;"
+            " los resultados no son válidos."
+        )
+        sys.exit(1)
+    print("Carga completada.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import json
+import time
+from datetime import datetime
+
+import psycopg2
+
+# Contadores de pg_stat_user_tables cuyos deltas se reportan por fase
+TABLE_COUNTERS = (
+    "n_tup_ins",
+    "n_tup_upd",
+    "n_tup_hot_upd",
+    "n_tup_del",
+    "seq_scan",
+    "idx_scan",
+)
+
+# Sentencias de pg_stat_statements reportadas por fase (las de mayor tiempo)
+TOP_STATEMENTS = 10
+
+
+def enable_function_stats(conn):
+    """track_functions = 'pl' en la sesión para medir el tiempo de los triggers.
+
+    Requiere superusuario; si no se puede, los deltas de funciones quedan
+    vacíos salvo que el servidor ya lo tenga activado.
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET track_functions = 'pl'")
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+
+
+def flush_stats(cursor):
+    """Publicar las estadísticas pendientes de la sesión al terminar la transacción.
+
+    Desde PostgreSQL 15 cada backend acumula sus contadores y los publica como
+    mucho una vez por segundo; sin esto, los deltas de la última fase podrían
+    no incluir el último bloque de cada proceso.
+    """
+    if cursor.connection.info.server_version >= 150000:
+        cursor.execute("SELECT pg_stat_force_next_flush()")
+
+
+def statements_available(conn):
+    """Crear pg_stat_statements si está precargada; indica si se puede consultar"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT current_setting('shared_preload_libraries') LIKE '%pg_stat_statements%'"
+        )
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return False
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+    conn.commit()
+    return True
+
+
+def _delta(after, before, keys):
+    return {key: after[key] - before.get(key, 0) for key in keys}
+
+
+class LoadReport:
+    """Mediciones por fase de la población de la base de datos
+
+    Cada fase compara dos instantáneas tomadas desde la conexión principal:
+    posición del WAL, contadores de pg_stat_user_tables, tamaño de tablas e
+    índices, tiempo en funciones PL/pgSQL (triggers) y, si está disponible,
+    pg_stat_statements. El tiempo de CPU del cliente lo aportan los procesos
+    de población; el resto del tiempo ocupado es espera (servidor y red).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = statements_available(conn)
+        self.phases = []
+
+    def snapshot(self):
+        """Instantánea de los contadores del servidor y del reloj/CPU del cliente"""
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT pg_stat_clear_snapshot()")
+            cursor.execute("SELECT pg_current_wal_lsn()::TEXT")
+            lsn = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT relname, {}, pg_table_size(relid), pg_indexes_size(relid) FROM pg_stat_user_tables".format(
+                    ", ".join(f"COALESCE({column}, 0)" for column in TABLE_COUNTERS)
+                )
+            )
+            tables = {
+                row[0]: dict(
+                    zip(TABLE_COUNTERS + ("bytes_tabla", "bytes_indices"), row[1:])
+                )
+                for row in cursor.fetchall()
+            }
+            cursor.execute(
+                "SELECT funcname, calls, total_time, self_time FROM pg_stat_user_functions"
+            )
+            functions = {
+                row[0]: {"llamadas": row[1], "total_ms": row[2], "propio_ms": row[3]}
+                for row in cursor.fetchall()
+            }
+            statements = {}
+            if self.statements:
+                cursor.execute(
+                    "SELECT queryid, LEFT(query, 200), calls, total_exec_time, rows, wal_bytes::BIGINT FROM pg_stat_statements WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())"
+                )
+                statements = {
+                    row[0]: {
+                        "consulta": row[1],
+                        "llamadas": row[2],
+                        "total_ms": row[3],
+                        "filas": row[4],
+                        "wal_bytes": row[5],
+                    }
+                    for row in cursor.fetchall()
+                }
+        self.conn.commit()
+        return {
+            "reloj": time.perf_counter(),
+            "cpu": time.process_time(),
+            "lsn": lsn,
+            "tablas": tables,
+            "funciones": functions,
+            "sentencias": statements,
+        }
+
+    def wal_bytes(self, start_lsn, end_lsn):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_wal_lsn_diff(%s, %s)::BIGINT", (end_lsn, start_lsn)
+            )
+            value = cursor.fetchone()[0]
+        self.conn.commit()
+        return value
+
+    def record(self, name, before, rows=None, busy=None, cpu=None):
+        """Cerrar una fase iniciada con snapshot(); busy y cpu son la suma de los procesos
+
+        Sin busy/cpu (fases ejecutadas solo en la conexión principal) se usan
+        el reloj y la CPU de este proceso.
+        """
+        after = self.snapshot()
+        wall = after["reloj"] - before["reloj"]
+        busy = wall if busy is None else busy
+        cpu = after["cpu"] - before["cpu"] if cpu is None else cpu
+        rows = rows or {}
+        total_rows = sum(rows.values())
+
+        tables = {}
+        for table, counters in after["tablas"].items():
+            delta = _delta(counters, before["tablas"].get(table, {}), counters)
+            if any(delta.values()):
+                tables[table] = delta
+        functions = {}
+        for function, counters in after["funciones"].items():
+            delta = _delta(counters, before["funciones"].get(function, {}), counters)
+            if delta["llamadas"]:
+                functions[function] = delta
+        statements = []
+        for queryid, counters in after["sentencias"].items():
+            previous = before["sentencias"].get(queryid, {})
+            delta = _delta(
+                counters, previous, ("llamadas", "total_ms", "filas", "wal_bytes")
+            )
+            if delta["llamadas"]:
+                statements.append(dict(delta, consulta=counters["consulta"]))
+        statements.sort(key=lambda statement: statement["total_ms"], reverse=True)
+
+        phase = {
+            "fase": name,
+            "pared_s": wall,
+            "filas": total_rows,
+            "filas_por_tabla": rows,
+            "filas_por_segundo": total_rows / wall if wall > 0 else 0,
+            "ocupado_s": busy,
+            "cpu_cliente_s": cpu,
+            "espera_servidor_s": max(busy - cpu, 0.0),
+            "wal_bytes": self.wal_bytes(before["lsn"], after["lsn"]),
+            "tablas": tables,
+            "funciones": functions,
+            "sentencias": statements[:TOP_STATEMENTS] if self.statements else None,
+        }
+        self.phases.append(phase)
+        return phase
+
+    def totals(self):
+        """Suma de todas las fases"""
+        keys = (
+            "pared_s",
+            "filas",
+            "ocupado_s",
+            "cpu_cliente_s",
+            "espera_servidor_s",
+            "wal_bytes",
+        )
+        totals = {key: sum(phase[key] for phase in self.phases) for key in keys}
+        functions = {}
+        for phase in self.phases:
+            for function, counters in phase["funciones"].items():
+                for key, value in counters.items():
+                    functions.setdefault(function, {}).setdefault(key, 0)
+                    functions[function][key] += value
+        totals["funciones"] = functions
+        return totals
+
+    def write(self, path, configuration, **extra):
+        report = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "configuracion": configuration,
+            "pg_stat_statements": self.statements,
+            "fases": self.phases,
+            "total": self.totals(),
+        }
+        report.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def describe(phase):
+    """Resumen de una fase en una línea"""
+    line = (
+        f"  [{phase['fase']}] {phase['pared_s']:.2f} s, WAL {phase['wal_bytes'] / 2**20:.1f} MB,"
+        f" CPU cliente {phase['cpu_cliente_s']:.2f} s, espera servidor {phase['espera_servidor_s']:.2f} s"
+    )
+    triggers = sum(counters["propio_ms"] for counters in phase["funciones"].values())
+    if triggers:
+        line += f", funciones PL/pgSQL {triggers / 1000:.2f} s"
+    return line
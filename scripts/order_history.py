@@ -0,0 +1,411 @@
+import argparse
+import base64
+import json
+import random
+import time
+from datetime import datetime
+
+from benchmark_stats import percentile
+from db import connect_db, wait_for_db
+
+# Listados paginados:
+#   pedidos: historial de pedidos del usuario, cada uno con sus ítems
+#   detalle: una fila por ítem, como la Consulta 3
+KINDS = ("pedidos", "detalle")
+
+MAX_PER_PAGE = 100
+
+# Página de pedidos más recientes primero; {seek} es la condición del cursor
+ORDERS_SQL = """
+SELECT p.pedido_id, p.fecha_pedido, ep.nombre as estado, p.monto_total
+FROM pedido p
+JOIN estado_pedido ep ON ep.estado_pedido_id = p.estado_pedido_id
+WHERE p.usuario_id = %(usuario_id)s {seek}
+ORDER BY p.fecha_pedido DESC, p.pedido_id DESC
+LIMIT %(limite)s {offset}
+"""
+
+ORDERS_SEEK = "AND (p.fecha_pedido, p.pedido_id) < (%(fecha)s, %(pedido_id)s)"
+
+ITEMS_SQL = """
+SELECT pi.pedido_id, pi.pedido_item_id, pi.producto_id, pr.nombre, pi.cantidad, pi.precio_unitario, pi.subtotal
+FROM pedido_item pi
+JOIN producto pr ON pr.producto_id = pi.producto_id
+WHERE pi.pedido_id = ANY(%(pedidos)s)
+ORDER BY pi.pedido_id, pi.pedido_item_id
+"""
+
+DETAIL_SQL = """
+SELECT p.pedido_id, p.fecha_pedido, ep.nombre as estado, pi.pedido_item_id, pi.producto_id, pr.nombre as producto, pi.cantidad, pi.precio_unitario, pi.subtotal
+FROM pedido p
+JOIN estado_pedido ep ON ep.estado_pedido_id = p.estado_pedido_id
+JOIN pedido_item pi ON pi.pedido_id = p.pedido_id
+JOIN producto pr ON pr.producto_id = pi.producto_id
+WHERE p.usuario_id = %(usuario_id)s {seek}
+ORDER BY p.fecha_pedido DESC, p.pedido_id DESC, pi.pedido_item_id
+LIMIT %(limite)s {offset}
+"""
+
+ITEM_COLUMNS = (
+    "pedido_item_id",
+    "producto_id",
+    "producto",
+    "cantidad",
+    "precio_unitario",
+    "subtotal",
+)
+
+DETAIL_COLUMNS = ("pedido_id", "fecha_pedido", "estado") + ITEM_COLUMNS
+
+# Los ítems van en orden ascendente dentro de pedidos descendentes: la primera
+# condición (comparación de filas) es la que recorre el índice de pedido
+DETAIL_SEEK = (
+    "AND (p.fecha_pedido, p.pedido_id) <= (%(fecha)s, %(pedido_id)s)"
+    " AND ((p.fecha_pedido, p.pedido_id) < (%(fecha)s, %(pedido_id)s) OR pi.pedido_item_id > %(pedido_item_id)s)"
+)
+
+
+def encode_token(kind, user_id, position):
+    """Token de continuación opaco (base64 URL) con la posición de la última fila"""
+    data = json.dumps([kind, user_id] + position, default=datetime.isoformat)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_token(token, kind, user_id):
+    """Posición guardada en un token; ValueError si no corresponde al listado"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        token_kind, token_user, date = data[:3]
+        position = {"fecha": datetime.fromisoformat(date), "pedido_id": int(data[3])}
+        if kind == "detalle":
+            position["pedido_item_id"] = int(data[4])
+    except (ValueError, TypeError, IndexError):
+        raise ValueError("token de continuación inválido")
+    if token_kind != kind or token_user != user_id:
+        raise ValueError("el token de continuación es de otro listado")
+    return position
+
+
+class OrderHistory:
+    """Historial de pedidos de un usuario paginado por keyset
+
+    Cada página continúa después de la última fila de la anterior, en orden
+    (fecha_pedido, pedido_id) descendente, buscando en idx_pedido_usuario_fecha:
+    el costo no depende de cuántas páginas se saltaron, a diferencia de OFFSET.
+    El token de continuación codifica esa posición; un pedido nuevo no desplaza
+    las páginas siguientes.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _fetch(self, sql, seek, params, per_page):
+        """Filas de una página; pide una fila extra para saber si hay más"""
+        params = dict(params, limite=per_page + 1)
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql.format(seek=seek, offset=""), params)
+            rows = cursor.fetchall()
+        return rows[:per_page], len(rows) > per_page
+
+    def _validate(self, per_page):
+        if not 1 <= per_page <= MAX_PER_PAGE:
+            raise ValueError(f"entre 1 y {MAX_PER_PAGE} filas por página")
+
+    def orders(self, user_id, token=None, per_page=10):
+        """Página de pedidos con sus ítems; devuelve {pedidos, siguiente}"""
+        self._validate(per_page)
+        params = {"usuario_id": user_id}
+        seek = ""
+        if token:
+            params.update(decode_token(token, "pedidos", user_id))
+            seek = ORDERS_SEEK
+        rows, more = self._fetch(ORDERS_SQL, seek, params, per_page)
+
+        orders = [
+            {
+                "pedido_id": order_id,
+                "fecha_pedido": date,
+                "estado": state,
+                "monto_total": total,
+                "items": [],
+            }
+            for order_id, date, state, total in rows
+        ]
+        if orders:
+            by_id = {order["pedido_id"]: order for order in orders}
+            with self.conn.cursor() as cursor:
+                cursor.execute(ITEMS_SQL, {"pedidos": list(by_id)})
+                for row in cursor.fetchall():
+                    by_id[row[0]]["items"].append(dict(zip(ITEM_COLUMNS, row[1:])))
+        following = None
+        if more:
+            last = orders[-1]
+            following = encode_token(
+                "pedidos", user_id, [last["fecha_pedido"], last["pedido_id"]]
+            )
+        return {"pedidos": orders, "siguiente": following}
+
+    def details(self, user_id, token=None, per_page=10):
+        """Página de ítems de pedidos (filas de la Consulta 3); devuelve {filas, siguiente}"""
+        self._validate(per_page)
+        params = {"usuario_id": user_id}
+        seek = ""
+        if token:
+            params.update(decode_token(token, "detalle", user_id))
+            seek = DETAIL_SEEK
+        rows, more = self._fetch(DETAIL_SQL, seek, params, per_page)
+        details = [dict(zip(DETAIL_COLUMNS, row)) for row in rows]
+        following = None
+        if more:
+            last = details[-1]
+            following = encode_token(
+                "detalle",
+                user_id,
+                [last["fecha_pedido"], last["pedido_id"], last["pedido_item_id"]],
+            )
+        return {"filas": details, "siguiente": following}
+
+
+def grow_history(conn, user_id, address_id, count, seed):
+    """Agregar count pedidos de 1-3 ítems al usuario (dentro de la transacción actual)
+
+    Las fechas se reparten en los últimos 300 días, así caen en particiones
+    existentes en la variante particionada.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SET LOCAL eshopify.metricas_vendedor = 'pausado'")
+        cursor.execute("SELECT setseed(%s)", (seed,))
+        cursor.execute(
+            """
+            WITH productos AS (
+                SELECT producto_id, precio, row_number() OVER (ORDER BY producto_id) - 1 as n
+                FROM producto
+            ), nuevos AS (
+                INSERT INTO pedido (usuario_id, direccion_id, estado_pedido_id, fecha_pedido, monto_subtotal, monto_total)
+                SELECT %(usuario_id)s, %(direccion_id)s, 1 + (g %% 5), LOCALTIMESTAMP - random() * INTERVAL '300 days', 0, 0
+                FROM generate_series(1, %(pedidos)s) g
+                RETURNING pedido_id
+            )
+            INSERT INTO pedido_item (pedido_id, producto_id, cantidad, precio_unitario, subtotal)
+            SELECT n.pedido_id, pr.producto_id, 1, pr.precio, pr.precio
+            FROM nuevos n
+            CROSS JOIN LATERAL generate_series(1, 1 + (n.pedido_id %% 3)) i
+            JOIN productos pr ON pr.n = (n.pedido_id * 7919 + i) %% (SELECT COUNT(*) FROM producto)
+            """,
+            {"usuario_id": user_id, "direccion_id": address_id, "pedidos": count},
+        )
+        cursor.execute("ANALYZE pedido")
+        cursor.execute("ANALYZE pedido_item")
+
+
+def time_call(function, *args, **kwargs):
+    """Latencia (ms) de una llamada"""
+    start = time.perf_counter_ns()
+    function(*args, **kwargs)
+    return (time.perf_counter_ns() - start) / 1_000_000
+
+
+def offset_page(conn, kind, user_id, page, per_page):
+    """La misma página con LIMIT/OFFSET (la paginación actual), para comparar"""
+    params = {"usuario_id": user_id, "limite": per_page + 1}
+    offset = f"OFFSET {(page - 1) * per_page}"
+    with conn.cursor() as cursor:
+        if kind == "pedidos":
+            cursor.execute(ORDERS_SQL.format(seek="", offset=offset), params)
+            orders = [row[0] for row in cursor.fetchall()[:per_page]]
+            cursor.execute(ITEMS_SQL, {"pedidos": orders})
+        else:
+            cursor.execute(DETAIL_SQL.format(seek="", offset=offset), params)
+        cursor.fetchall()
+
+
+def last_page_token(conn, kind, user_id, page, per_page):
+    """Token para llegar directamente a page (posición de la última fila de page - 1)
+
+    La página 1 no tiene token (None).
+    """
+    if page <= 1:
+        return None
+    params = {"usuario_id": user_id, "limite": 1}
+    offset = f"OFFSET {max((page - 1) * per_page - 1, 0)}"
+    with conn.cursor() as cursor:
+        if kind == "pedidos":
+            cursor.execute(ORDERS_SQL.format(seek="", offset=offset), params)
+            order_id, date = cursor.fetchone()[:2]
+            return encode_token(kind, user_id, [date, order_id])
+        cursor.execute(DETAIL_SQL.format(seek="", offset=offset), params)
+        row = cursor.fetchone()
+        return encode_token(kind, user_id, [row[1], row[0], row[3]])
+
+
+def run_benchmark(conn, sizes, per_page, repetitions, seed):
+    """Latencia de la página 1 y la última con OFFSET y keyset según el historial
+
+    El historial del usuario crece por pasos dentro de una transacción que
+    termina con ROLLBACK. Devuelve una fila por tamaño, listado y método.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT usuario_id, direccion_id FROM direccion ORDER BY direccion_id LIMIT 1"
+        )
+        user_id, address_id = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) FROM pedido WHERE usuario_id = %s", (user_id,))
+        existing = cursor.fetchone()[0]
+    conn.rollback()
+
+    history = OrderHistory(conn)
+    fetchers = {"pedidos": history.orders, "detalle": history.details}
+    rng = random.Random(seed)
+    report = []
+    try:
+        total = existing
+        for size in sorted(sizes):
+            if size > total:
+                grow_history(conn, user_id, address_id, size - total, rng.random())
+                total = size
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM pedido_item pi JOIN pedido p ON p.pedido_id = pi.pedido_id WHERE p.usuario_id = %s",
+                    (user_id,),
+                )
+                items = cursor.fetchone()[0]
+            for kind in KINDS:
+                rows = total if kind == "pedidos" else items
+                last = max(rows // per_page, 1)
+                token = last_page_token(conn, kind, user_id, last, per_page)
+                calls = {
+                    ("offset", 1): (offset_page, conn, kind, user_id, 1, per_page),
+                    ("offset", last): (
+                        offset_page,
+                        conn,
+                        kind,
+                        user_id,
+                        last,
+                        per_page,
+                    ),
+                    ("keyset", 1): (fetchers[kind], user_id, None, per_page),
+                    ("keyset", last): (fetchers[kind], user_id, token, per_page),
+                }
+                samples = {key: [] for key in calls}
+                for _ in range(repetitions + 1):
+                    for key, call in calls.items():
+                        samples[key].append(time_call(*call))
+                for method in ("offset", "keyset"):
+                    # La primera repetición es de calentamiento
+                    first = sorted(samples[(method, 1)][1:])
+                    deep = sorted(samples[(method, last)][1:])
+                    report.append(
+                        {
+                            "pedidos_usuario": total,
+                            "listado": kind,
+                            "filas": rows,
+                            "metodo": method,
+                            "pagina_n": last,
+                            "pagina_1_ms": percentile(first, 50),
+                            "pagina_n_ms": percentile(deep, 50),
+                        }
+                    )
+    finally:
+        conn.rollback()
+    return {"usuario_id": user_id, "resultados": report}
+
+
+def parse_sizes(value):
+    """Leer la lista de tamaños de historial separados por comas"""
+    try:
+        sizes = [int(size) for size in value.split(",") if size.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamaños inválidos: {value}")
+    if not sizes or min(sizes) < 1:
+        raise argparse.ArgumentTypeError("se necesita al menos un tamaño >= 1")
+    return sizes
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Historial de pedidos paginado por keyset"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("listar", help="mostrar una página del historial")
+    show.add_argument("user_id", type=int, help="usuario_id")
+    show.add_argument("--kind", choices=KINDS, default="pedidos", help="listado")
+    show.add_argument("--token", help="token de continuación de la página anterior")
+    show.add_argument("--per-page", type=int, default=10, help="filas por página")
+    bench = sub.add_parser(
+        "benchmark", help="página 1 y última con OFFSET y keyset según el historial"
+    )
+    bench.add_argument(
+        "--sizes",
+        type=parse_sizes,
+        default=[100, 1000, 10000, 50000],
+        help="pedidos del usuario separados por comas",
+    )
+    bench.add_argument("--per-page", type=int, default=10, help="filas por página")
+    bench.add_argument("--repetitions", type=int, default=10, help="repeticiones")
+    bench.add_argument("--seed", type=int, default=42, help="semilla de los pedidos")
+    bench.add_argument("--output-json", help="ruta del JSON de resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+    conn = connect_db()
+    try:
+        if args.command == "listar":
+            history = OrderHistory(conn)
+            try:
+                if args.kind == "pedidos":
+                    page = history.orders(args.user_id, args.token, args.per_page)
+                    for order in page["pedidos"]:
+                        print(
+                            f"{order['pedido_id']:>8}  {order['fecha_pedido']:%Y-%m-%d %H:%M}"
+                            f"  {order['estado']:<12} {order['monto_total']:>10}"
+                            f"  {len(order['items'])} ítems"
+                        )
+                else:
+                    page = history.details(args.user_id, args.token, args.per_page)
+                    for row in page["filas"]:
+                        print(
+                            f"{row['pedido_id']:>8}  {row['fecha_pedido']:%Y-%m-%d %H:%M}"
+                            f"  {row['producto'][:40]:<40} {row['cantidad']:>3} x {row['precio_unitario']}"
+                        )
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
+            finally:
+                conn.rollback()
+            if page["siguiente"]:
+                print(f"\nSiguiente página: --token {page['siguiente']}")
+        else:
+            report = run_benchmark(
+                conn, args.sizes, args.per_page, args.repetitions, args.seed
+            )
+            print(f"\nUsuario {report['usuario_id']}, {args.per_page} filas por página")
+            for row in report["resultados"]:
+                print(
+                    f"{row['pedidos_usuario']:>7} pedidos / {row['listado']:<7} / {row['metodo']:<6}:"
+                    f" página 1 {row['pagina_1_ms']:7.2f} ms,"
+                    f" página {row['pagina_n']} {row['pagina_n_ms']:7.2f} ms"
+                )
+            if args.output_json:
+                report["fecha"] = datetime.now().isoformat(timespec="seconds")
+                report["configuracion"] = {
+                    "tamanos": args.sizes,
+                    "filas_por_pagina": args.per_page,
+                    "repeticiones": args.repetitions,
+                    "semilla": args.seed,
+                }
+                with open(args.output_json, "w", encoding="utf-8") as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                print(f"\nResultados JSON guardados en {args.output_json}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
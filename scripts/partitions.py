@@ -0,0 +1,410 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+from benchmark_stats import percentile
+from compare_plans import walk
+from db import connect_db, wait_for_db
+
+# Tablas particionadas por mes en la variante particionada del schema optimizado
+PARTITIONED_TABLES = ("pedido", "historial_estado_pedido", "notificacion")
+
+# Consultas acotadas por fecha: "meses" es el ancho de la ventana que termina
+# en un mes con datos (0 = sin filtro de fecha, ninguna partición se descarta)
+PRUNING_QUERIES = {
+    "mes": {
+        "descripcion": "Pedidos e ingresos de un mes",
+        "meses": 1,
+        "sql": "SELECT COUNT(*), SUM(monto_total) FROM {table} WHERE fecha_pedido >= %(desde)s AND fecha_pedido < %(hasta)s",
+    },
+    "trimestre_estado": {
+        "descripcion": "Pedidos por estado en un trimestre",
+        "meses": 3,
+        "sql": "SELECT estado_pedido_id, COUNT(*) FROM {table} WHERE fecha_pedido >= %(desde)s AND fecha_pedido < %(hasta)s GROUP BY estado_pedido_id",
+    },
+    "usuario_reciente": {
+        "descripcion": "Últimos pedidos de un usuario en 3 meses",
+        "meses": 3,
+        "sql": "SELECT pedido_id, fecha_pedido, monto_total FROM {table} WHERE usuario_id = %(usuario_id)s AND fecha_pedido >= %(desde)s AND fecha_pedido < %(hasta)s ORDER BY fecha_pedido DESC LIMIT 10",
+    },
+    "usuario_sin_fecha": {
+        "descripcion": "Últimos pedidos de un usuario sin rango de fechas",
+        "meses": 0,
+        "sql": "SELECT pedido_id, fecha_pedido, monto_total FROM {table} WHERE usuario_id = %(usuario_id)s ORDER BY fecha_pedido DESC LIMIT 10",
+    },
+}
+
+# Copia sin particionar de pedido (tabla temporal) con los índices del schema
+FLAT_TABLE = "pg_temp.pedido_sin_particion"
+
+FLAT_INDEXES = (
+    "ALTER TABLE pedido_sin_particion ADD PRIMARY KEY (pedido_id)",
+    "CREATE INDEX ON pedido_sin_particion (fecha_pedido)",
+    "CREATE INDEX ON pedido_sin_particion (usuario_id, fecha_pedido DESC)",
+    "CREATE INDEX ON pedido_sin_particion (estado_pedido_id)",
+)
+
+
+def parse_month(value):
+    """Leer un mes AAAA-MM como datetime del primer día"""
+    try:
+        return datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"mes inválido (AAAA-MM): {value}")
+
+
+def add_months(month, count):
+    """Primer día del mes desplazado count meses"""
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(conn, table="pedido"):
+    """Indica si la tabla está particionada (variante particionada del schema)"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            (table,),
+        )
+        partitioned = cursor.fetchone() is not None
+    conn.rollback()
+    return partitioned
+
+
+def list_partitions(conn, table=None):
+    """Particiones (tabla, partición, desde, hasta, filas estimadas, bytes)"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT tabla, particion, desde, hasta, filas_estimadas, bytes FROM v_particiones WHERE %(tabla)s IS NULL OR tabla = %(tabla)s ORDER BY tabla, desde",
+            {"tabla": table},
+        )
+        rows = cursor.fetchall()
+    conn.rollback()
+    return rows
+
+
+def create_partitions(conn, tables, start, months):
+    """Crear las particiones mensuales que falten; devuelve {tabla: creadas}"""
+    created = {}
+    with conn.cursor() as cursor:
+        for table in tables:
+            cursor.execute(
+                "SELECT crear_particiones_mensuales(%s, %s, %s)",
+                (table, start, add_months(start, months)),
+            )
+            created[table] = cursor.fetchone()[0]
+    conn.commit()
+    return created
+
+
+def archive_partitions(conn, tables, before, drop=False):
+    """DETACH de las particiones anteriores a before; devuelve {tabla: archivadas}"""
+    archived = {}
+    with conn.cursor() as cursor:
+        for table in tables:
+            cursor.execute(
+                "SELECT desasociar_particiones(%s, %s, %s)", (table, before, drop)
+            )
+            archived[table] = cursor.fetchone()[0]
+    conn.commit()
+    return archived
+
+
+def create_flat_copy(conn):
+    """Copiar pedido a una tabla temporal sin particionar, con los mismos índices"""
+    with conn.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS pedido_sin_particion")
+        cursor.execute("CREATE TEMP TABLE pedido_sin_particion AS SELECT * FROM pedido")
+        for statement in FLAT_INDEXES:
+            cursor.execute(statement)
+        # Autovacuum no analiza tablas temporales
+        cursor.execute("ANALYZE pedido_sin_particion")
+        cursor.execute("ANALYZE pedido")
+    conn.commit()
+
+
+def scanned_partitions(conn, sql, params):
+    """Particiones de pedido que lee el plan de sql (EXPLAIN, sin ejecutar)"""
+    with conn.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0][0]
+    conn.rollback()
+    return {
+        node["Relation Name"]
+        for _, node in walk(plan["Plan"])
+        if node.get("Relation Name", "").startswith("pedido_")
+    }
+
+
+def time_query(conn, sql, params):
+    """Latencia (ms) de una consulta"""
+    start = time.perf_counter_ns()
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        cursor.fetchall()
+    elapsed = (time.perf_counter_ns() - start) / 1_000_000
+    conn.rollback()
+    return elapsed
+
+
+def measure_pruning(conn, months, users, repetitions, rng):
+    """Latencia particionada vs sin particionar y particiones leídas por consulta"""
+    total = len(list_partitions(conn, "pedido"))
+    report = []
+    for key, query in PRUNING_QUERIES.items():
+        draws = []
+        for _ in range(repetitions + 1):
+            end = add_months(rng.choice(months), 1)
+            draws.append(
+                {
+                    "desde": add_months(end, -query["meses"]),
+                    "hasta": end,
+                    "usuario_id": rng.choice(users),
+                }
+            )
+        row = {"consulta": key, "descripcion": query["descripcion"]}
+        for label, table in (("particionada", "pedido"), ("sin_particion", FLAT_TABLE)):
+            sql = query["sql"].format(table=table)
+            # La primera ejecución es de calentamiento
+            samples = [time_query(conn, sql, params) for params in draws][1:]
+            row[f"{label}_ms"] = percentile(sorted(samples), 50)
+        row["particiones_leidas"] = len(
+            scanned_partitions(conn, query["sql"].format(table="pedido"), draws[0])
+        )
+        row["particiones_totales"] = total
+        report.append(row)
+    return report
+
+
+def measure_archive(conn, cutoff, repetitions):
+    """Archivar los meses anteriores a cutoff: DELETE masivo vs DETACH (con ROLLBACK)
+
+    Todos los métodos incluyen los pedido_item y pago de los pedidos
+    archivados: el DELETE los borra como el ON DELETE CASCADE del schema sin
+    particionar y desasociar_particiones los mueve (o borra) antes del DETACH.
+    """
+    methods = {
+        "delete": f"""
+            WITH borrados AS (
+                DELETE FROM {FLAT_TABLE} WHERE fecha_pedido < %(corte)s RETURNING pedido_id
+            ), items AS (
+                DELETE FROM pedido_item WHERE pedido_id IN (SELECT pedido_id FROM borrados)
+            )
+            DELETE FROM pago WHERE pedido_id IN (SELECT pedido_id FROM borrados)
+        """,
+        "detach_archivo": "SELECT desasociar_particiones('pedido', %(corte)s, false)",
+        "detach_drop": "SELECT desasociar_particiones('pedido', %(corte)s, true)",
+    }
+    params = {"corte": cutoff}
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {FLAT_TABLE} WHERE fecha_pedido < %(corte)s", params
+        )
+        rows = cursor.fetchone()[0]
+        cursor.execute(
+            f"""
+            SELECT (SELECT COUNT(*) FROM pedido_item WHERE pedido_id IN (SELECT pedido_id FROM {FLAT_TABLE} WHERE fecha_pedido < %(corte)s)),
+                   (SELECT COUNT(*) FROM pago WHERE pedido_id IN (SELECT pedido_id FROM {FLAT_TABLE} WHERE fecha_pedido < %(corte)s))
+            """,
+            params,
+        )
+        items, payments = cursor.fetchone()
+        cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0)::BIGINT FROM v_particiones WHERE tabla = 'pedido' AND hasta <= %(corte)s",
+            params,
+        )
+        partitions, size = cursor.fetchone()
+    conn.rollback()
+
+    report = {
+        "corte": cutoff.strftime("%Y-%m"),
+        "filas": rows,
+        "filas_pedido_item": items,
+        "filas_pago": payments,
+        "particiones": partitions,
+        "bytes": size,
+    }
+    for method, sql in methods.items():
+        samples = []
+        for _ in range(repetitions):
+            start = time.perf_counter_ns()
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+            samples.append((time.perf_counter_ns() - start) / 1_000_000)
+            conn.rollback()
+        report[f"{method}_ms"] = percentile(sorted(samples), 50)
+
+    # El DELETE deja tuplas muertas: el espacio vuelve recién tras VACUUM. Solo
+    # se confirma sobre la copia de pedido (las tablas dependientes son reales)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FLAT_TABLE} WHERE fecha_pedido < %(corte)s", params
+        )
+    conn.commit()
+    start = time.perf_counter_ns()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("VACUUM pedido_sin_particion")
+    finally:
+        conn.autocommit = False
+    report["vacuum_ms"] = (time.perf_counter_ns() - start) / 1_000_000
+    return report
+
+
+def run_benchmark(conn, repetitions, archive_months, seed):
+    """Pruning de consultas por fecha y costo de archivar meses antiguos"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT usuario_id FROM pedido ORDER BY usuario_id")
+        users = [row[0] for row in cursor.fetchall()]
+    conn.rollback()
+    create_flat_copy(conn)
+    # Meses con pedidos según las estadísticas (create_flat_copy analiza pedido)
+    months = [row[2] for row in list_partitions(conn, "pedido") if row[4] > 0]
+    if not months:
+        with conn.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS pedido_sin_particion")
+        conn.commit()
+        raise RuntimeError(
+            "No hay pedidos en las particiones: ejecuta populate_db.py primero"
+        )
+
+    rng = random.Random(seed)
+    report = {
+        "pruning": measure_pruning(conn, months, users, repetitions, rng),
+        "archivo": measure_archive(
+            conn, add_months(min(months), archive_months), repetitions
+        ),
+    }
+    with conn.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS pedido_sin_particion")
+    conn.commit()
+    return report
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Particiones mensuales (variante particionada del schema optimizado)"
+    )
+    parser.add_argument(
+        "--table",
+        choices=PARTITIONED_TABLES,
+        help="tabla a administrar (por defecto todas)",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("listar", help="particiones con límites, filas y tamaño")
+    create = sub.add_parser("crear", help="crear particiones por adelantado")
+    create.add_argument(
+        "--from",
+        dest="start",
+        type=parse_month,
+        default=datetime.now().replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        ),
+        help="primer mes AAAA-MM (por defecto el actual)",
+    )
+    create.add_argument(
+        "--months", type=int, default=3, help="meses siguientes a crear (por defecto 3)"
+    )
+    archive = sub.add_parser(
+        "archivar", help="DETACH de las particiones anteriores a un mes"
+    )
+    archive.add_argument(
+        "--before", type=parse_month, required=True, help="mes AAAA-MM (excluido)"
+    )
+    archive.add_argument(
+        "--drop",
+        action="store_true",
+        help="eliminar las particiones en lugar de renombrarlas a archivo_*",
+    )
+    bench = sub.add_parser(
+        "benchmark", help="pruning de consultas por fecha y costo de archivar"
+    )
+    bench.add_argument("--repetitions", type=int, default=10, help="repeticiones")
+    bench.add_argument(
+        "--archive-months",
+        type=int,
+        default=3,
+        help="meses más antiguos a archivar en la medición",
+    )
+    bench.add_argument("--seed", type=int, default=42, help="semilla de parámetros")
+    bench.add_argument("--output-json", help="ruta del JSON de resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+    conn = connect_db()
+    try:
+        if not is_partitioned(conn):
+            print(
+                "pedido no está particionado: cargar el schema con psql -v particionado=on"
+            )
+            return
+        tables = [args.table] if args.table else list(PARTITIONED_TABLES)
+        if args.command == "listar":
+            for table, partition, start, end, rows, size in list_partitions(
+                conn, args.table
+            ):
+                print(
+                    f"{table:<24} {partition:<36} {start:%Y-%m-%d} - {end:%Y-%m-%d}"
+                    f" {rows:>10} filas {size / 1024:>10.0f} KB"
+                )
+        elif args.command == "crear":
+            for table, created in create_partitions(
+                conn, tables, args.start, args.months
+            ).items():
+                print(f"{table}: {created} particiones creadas")
+        elif args.command == "archivar":
+            for table, archived in archive_partitions(
+                conn, tables, args.before, args.drop
+            ).items():
+                action = "eliminadas" if args.drop else "archivadas"
+                print(f"{table}: {archived} particiones {action}")
+        else:
+            report = run_benchmark(
+                conn, args.repetitions, args.archive_months, args.seed
+            )
+            print("\nPruning (mediana en ms):")
+            for row in report["pruning"]:
+                print(
+                    f"  {row['consulta']:<18}: particionada {row['particionada_ms']:7.2f} ms,"
+                    f" sin particionar {row['sin_particion_ms']:7.2f} ms,"
+                    f" {row['particiones_leidas']}/{row['particiones_totales']} particiones"
+                )
+            archive = report["archivo"]
+            print(
+                f"\nArchivar antes de {archive['corte']}: {archive['filas']} pedidos"
+                f" ({archive['filas_pedido_item']} items, {archive['filas_pago']} pagos),"
+                f" {archive['particiones']} particiones ({archive['bytes'] / 1024:.0f} KB)"
+            )
+            print(
+                f"  DELETE {archive['delete_ms']:.1f} ms"
+                f" (+ VACUUM de pedido: {archive['vacuum_ms']:.1f} ms),"
+                f" DETACH {archive['detach_archivo_ms']:.1f} ms,"
+                f" DETACH + DROP {archive['detach_drop_ms']:.1f} ms"
+            )
+            if args.output_json:
+                report["fecha"] = datetime.now().isoformat(timespec="seconds")
+                report["configuracion"] = {
+                    "repeticiones": args.repetitions,
+                    "meses_archivados": args.archive_months,
+                    "semilla": args.seed,
+                }
+                with open(args.output_json, "w", encoding="utf-8") as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                print(f"\nResultados JSON guardados en {args.output_json}")
+    except RuntimeError as e:
+        print(e)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
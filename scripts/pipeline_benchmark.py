@@ -0,0 +1,517 @@
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+from faker import Faker
+
+from benchmark_stats import percentile, summarize
+from db import DB_SETTINGS, connect_db, wait_for_db
+from load_generator import is_write
+from pipeline_engine import (
+    connect_async,
+    connect_pipeline,
+    connection_settings,
+    pipeline_rows,
+    run_concurrent,
+    run_pipelined,
+    run_sequential,
+)
+from populate_db import (
+    MAX_ITEMS_PER_ORDER,
+    PAGO_COLUMNS,
+    PEDIDO_COLUMNS,
+    PEDIDO_ITEM_COLUMNS,
+    PIPELINE_LOADER,
+    ProductAttributes,
+    derive_seed,
+    generate_order,
+    load_rows,
+    reserve_range,
+)
+from workload import (
+    DEFAULT_WORKLOAD,
+    ParameterSampler,
+    load_workload,
+    split_supported,
+)
+
+# Ejecución de la lista de consultas:
+#   sync:        psycopg2, una sentencia por viaje de ida y vuelta (script_benchmark.py)
+#   async:       psycopg 3 con asyncio, una sentencia tras otra
+#   pipeline:    psycopg 3 con asyncio, todas las sentencias en un pipeline de libpq
+#   concurrente: psycopg 3 con asyncio, sentencias repartidas entre varias conexiones
+QUERY_MODES = ("sync", "async", "pipeline", "concurrente")
+
+# Loaders comparados en la carga de pedidos: los de psycopg2 y el pipeline
+ORDER_LOADERS = ("insert", PIPELINE_LOADER, "values", "copy")
+
+
+def parse_list(value, valid, kind):
+    """Leer una lista separada por comas y validar sus elementos"""
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in items if item not in valid]
+    if unknown or not items:
+        raise argparse.ArgumentTypeError(
+            f"{kind} inválido: {value} (válidos: {', '.join(valid)})"
+        )
+    return items
+
+
+def parse_delays(value):
+    """Leer los retardos de red (ms) separados por comas"""
+    try:
+        delays = [float(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"retardos inválidos: {value}")
+    if not delays or any(delay < 0 for delay in delays):
+        raise argparse.ArgumentTypeError(f"retardos inválidos: {value}")
+    return delays
+
+
+class DelayProxy:
+    """Proxy TCP local que retrasa cada sentido de la conexión delay_ms / 2
+
+    Cada bloque recibido se reenvía delay_ms / 2 después de llegar, sin
+    esperar a que se entregue el anterior: agrega latencia (como un enlace
+    lejano) sin limitar cuántos mensajes viajan a la vez. Corre en un hilo con
+    su propio event loop.
+    """
+
+    def __init__(self, delay_ms):
+        self.delay = delay_ms / 2000
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.server = None
+
+    def start(self):
+        """Iniciar el proxy y devolver host y puerto donde escucha"""
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, "127.0.0.1", 0), self.loop
+        ).result()
+        return {"host": "127.0.0.1", "port": self.server.sockets[0].getsockname()[1]}
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def _shutdown(self):
+        """Cerrar el servidor y cancelar los reenvíos de conexiones que sigan abiertas"""
+        self.server.close()
+        tasks = [
+            task for task in asyncio.all_tasks() if task is not asyncio.current_task()
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _handle(self, client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(
+            DB_SETTINGS["host"], DB_SETTINGS["port"]
+        )
+        try:
+            await asyncio.gather(
+                self._forward(client_reader, server_writer),
+                self._forward(server_reader, client_writer),
+            )
+        except asyncio.CancelledError:
+            # stop() con la conexión abierta: se cierra sin reenviar lo pendiente
+            client_writer.close()
+            server_writer.close()
+
+    async def _forward(self, reader, writer):
+        queue = asyncio.Queue()
+
+        async def deliver():
+            while True:
+                due, data = await queue.get()
+                wait = due - self.loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+            writer.close()
+
+        delivery = asyncio.ensure_future(deliver())
+        try:
+            while True:
+                data = await reader.read(65536)
+                queue.put_nowait((self.loop.time() + self.delay, data))
+                if not data:
+                    break
+        except ConnectionError:
+            queue.put_nowait((0, b""))
+        try:
+            await delivery
+        except ConnectionError:
+            pass
+
+
+class NetemDelay:
+    """Retardo con tc netem sobre una interfaz (requiere NET_ADMIN)
+
+    netem retrasa los paquetes que salen por la interfaz: en la interfaz del
+    contenedor se agrega delay_ms a cada viaje de ida y vuelta; en lo, que
+    recorren los dos sentidos, el doble.
+    """
+
+    def __init__(self, delay_ms, device):
+        self.delay_ms = delay_ms
+        self.device = device
+
+    def start(self):
+        subprocess.run(
+            [
+                "tc",
+                "qdisc",
+                "replace",
+                "dev",
+                self.device,
+                "root",
+                "netem",
+                "delay",
+                f"{self.delay_ms}ms",
+            ],
+            check=True,
+        )
+        return {}
+
+    def stop(self):
+        subprocess.run(["tc", "qdisc", "del", "dev", self.device, "root"], check=True)
+
+
+def build_batches(operations, sampler, count, seed):
+    """count listas de sentencias (sql, parámetros), una por repetición
+
+    Cada operación aporta su sentencia de preparación, si tiene, y su SQL
+    con parámetros generados; las sentencias de una operación van juntas.
+    """
+    rng = random.Random(seed)
+    batches = []
+    for _ in range(count):
+        units = []
+        for operation in operations:
+            unit = []
+            if operation.get("preparacion"):
+                unit.append((operation["preparacion"], None))
+            unit.append((operation["sql"], sampler.draw(operation, rng) or None))
+            units.append(unit)
+        batches.append(units)
+    return batches
+
+
+def run_sync(conn, units):
+    """Lista de sentencias con psycopg2, esperando cada respuesta"""
+    with conn.cursor() as cursor:
+        for unit in units:
+            for sql, params in unit:
+                cursor.execute(sql, params)
+                if cursor.description is not None:
+                    cursor.fetchall()
+    conn.rollback()
+
+
+async def measure_queries(modes, batches, warmup, connections, settings):
+    """Latencia de cada repetición de la lista de consultas por modo, en ns"""
+    samples = {mode: [] for mode in modes}
+    if "sync" in modes:
+        conn = psycopg2.connect(**settings)
+        try:
+            for index, units in enumerate(batches):
+                start = time.perf_counter_ns()
+                run_sync(conn, units)
+                if index >= warmup:
+                    samples["sync"].append(time.perf_counter_ns() - start)
+        finally:
+            conn.close()
+
+    async_modes = [mode for mode in modes if mode != "sync"]
+    if not async_modes:
+        return samples
+    conns = [
+        await connect_async(**settings)
+        for _ in range(connections if "concurrente" in modes else 1)
+    ]
+    try:
+        for mode in async_modes:
+            for index, units in enumerate(batches):
+                statements = [statement for unit in units for statement in unit]
+                start = time.perf_counter_ns()
+                if mode == "async":
+                    await run_sequential(conns[0], statements)
+                    await conns[0].rollback()
+                elif mode == "pipeline":
+                    await run_pipelined(conns[0], statements)
+                    await conns[0].rollback()
+                else:
+                    await run_concurrent(conns, units)
+                    await asyncio.gather(*(conn.rollback() for conn in conns))
+                if index >= warmup:
+                    samples[mode].append(time.perf_counter_ns() - start)
+    finally:
+        for conn in conns:
+            await conn.close()
+    return samples
+
+
+def generate_orders(conn, count, seed):
+    """count pedidos con sus items y pagos, con IDs reservados en las secuencias"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT usuario_id, direccion_id FROM direccion ORDER BY 1")
+        owners = cursor.fetchall()
+        cursor.execute("SELECT producto_id FROM producto ORDER BY 1")
+        product_ids = [row[0] for row in cursor.fetchall()]
+    conn.rollback()
+    order_ids = reserve_range(conn, "pedido", "pedido_id", count)
+    item_ids = reserve_range(
+        conn, "pedido_item", "pedido_item_id", count * MAX_ITEMS_PER_ORDER
+    )
+    payment_ids = reserve_range(conn, "pago", "pago_id", count)
+    conn.commit()
+
+    rng = random.Random(seed)
+    fake = Faker("es_CO")
+    fake.seed_instance(seed)
+    attributes = ProductAttributes(derive_seed(seed, "ProductAttributes"))
+    orders, items, payments = [], [], []
+    for index, order_id in enumerate(order_ids):
+        order, order_items, payment = generate_order(
+            rng,
+            fake,
+            order_id,
+            item_ids[index * MAX_ITEMS_PER_ORDER],
+            [owner[0] for owner in owners],
+            [owner[1] for owner in owners],
+            product_ids,
+            attributes,
+        )
+        orders.append(order)
+        items.extend(order_items)
+        payments.append((payment_ids[index], order_id) + payment)
+    return [
+        ("pedido", PEDIDO_COLUMNS, orders),
+        ("pedido_item", PEDIDO_ITEM_COLUMNS, items),
+        ("pago", PAGO_COLUMNS, payments),
+    ]
+
+
+def measure_orders(loaders, tables, repetitions, settings):
+    """Segundos de carga de los pedidos por loader; cada repetición termina con ROLLBACK"""
+    samples = {loader: [] for loader in loaders}
+    for loader in loaders:
+        if loader == PIPELINE_LOADER:
+            conn = connect_pipeline(**settings)
+        else:
+            conn = psycopg2.connect(**settings)
+        try:
+            for _ in range(repetitions):
+                with conn.cursor() as cursor:
+                    cursor.execute("SET eshopify.metricas_vendedor = 'diferido'")
+                start = time.perf_counter()
+                for table, columns, rows in tables:
+                    if loader == PIPELINE_LOADER:
+                        pipeline_rows(conn, table, columns, rows)
+                    else:
+                        load_rows(conn, table, columns, rows, loader)
+                samples[loader].append(time.perf_counter() - start)
+                conn.rollback()
+        finally:
+            conn.close()
+    return samples
+
+
+def round_trip_ms(settings, count=20):
+    """Mediana de SELECT 1 (ms): el tiempo de ida y vuelta efectivo"""
+    conn = psycopg2.connect(**settings)
+    try:
+        values = []
+        with conn.cursor() as cursor:
+            for _ in range(count):
+                start = time.perf_counter()
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+                values.append((time.perf_counter() - start) * 1000)
+        conn.rollback()
+    finally:
+        conn.close()
+    return percentile(sorted(values), 50)
+
+
+def run_delay(delay, args, batches, tables, statements):
+    """Medir consultas y carga de pedidos con un retardo de red agregado"""
+    delay_source = None
+    settings = connection_settings()
+    if delay > 0:
+        if args.netem_device:
+            delay_source = NetemDelay(delay, args.netem_device)
+        else:
+            delay_source = DelayProxy(delay)
+        settings.update(delay_source.start())
+    try:
+        result = {"retardo_ms": delay, "ida_y_vuelta_ms": round_trip_ms(settings)}
+        query_samples = asyncio.run(
+            measure_queries(
+                args.modes, batches, args.warmup, args.connections, settings
+            )
+        )
+        result["consultas"] = {}
+        for mode, values in query_samples.items():
+            summary = summarize(values)
+            result["consultas"][mode] = {
+                "mediana_ms": summary["mediana_ms"],
+                "p95_ms": summary["p95_ms"],
+                "sentencias_por_segundo": statements
+                * len(values)
+                / (sum(values) / 1e9),
+            }
+        rows = sum(len(table_rows) for _, _, table_rows in tables)
+        result["pedidos"] = {}
+        for loader, values in measure_orders(
+            args.loaders, tables, args.repetitions, settings
+        ).items():
+            seconds = percentile(sorted(values), 50)
+            result["pedidos"][loader] = {
+                "mediana_s": seconds,
+                "filas_por_segundo": rows / seconds if seconds > 0 else 0,
+            }
+    finally:
+        if delay_source is not None:
+            delay_source.stop()
+    return result
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Ejecución síncrona (psycopg2) frente a asyncio y pipeline (psycopg 3) con latencia de red agregada"
+    )
+    parser.add_argument(
+        "--delays",
+        type=parse_delays,
+        default=[0.0, 1.0, 5.0],
+        help="ms agregados a cada viaje de ida y vuelta, separados por comas (0 = conexión directa)",
+    )
+    parser.add_argument(
+        "--netem-device",
+        help="aplicar los retardos con tc netem sobre esta interfaz en lugar del proxy local",
+    )
+    parser.add_argument(
+        "--modes",
+        type=lambda value: parse_list(value, QUERY_MODES, "modo"),
+        default=list(QUERY_MODES),
+        help=f"modos de ejecución de las consultas ({', '.join(QUERY_MODES)})",
+    )
+    parser.add_argument(
+        "--keys",
+        help="claves de workload.json de la lista de consultas, separadas por comas (por defecto todas las lecturas)",
+    )
+    parser.add_argument(
+        "--workload", default=DEFAULT_WORKLOAD, help="archivo JSON de consultas"
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=4,
+        help="conexiones del modo concurrente",
+    )
+    parser.add_argument(
+        "--loaders",
+        type=lambda value: parse_list(value, ORDER_LOADERS, "loader"),
+        default=list(ORDER_LOADERS),
+        help=f"loaders de la carga de pedidos ({', '.join(ORDER_LOADERS)})",
+    )
+    parser.add_argument(
+        "--orders", type=int, default=500, help="pedidos cargados por repetición"
+    )
+    parser.add_argument("--warmup", type=int, default=2, help="repeticiones sin medir")
+    parser.add_argument("--repetitions", type=int, default=10, help="repeticiones")
+    parser.add_argument("--seed", type=int, default=42, help="semilla")
+    parser.add_argument("--output-json", help="ruta del JSON de resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+
+    operations = load_workload(args.workload)
+    if args.keys:
+        keys = parse_list(args.keys, [op["clave"] for op in operations], "clave")
+        operations = [op for op in operations if op["clave"] in keys]
+    else:
+        operations = [op for op in operations if not is_write(op)]
+
+    conn = connect_db()
+    try:
+        operations, skipped = split_supported(conn, operations)
+        if skipped:
+            print(f"Sin soporte en este schema, se omiten: {', '.join(skipped)}")
+        sampler = ParameterSampler(conn)
+        sampler.prepare(operations)
+        batches = build_batches(
+            operations, sampler, args.warmup + args.repetitions, args.seed
+        )
+        tables = generate_orders(conn, args.orders, args.seed)
+    finally:
+        conn.close()
+    statements = sum(len(unit) for unit in batches[0])
+    rows = sum(len(table_rows) for _, _, table_rows in tables)
+    print(
+        f"\n{statements} sentencias por repetición ({', '.join(op['clave'] for op in operations)}),"
+        f" {rows} filas de pedidos, {args.repetitions} repeticiones"
+    )
+
+    results = []
+    for delay in args.delays:
+        result = run_delay(delay, args, batches, tables, statements)
+        results.append(result)
+        print(
+            f"\nRetardo +{delay:g} ms (ida y vuelta medida {result['ida_y_vuelta_ms']:.2f} ms)"
+        )
+        for mode, values in result["consultas"].items():
+            print(
+                f"  consultas {mode:>11}: mediana {values['mediana_ms']:8.2f} ms,"
+                f" p95 {values['p95_ms']:8.2f} ms, {values['sentencias_por_segundo']:8,.0f} sentencias/s"
+            )
+        for loader, values in result["pedidos"].items():
+            print(
+                f"  pedidos {loader:>13}: {values['mediana_s']:7.3f} s, {values['filas_por_segundo']:9,.0f} filas/s"
+            )
+
+    if args.output_json:
+        report = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "configuracion": {
+                "retardos_ms": args.delays,
+                "retardo": (
+                    f"netem {args.netem_device}" if args.netem_device else "proxy"
+                ),
+                "modos": args.modes,
+                "consultas": [op["clave"] for op in operations],
+                "conexiones": args.connections,
+                "loaders": args.loaders,
+                "pedidos": args.orders,
+                "repeticiones": args.repetitions,
+                "semilla": args.seed,
+            },
+            "resultados": results,
+        }
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados JSON guardados en {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
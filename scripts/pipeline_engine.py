@@ -0,0 +1,99 @@
+import asyncio
+import itertools
+
+import psycopg
+
+from db import DB_SETTINGS
+
+# Filas por bloque de INSERT enviados en el pipeline antes de sincronizar
+PIPELINE_BATCH_SIZE = 5000
+
+
+def connection_settings(**overrides):
+    """Parámetros de conexión de db.py con cambios (p. ej. host/puerto de un proxy)"""
+    settings = dict(DB_SETTINGS)
+    settings.update(overrides)
+    return settings
+
+
+def connect_pipeline(**overrides):
+    """Conexión psycopg 3 síncrona para cargar filas en modo pipeline"""
+    return psycopg.connect(**connection_settings(**overrides))
+
+
+async def connect_async(**overrides):
+    """Conexión psycopg 3 asíncrona (asyncio)"""
+    return await psycopg.AsyncConnection.connect(**connection_settings(**overrides))
+
+
+def pipeline_rows(conn, table, columns, rows, batch_size=PIPELINE_BATCH_SIZE):
+    """Cargar filas con un INSERT por fila en modo pipeline de libpq, por lotes.
+
+    Los INSERT de un lote se envían sin esperar la respuesta de cada uno; el
+    cliente espera una sola vez por lote, al sincronizar el pipeline. conn es
+    una conexión de connect_pipeline().
+    """
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        table, ", ".join(columns), ", ".join(["%s"] * len(columns))
+    )
+    rows = iter(rows)
+    total = 0
+    with conn.cursor() as cursor:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            with conn.pipeline():
+                cursor.executemany(sql, batch)
+            total += len(batch)
+    return total
+
+
+async def _consume(cursor):
+    """Filas devueltas (o afectadas) por la última sentencia del cursor"""
+    if cursor.description is not None:
+        return len(await cursor.fetchall())
+    return cursor.rowcount
+
+
+async def run_sequential(conn, statements):
+    """Ejecutar las sentencias una tras otra, esperando cada respuesta"""
+    counts = []
+    for sql, params in statements:
+        cursor = await conn.execute(sql, params)
+        counts.append(await _consume(cursor))
+    return counts
+
+
+async def run_pipelined(conn, statements):
+    """Enviar todas las sentencias en un pipeline y leer las respuestas al final
+
+    Las sentencias deben ser independientes entre sí: se envían antes de
+    conocer el resultado de las anteriores y, si una falla, las siguientes de
+    la misma transacción se descartan.
+    """
+    async with conn.pipeline() as pipeline:
+        cursors = [await conn.execute(sql, params) for sql, params in statements]
+        await pipeline.sync()
+        return [await _consume(cursor) for cursor in cursors]
+
+
+async def run_concurrent(conns, units):
+    """Repartir unidades de sentencias entre varias conexiones y ejecutarlas a la vez
+
+    Cada unidad es una lista de sentencias que deben ir por la misma conexión
+    (p. ej. la preparación de una consulta y la consulta). Devuelve las filas
+    de cada sentencia, unidad por unidad.
+    """
+    groups = [units[i :: len(conns)] for i in range(len(conns))]
+
+    async def worker(conn, group):
+        return [await run_sequential(conn, unit) for unit in group]
+
+    results = await asyncio.gather(
+        *(worker(conn, group) for conn, group in zip(conns, groups))
+    )
+    counts = [None] * len(units)
+    for i, group_counts in enumerate(results):
+        counts[i :: len(conns)] = group_counts
+    return counts
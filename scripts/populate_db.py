@@ -1,24 +1,256 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import struct
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
 import psycopg2
 import psycopg2.extras
 from faker import Faker
 import random
-import sys
 
+from bulk_load import BulkLoad, compare_reports
+from db import connect_db
+from load_report import LoadReport, describe, enable_function_stats, flush_stats
 
-def connect_db():
-    """Conectar a la base de datos"""
-    try:
-        conn = psycopg2.connect(
-            host="postgres",
-            port=5432,
-            user="postgres",
-            password="password",
-            dbname="e_shopify_db",
+# Filas por sentencia COPY / por lote de executemany
+BATCH_SIZE = 5000
+
+# Tamaño de bloque que psycopg2 solicita al stream de COPY en cada lectura
+COPY_BUFFER_SIZE = 64 * 1024
+
+LOADERS = ("insert", "values", "copy", "copy-binary")
+
+# Loader de populate_db.py que no comparten los demás scripts: cada proceso
+# carga con su propia conexión psycopg 3 en modo pipeline (pipeline_engine.py)
+PIPELINE_LOADER = "pipeline"
+
+# faker: filas una a una con Faker y random; numpy: columnas completas (column_gen.py)
+GENERATORS = ("faker", "numpy")
+
+# Filas por bloque de trabajo en modo paralelo; cada bloque tiene su propia semilla
+CHUNK_ROWS = 10000
+
+# Máximo de items por pedido: cada pedido reserva este número de IDs de pedido_item
+MAX_ITEMS_PER_ORDER = 5
+
+# Pedidos generados y cargados juntos (con sus items y pagos) en cada lote
+ORDER_BATCH_SIZE = 1000
+
+CENT = Decimal("0.01")
+
+# Fechas generadas relativas a una fecha fija (no a "now") para que sean reproducibles
+REFERENCE_DATE = datetime(2026, 2, 1)
+
+# Antigüedad máxima de los pedidos generados (hasta REFERENCE_DATE)
+ORDER_HISTORY = timedelta(days=365)
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack("!h", -1)
+_PG_EPOCH = datetime(2000, 1, 1)
+
+
+def _copy_text_value(value):
+    """Serializar un valor en formato texto de COPY"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_text_row(row):
+    """Serializar una fila en formato texto de COPY"""
+    return ("\t".join(_copy_text_value(value) for value in row) + "\n").encode("utf-8")
+
+
+def _numeric_binary(value):
+    """Codificar un DECIMAL en el formato binario de numeric (base 10000)"""
+    sign, digits, exponent = Decimal(str(value)).as_tuple()
+    digits = "".join(map(str, digits))
+    if exponent >= 0:
+        integer, fraction = digits + "0" * exponent, ""
+    else:
+        integer = digits[:exponent]
+        fraction = digits[exponent:].rjust(-exponent, "0")
+    integer = integer.lstrip("0")
+    integer = integer.rjust((len(integer) + 3) // 4 * 4, "0")
+    fraction = fraction.ljust((len(fraction) + 3) // 4 * 4, "0")
+
+    groups = [int(integer[i : i + 4]) for i in range(0, len(integer), 4)]
+    weight = len(groups) - 1
+    groups += [int(fraction[i : i + 4]) for i in range(0, len(fraction), 4)]
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+
+    header = struct.pack(
+        "!hhHH", len(groups), weight, 0x4000 if sign else 0, max(0, -exponent)
+    )
+    return header + struct.pack(f"!{len(groups)}H", *groups)
+
+
+def _copy_binary_field(value):
+    """Serializar un valor en formato binario de COPY (longitud + datos)"""
+    if value is None:
+        return struct.pack("!i", -1)
+    if isinstance(value, bool):
+        data = b"\x01" if value else b"\x00"
+    elif isinstance(value, int):
+        data = struct.pack("!i", value)
+    elif isinstance(value, (float, Decimal)):
+        data = _numeric_binary(value)
+    elif isinstance(value, datetime):
+        delta = value - _PG_EPOCH
+        data = struct.pack(
+            "!q", (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
         )
-        return conn
-    except Exception as e:
-        print(f"Error conectando a BD: {e}")
-        sys.exit(1)
+    else:
+        data = str(value).encode("utf-8")
+    return struct.pack("!i", len(data)) + data
+
+
+def _copy_binary_row(row):
+    """Serializar una fila en formato binario de COPY"""
+    return struct.pack("!h", len(row)) + b"".join(
+        _copy_binary_field(value) for value in row
+    )
+
+
+class CopyStream:
+    """Objeto tipo archivo que serializa filas de un generador bajo demanda.
+
+    psycopg2 llama a read() solo cuando puede enviar más datos al servidor,
+    por lo que el generador avanza al ritmo del socket (back-pressure) y en
+    memoria nunca hay más de un bloque de COPY_BUFFER_SIZE bytes.
+    """
+
+    def __init__(self, rows, binary=False, encode=None):
+        self._rows = iter(rows)
+        self._encode = encode or (_copy_binary_row if binary else _copy_text_row)
+        self._buffer = bytearray(_PGCOPY_HEADER if binary else b"")
+        self._trailer = _PGCOPY_TRAILER if binary else b""
+        self._exhausted = False
+        self.rows = 0
+
+    def read(self, size=-1):
+        while not self._exhausted and (size < 0 or len(self._buffer) < size):
+            row = next(self._rows, None)
+            if row is None:
+                self._buffer += self._trailer
+                self._exhausted = True
+            else:
+                self._buffer += self._encode(row)
+                self.rows += 1
+        if size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+
+def copy_rows(
+    conn, table, columns, rows, binary=False, batch_size=BATCH_SIZE, encode=None
+):
+    """Cargar filas con COPY ... FROM STDIN, un COPY por lote de batch_size filas.
+
+    encode reemplaza la serialización por defecto de cada fila (p. ej. filas
+    que ya vienen como texto de COPY).
+    """
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT {})".format(
+        table, ", ".join(columns), "binary" if binary else "text"
+    )
+    rows = iter(rows)
+    total = 0
+    with conn.cursor() as cursor:
+        while True:
+            first = next(rows, None)
+            if first is None:
+                break
+            batch = itertools.chain((first,), itertools.islice(rows, batch_size - 1))
+            stream = CopyStream(batch, binary, encode)
+            cursor.copy_expert(sql, stream, size=COPY_BUFFER_SIZE)
+            total += stream.rows
+    return total
+
+
+def insert_rows(conn, table, columns, rows, batch_size=BATCH_SIZE):
+    """Cargar filas con executemany (un INSERT por fila), por lotes"""
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        table, ", ".join(columns), ", ".join(["%s"] * len(columns))
+    )
+    rows = iter(rows)
+    total = 0
+    with conn.cursor() as cursor:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            cursor.executemany(sql, batch)
+            total += len(batch)
+    return total
+
+
+def insert_values(conn, table, columns, rows, batch_size=BATCH_SIZE):
+    """Cargar filas con INSERT multi-fila (VALUES (...), (...), ...), por lotes"""
+    sql = "INSERT INTO {} ({}) VALUES %s".format(table, ", ".join(columns))
+    rows = iter(rows)
+    total = 0
+    with conn.cursor() as cursor:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            psycopg2.extras.execute_values(cursor, sql, batch, page_size=1000)
+            total += len(batch)
+    return total
+
+
+def load_rows(conn, table, columns, rows, loader="insert"):
+    """Cargar filas con el loader indicado y devolver cuántas se cargaron.
+
+    Todas las filas llevan su clave primaria explícita (reservada con
+    reserve_ids), así que no hay conflictos y COPY puede cargarlas sin
+    ON CONFLICT.
+    """
+    if loader == "insert":
+        return insert_rows(conn, table, columns, rows)
+    if loader == "values":
+        return insert_values(conn, table, columns, rows)
+    if loader == PIPELINE_LOADER:
+        # Importación diferida: psycopg 3 solo hace falta con --loader pipeline
+        from pipeline_engine import pipeline_rows
+
+        return pipeline_rows(conn, table, columns, rows)
+    return copy_rows(conn, table, columns, rows, binary=loader == "copy-binary")
+
+
+def reserve_ids(conn, table, column, count):
+    """Reservar un bloque contiguo de IDs en la secuencia SERIAL de la tabla"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, %s), nextval(pg_get_serial_sequence(%s, %s)) + %s - 1)",
+            (table, column, table, column, count),
+        )
+        last_id = cursor.fetchone()[0]
+    return last_id - count + 1
 
 
 def populate_categories(conn, fake):
@@ -45,405 +277,847 @@ def populate_categories(conn, fake):
     print("Categorías pobladas")
 
 
-def populate_users(conn, fake, num_users=1000):
+def populate_users(conn, rng, fake, loader, user_ids):
     """Poblar usuarios"""
-    users = []
-    existing_emails = set()
 
-    # Obtener emails existentes
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT email FROM usuario")
-        existing_emails = set(row[0] for row in cursor.fetchall())
-
-    for _ in range(num_users):
-        email = fake.email()
-        while email in existing_emails:
-            email = fake.email()
-        existing_emails.add(email)
-
-        users.append(
-            (
+    def generate():
+        for user_id in user_ids:
+            # El ID en el email garantiza unicidad sin guardar los ya generados
+            local, domain = fake.email().split("@")
+            yield (
+                user_id,
                 fake.name(),
-                email,
+                f"{local}.{user_id}@{domain}",
                 "$2b$10$abcdefghijklmnopqrstuvwxABCDEFGHIJKLMN"
-                + str(random.randint(1, 1000)),
+                + str(rng.randint(1, 1000)),
                 fake.phone_number()[:20],  # Limitar longitud
-                fake.date_time_between(start_date="-2y", end_date="now"),
+                fake.date_time_between(
+                    start_date=REFERENCE_DATE - timedelta(days=730),
+                    end_date=REFERENCE_DATE,
+                ),
             )
-        )
-
-    with conn.cursor() as cursor:
-        cursor.executemany(
-            "INSERT INTO usuario (nombre, email, contrasena, telefono, fecha_registro) VALUES (%s, %s, %s, %s, %s) ON CONFLICT (email) DO NOTHING",
-            users,
-        )
-    conn.commit()
-    print(f"{len(users)} usuarios poblados (posiblemente algunos ya existían)")
-
-
-def populate_vendors(conn, fake, num_vendors=50):
-    """Poblar vendedores"""
-    # Obtener IDs de usuarios que no son vendedores aún
-    with conn.cursor() as cursor:
-        cursor.execute(
-            "SELECT usuario_id FROM usuario WHERE usuario_id > 5 ORDER BY RANDOM() LIMIT %s",
-            (num_vendors,),
-        )
-        user_ids = [row[0] for row in cursor.fetchall()]
 
-    vendors = []
-    existing_stores = set()
+    total = load_rows(
+        conn,
+        "usuario",
+        ("usuario_id", "nombre", "email", "contrasena", "telefono", "fecha_registro"),
+        generate(),
+        loader,
+    )
+    return {"usuario": total}
 
-    # Obtener tiendas existentes
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT nombre_tienda FROM vendedor")
-        existing_stores = set(row[0] for row in cursor.fetchall())
 
-    for user_id in user_ids:
-        store_name = fake.company() + " Store"
-        while store_name in existing_stores:
-            store_name = fake.company() + " Store"
-        existing_stores.add(store_name)
+def populate_vendors(conn, rng, fake, loader, vendor_ids, user_ids):
+    """Poblar vendedores (el k-ésimo vendedor es el k-ésimo usuario generado)"""
 
-        vendors.append(
-            (
+    def generate():
+        for vendor_id, user_id in zip(vendor_ids, user_ids):
+            yield (
+                vendor_id,
                 user_id,
-                store_name,
+                f"{fake.company()} Store {vendor_id}",
                 fake.text(max_nb_chars=200),
-                random.choice([True, False]),
+                rng.choice([True, False]),
             )
-        )
 
-    with conn.cursor() as cursor:
-        cursor.executemany(
-            "INSERT INTO vendedor (usuario_id, nombre_tienda, descripcion, activo) VALUES (%s, %s, %s, %s) ON CONFLICT (usuario_id) DO NOTHING",
-            vendors,
-        )
-    conn.commit()
-    print(f"{len(vendors)} vendedores poblados (posiblemente algunos ya existían)")
+    total = load_rows(
+        conn,
+        "vendedor",
+        ("vendedor_id", "usuario_id", "nombre_tienda", "descripcion", "activo"),
+        generate(),
+        loader,
+    )
+    return {"vendedor": total}
 
 
-def populate_addresses(conn, fake, num_addresses=800):
-    """Poblar direcciones"""
-    with conn.cursor() as cursor:
-        cursor.execute(
-            "SELECT usuario_id FROM usuario ORDER BY RANDOM() LIMIT %s",
-            (num_addresses,),
-        )
-        user_ids = [row[0] for row in cursor.fetchall()]
+def populate_addresses(conn, rng, fake, loader, address_ids, user_ids):
+    """Poblar direcciones (la k-ésima dirección pertenece al k-ésimo usuario)"""
 
-    addresses = []
-    for user_id in user_ids:
-        addresses.append(
-            (
+    def generate():
+        for address_id, user_id in zip(address_ids, user_ids):
+            yield (
+                address_id,
                 user_id,
                 fake.street_address(),
                 fake.city(),
-                str(random.randint(10000, 99999))[:20],  # Código postal aleatorio
+                str(rng.randint(10000, 99999))[:20],  # Código postal aleatorio
                 fake.country(),
-                random.choice([True, False]),
+                rng.choice([True, False]),
             )
-        )
 
-    with conn.cursor() as cursor:
-        cursor.executemany(
-            "INSERT INTO direccion (usuario_id, direccion, ciudad, codigo_postal, pais, es_principal) VALUES (%s, %s, %s, %s, %s, %s)",
-            addresses,
-        )
-    conn.commit()
-    print(f"{num_addresses} direcciones pobladas")
+    total = load_rows(
+        conn,
+        "direccion",
+        (
+            "direccion_id",
+            "usuario_id",
+            "direccion",
+            "ciudad",
+            "codigo_postal",
+            "pais",
+            "es_principal",
+        ),
+        generate(),
+        loader,
+    )
+    return {"direccion": total}
 
 
-def populate_products(conn, fake, num_products=5000):
+def populate_carts(conn, rng, fake, loader, cart_ids, user_ids):
+    """Poblar carritos (uno por usuario)"""
+    total = load_rows(
+        conn,
+        "carrito",
+        ("carrito_id", "usuario_id"),
+        zip(cart_ids, user_ids),
+        loader,
+    )
+    return {"carrito": total}
+
+
+def _mix64(value):
+    """Función de mezcla splitmix64"""
+    value = (value + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
+
+
+class ProductAttributes:
+    """Precio y estado de cada producto derivados de su ID.
+
+    Los pedidos recalculan el precio de cualquier producto en O(1), sin
+    releer la tabla producto ni guardar el catálogo en memoria.
+    """
+
+    def __init__(self, salt):
+        self.salt = salt
+
+    def _unit(self, product_id, field):
+        return _mix64(self.salt ^ _mix64(product_id * 8 + field)) / 2**64
+
+    def price(self, product_id):
+        return Decimal(10 + self._unit(product_id, 0) * 1990).quantize(CENT)
+
+    def is_active(self, product_id):
+        return self._unit(product_id, 1) < 0.75  # 75% activos
+
+    def sample_active(self, rng, product_ids, count):
+        """Elegir count productos activos distintos al azar
+
+        Con menos de count activos (factores de escala muy chicos) devuelve
+        todos los activos, tras haber sorteado cada producto al menos una vez.
+        """
+        chosen = []
+        seen = set()
+        while len(chosen) < count and len(seen) < len(product_ids):
+            product_id = rng.choice(product_ids)
+            if product_id not in seen:
+                seen.add(product_id)
+                if self.is_active(product_id):
+                    chosen.append(product_id)
+        return chosen
+
+
+# Nombres base de producto; a cada uno se le agrega una palabra al azar
+PRODUCT_NAMES = [
+    "Laptop",
+    "Mouse",
+    "Teclado",
+    "Monitor",
+    "Smartphone",
+    "Tablet",
+    "Audífonos",
+    "Camiseta",
+    "Pantalón",
+    "Zapatos",
+    "Chaqueta",
+    "Vestido",
+    "Bolso",
+    "Silla",
+    "Mesa",
+    "Lámpara",
+    "Cortinas",
+    "Almohada",
+    "Sábanas",
+    "Pelota",
+    "Raqueta",
+    "Bicicleta",
+    "Pesas",
+    "Colchoneta",
+    "Novela",
+    "Texto",
+    "Cómic",
+    "Libro infantil",
+    "Muñeca",
+    "Auto de juguete",
+    "Lego",
+    "Puzzle",
+    "Crema",
+    "Shampoo",
+    "Perfume",
+    "Maquillaje",
+    "Aceite",
+    "Filtros",
+    "Llantas",
+    "Batería",
+    "Guitarra",
+    "Piano",
+    "Micrófono",
+    "Altavoces",
+    "Escritorio",
+    "Silla ergonómica",
+    "Archivador",
+    "Impresora",
+]
+
+
+def populate_products(
+    conn, rng, fake, loader, product_ids, vendor_ids, category_ids, attributes
+):
     """Poblar productos"""
-    # Obtener categorías y vendedores
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT categoria_id FROM categoria")
-        category_ids = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT vendedor_id FROM vendedor")
-        vendor_ids = [row[0] for row in cursor.fetchall()]
-
-    products = []
-    product_names = [
-        "Laptop",
-        "Mouse",
-        "Teclado",
-        "Monitor",
-        "Smartphone",
-        "Tablet",
-        "Audífonos",
-        "Camiseta",
-        "Pantalón",
-        "Zapatos",
-        "Chaqueta",
-        "Vestido",
-        "Bolso",
-        "Silla",
-        "Mesa",
-        "Lámpara",
-        "Cortinas",
-        "Almohada",
-        "Sábanas",
-        "Pelota",
-        "Raqueta",
-        "Bicicleta",
-        "Pesas",
-        "Colchoneta",
-        "Novela",
-        "Texto",
-        "Cómic",
-        "Libro infantil",
-        "Muñeca",
-        "Auto de juguete",
-        "Lego",
-        "Puzzle",
-        "Crema",
-        "Shampoo",
-        "Perfume",
-        "Maquillaje",
-        "Aceite",
-        "Filtros",
-        "Llantas",
-        "Batería",
-        "Guitarra",
-        "Piano",
-        "Micrófono",
-        "Altavoces",
-        "Escritorio",
-        "Silla ergonómica",
-        "Archivador",
-        "Impresora",
-    ]
 
-    for _ in range(num_products):
-        name = random.choice(product_names) + " " + fake.word().capitalize()
-        products.append(
-            (
-                random.choice(vendor_ids),
-                random.choice(category_ids),
+    def generate():
+        for product_id in product_ids:
+            name = rng.choice(PRODUCT_NAMES) + " " + fake.word().capitalize()
+            yield (
+                product_id,
+                rng.choice(vendor_ids),
+                rng.choice(category_ids),
                 name[:255],  # Limitar longitud
                 fake.text(max_nb_chars=500),
-                round(random.uniform(10, 2000), 2),
+                attributes.price(product_id),
                 fake.image_url()[:255],
-                random.choice([True, True, True, False]),  # 75% activos
+                attributes.is_active(product_id),
             )
-        )
 
-    # Insertar en lotes para mejor rendimiento
-    batch_size = 1000
-    with conn.cursor() as cursor:
-        for i in range(0, len(products), batch_size):
-            batch = products[i : i + batch_size]
-            cursor.executemany(
-                "INSERT INTO producto (vendedor_id, categoria_id, nombre, descripcion, precio, imagen, activo) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                batch,
-            )
-    conn.commit()
-    print(f"{num_products} productos poblados")
+    total = load_rows(
+        conn,
+        "producto",
+        (
+            "producto_id",
+            "vendedor_id",
+            "categoria_id",
+            "nombre",
+            "descripcion",
+            "precio",
+            "imagen",
+            "activo",
+        ),
+        generate(),
+        loader,
+    )
+    return {"producto": total}
 
 
-def populate_inventory(conn, fake):
-    """Poblar inventario para todos los productos"""
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT producto_id FROM producto")
-        product_ids = [row[0] for row in cursor.fetchall()]
+def populate_inventory(conn, rng, fake, loader, inventory_ids, product_ids):
+    """Poblar inventario (uno por producto generado)"""
 
-    inventory = []
-    for product_id in product_ids:
-        inventory.append(
-            (
+    def generate():
+        for inventory_id, product_id in zip(inventory_ids, product_ids):
+            yield (
+                inventory_id,
                 product_id,
-                random.randint(0, 1000),  # cantidad_disponible
-                random.randint(0, 50),  # cantidad_reservada
+                rng.randint(0, 1000),  # cantidad_disponible
+                rng.randint(0, 50),  # cantidad_reservada
             )
-        )
 
-    with conn.cursor() as cursor:
-        cursor.executemany(
-            "INSERT INTO inventario (producto_id, cantidad_disponible, cantidad_reservada) VALUES (%s, %s, %s) ON CONFLICT (producto_id) DO NOTHING",
-            inventory,
-        )
-    conn.commit()
-    print(
-        f"Inventario poblado para {len(inventory)} productos (posiblemente algunos ya existían)"
+    total = load_rows(
+        conn,
+        "inventario",
+        ("inventario_id", "producto_id", "cantidad_disponible", "cantidad_reservada"),
+        generate(),
+        loader,
     )
+    return {"inventario": total}
 
 
-def populate_reviews(conn, fake, num_reviews=10000):
+def populate_reviews(conn, rng, fake, loader, review_ids, user_ids, product_ids):
     """Poblar reseñas"""
-    # Obtener productos y usuarios
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT producto_id FROM producto")
-        product_ids = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT usuario_id FROM usuario")
-        user_ids = [row[0] for row in cursor.fetchall()]
+    reviews = [
+        (
+            rng.choice(user_ids),
+            rng.choice(product_ids),
+            rng.randint(1, 5),
+            fake.text(max_nb_chars=300),
+            rng.randint(0, 100),
+        )
+        for _ in review_ids
+    ]
+    # Ordenar por producto: cada lote de COPY toca menos productos y el
+    # trigger de calificación actualiza cada uno una sola vez por sentencia
+    reviews.sort(key=lambda review: review[1])
+
+    total = load_rows(
+        conn,
+        "resena",
+        (
+            "resena_id",
+            "usuario_id",
+            "producto_id",
+            "calificacion",
+            "comentario",
+            "util",
+        ),
+        ((review_id,) + review for review_id, review in zip(review_ids, reviews)),
+        loader,
+    )
+    return {"resena": total}
+
+
+PEDIDO_COLUMNS = (
+    "pedido_id",
+    "usuario_id",
+    "direccion_id",
+    "estado_pedido_id",
+    "fecha_pedido",
+    "monto_subtotal",
+    "monto_impuesto",
+    "monto_envio",
+    "monto_total",
+)
+
+
+PEDIDO_ITEM_COLUMNS = (
+    "pedido_item_id",
+    "pedido_id",
+    "producto_id",
+    "cantidad",
+    "precio_unitario",
+    "subtotal",
+)
+
+PAGO_COLUMNS = (
+    "pago_id",
+    "pedido_id",
+    "metodo_pago_id",
+    "estado_pago_id",
+    "monto",
+    "referencia_pago",
+)
+
+
+def generate_order(
+    rng, fake, order_id, first_item_id, user_ids, address_ids, product_ids, attributes
+):
+    """Generar un pedido con sus items y su pago.
+
+    Los montos se calculan en Decimal a partir de los mismos items que se
+    insertan, de modo que monto_subtotal coincide con SUM(pedido_item.subtotal)
+    y el pago con monto_total.
+    """
+    # Solo compran usuarios con dirección: la k-ésima es del k-ésimo usuario
+    k = rng.randrange(len(address_ids))
+    order_date = fake.date_time_between(
+        start_date=REFERENCE_DATE - ORDER_HISTORY, end_date=REFERENCE_DATE
+    )
 
-    reviews = []
-    for _ in range(num_reviews):
-        reviews.append(
+    items = []
+    num_items = rng.randint(1, MAX_ITEMS_PER_ORDER)
+    for position, product_id in enumerate(
+        attributes.sample_active(rng, product_ids, num_items)
+    ):
+        quantity = rng.randint(1, 3)
+        price = attributes.price(product_id)
+        items.append(
             (
-                random.choice(user_ids),
-                random.choice(product_ids),
-                random.randint(1, 5),
-                fake.text(max_nb_chars=300),
-                random.randint(0, 100),
+                first_item_id + position,
+                order_id,
+                product_id,
+                quantity,
+                price,
+                price * quantity,
             )
         )
 
-    # Insertar en lotes
-    batch_size = 2000
-    with conn.cursor() as cursor:
-        for i in range(0, len(reviews), batch_size):
-            batch = reviews[i : i + batch_size]
-            cursor.executemany(
-                "INSERT INTO resena (usuario_id, producto_id, calificacion, comentario, util) VALUES (%s, %s, %s, %s, %s)",
-                batch,
+    subtotal = sum(item[5] for item in items)
+    tax = (subtotal * Decimal("0.19")).quantize(CENT)  # 19% IVA
+    shipping = Decimal(rng.uniform(5, 50)).quantize(CENT)
+    total = subtotal + tax + shipping
+
+    order = (
+        order_id,
+        user_ids[k],
+        address_ids[k],
+        rng.randint(1, 6),  # estado_pedido_id
+        order_date,
+        subtotal,
+        tax,
+        shipping,
+        total,
+    )
+    payment = (
+        rng.randint(1, 5),  # metodo_pago_id
+        rng.randint(1, 5),  # estado_pago_id
+        total,
+        f"REF-{order_id:04d}-2024",
+    )
+    return order, items, payment
+
+
+def populate_orders(
+    conn,
+    rng,
+    fake,
+    loader,
+    order_ids,
+    item_ids,
+    payment_ids,
+    user_ids,
+    address_ids,
+    product_ids,
+    attributes,
+    partitioned=False,
+):
+    """Poblar pedidos con sus items y pagos, por lotes de ORDER_BATCH_SIZE pedidos.
+
+    Cada lote genera pedidos, items y pagos juntos y los carga tabla por tabla
+    con el loader elegido; los IDs vienen de bloques reservados de antemano
+    (MAX_ITEMS_PER_ORDER IDs de pedido_item por pedido). Con pedido
+    particionado, los pedidos de cada lote se cargan ordenados por fecha: las
+    filas de un mismo mes llegan juntas a su partición.
+    """
+    counts = {"pedido": 0, "pedido_item": 0, "pago": 0}
+    for start in range(0, len(order_ids), ORDER_BATCH_SIZE):
+        orders, items, payments = [], [], []
+        for index in range(start, min(start + ORDER_BATCH_SIZE, len(order_ids))):
+            order, order_items, payment = generate_order(
+                rng,
+                fake,
+                order_ids[index],
+                item_ids[index * MAX_ITEMS_PER_ORDER],
+                user_ids,
+                address_ids,
+                product_ids,
+                attributes,
             )
+            orders.append(order)
+            items.extend(order_items)
+            payments.append((payment_ids[index], order[0]) + payment)
+
+        if partitioned:
+            orders.sort(key=lambda order: order[4])
+        counts["pedido"] += load_rows(conn, "pedido", PEDIDO_COLUMNS, orders, loader)
+        counts["pedido_item"] += load_rows(
+            conn, "pedido_item", PEDIDO_ITEM_COLUMNS, items, loader
+        )
+        counts["pago"] += load_rows(conn, "pago", PAGO_COLUMNS, payments, loader)
+    return counts
+
+
+def derive_seed(*parts):
+    """Semilla de 64 bits derivada de forma estable (independiente de PYTHONHASHSEED)"""
+    digest = hashlib.sha256(":".join(map(str, parts)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def chunk_tasks(populate, ids, aligned=None, **shared):
+    """Dividir un rango de IDs en bloques de CHUNK_ROWS filas.
+
+    Los rangos de aligned se recortan en proporción a ids (por ejemplo, los
+    usuarios de cada bloque de direcciones); shared se pasa completo.
+    """
+    aligned = aligned or {}
+    tasks = []
+    for chunk, start in enumerate(range(0, len(ids), CHUNK_ROWS)):
+        stop = min(start + CHUNK_ROWS, len(ids))
+        kwargs = dict(shared)
+        for name, values in aligned.items():
+            factor = len(values) // len(ids)
+            kwargs[name] = values[start * factor : stop * factor]
+        tasks.append((populate, chunk, ids[start:stop], kwargs))
+    return tasks
+
+
+# Estado de cada proceso de población: conexión, Faker y semilla propios
+_worker = {}
+
+
+def _init_worker(seed, loader, conn=None, instrument=False):
+    """Inicializar un proceso de población"""
+    _worker["seed"] = seed
+    _worker["loader"] = loader
+    if loader == PIPELINE_LOADER:
+        from pipeline_engine import connect_pipeline
+
+        # Los bloques se cargan con psycopg 3; la conexión principal sigue en psycopg2
+        conn = connect_pipeline()
+    _worker["conn"] = conn or connect_db()
+    _worker["fake"] = Faker("es_CO")
+    _worker["instrument"] = instrument
+    if instrument:
+        enable_function_stats(_worker["conn"])
+    # Métricas de vendedores del schema optimizado: solo registrar deltas
+    # durante la carga y aplicarlos en un lote al final (apply_seller_metrics)
+    with _worker["conn"].cursor() as cursor:
+        cursor.execute("SET eshopify.metricas_vendedor = 'diferido'")
+    _worker["conn"].commit()
+
+
+def _run_chunk(task):
+    """Generar y cargar un bloque con semillas derivadas de (semilla, tabla, bloque)
+
+    Devuelve las filas por tabla, el tiempo de reloj y el tiempo de CPU del
+    proceso empleados en el bloque.
+    """
+    populate, chunk, ids, kwargs = task
+    start = time.perf_counter()
+    cpu = time.process_time()
+    seed = _worker["seed"]
+    fake = _worker["fake"]
+    fake.seed_instance(derive_seed(seed, populate.__name__, chunk, "faker"))
+    rng = random.Random(derive_seed(seed, populate.__name__, chunk))
+    conn = _worker["conn"]
+    counts = populate(conn, rng, fake, _worker["loader"], ids, **kwargs)
+    if _worker["instrument"]:
+        with conn.cursor() as cursor:
+            flush_stats(cursor)
     conn.commit()
-    print(f"{num_reviews} reseñas pobladas")
+    return counts, time.perf_counter() - start, time.process_time() - cpu
+
+
+def run_stage(pool, tasks, loader):
+    """Ejecutar los bloques de una etapa e informar filas/segundo por tabla.
+
+    El tiempo de cada tabla es la suma del tiempo de sus bloques, de modo que
+    filas/s es el rendimiento por proceso; el total de la etapa es de reloj.
+    Las tablas que se generan juntas en un mismo bloque (pedido, pedido_item
+    y pago) se informan en una sola línea con su tiempo conjunto. Devuelve
+    las filas por tabla y la suma de tiempo ocupado y de CPU de todos los
+    bloques.
+    """
+    start = time.perf_counter()
+    totals, group_rows, busy = {}, {}, {}
+    stage_busy = stage_cpu = 0.0
+    results = pool.imap_unordered(_run_chunk, tasks) if pool else map(_run_chunk, tasks)
+    for counts, elapsed, cpu in results:
+        stage_busy += elapsed
+        stage_cpu += cpu
+        for table, count in counts.items():
+            totals[table] = totals.get(table, 0) + count
+        group = " + ".join(counts)
+        group_rows[group] = group_rows.get(group, 0) + sum(counts.values())
+        busy[group] = busy.get(group, 0) + elapsed
+    for group, total in group_rows.items():
+        rate = total / busy[group] if busy[group] > 0 else 0
+        print(
+            f"  {group}: {total} filas en {busy[group]:.2f} s ({rate:,.0f} filas/s, {loader})"
+        )
+    print(f"  etapa completada en {time.perf_counter() - start:.2f} s")
+    return totals, stage_busy, stage_cpu
 
 
-def populate_carts_and_orders(conn, fake, num_orders=2000):
-    """Poblar carritos y pedidos"""
-    # Obtener usuarios y direcciones
+def recalculate_ratings(conn):
+    """Recalcular promedio_calificacion, total_resenas y suma_calificaciones en una sola pasada.
+
+    Los triggers del schema optimizado ajustan suma y conteo con deltas, lo que
+    es correcto con cargas en paralelo; este recálculo queda para cargas hechas
+    con los triggers deshabilitados (--bulk) o para corregir datos existentes.
+    Solo se escriben los productos cuyos valores cambian.
+    """
     with conn.cursor() as cursor:
         cursor.execute(
-            "SELECT usuario_id FROM usuario ORDER BY RANDOM() LIMIT %s", (num_orders,)
+            "SELECT 1 FROM information_schema.columns WHERE table_name = 'producto' AND column_name = 'suma_calificaciones'"
         )
-        user_ids = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT direccion_id, usuario_id FROM direccion")
-        address_map = {row[1]: row[0] for row in cursor.fetchall()}
-
-    # Crear carritos
-    carts = [(user_id,) for user_id in user_ids[: len(user_ids) // 2]]
-    with conn.cursor() as cursor:
-        cursor.executemany(
-            "INSERT INTO carrito (usuario_id) VALUES (%s) ON CONFLICT (usuario_id) DO NOTHING",
-            carts,
+        if cursor.fetchone() is None:
+            return
+        cursor.execute(
+            "UPDATE producto p SET promedio_calificacion = c.promedio, total_resenas = c.total, suma_calificaciones = c.suma FROM (SELECT p2.producto_id, COALESCE(ROUND(r.suma::DECIMAL / r.total, 2), 0) AS promedio, COALESCE(r.total, 0) AS total, COALESCE(r.suma, 0) AS suma FROM producto p2 LEFT JOIN (SELECT producto_id, SUM(calificacion) AS suma, COUNT(*) AS total FROM resena GROUP BY producto_id) r ON r.producto_id = p2.producto_id) c WHERE p.producto_id = c.producto_id AND (p.promedio_calificacion, p.total_resenas, p.suma_calificaciones) IS DISTINCT FROM (c.promedio, c.total, c.suma)"
         )
+        updated = cursor.rowcount
     conn.commit()
+    print(
+        f"Calificaciones de productos recalculadas ({updated} productos actualizados)"
+    )
 
-    # Obtener productos
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT producto_id, precio FROM producto WHERE activo = true")
-        products = cursor.fetchall()
-
-    # Crear pedidos
-    orders = []
-
-    for i, user_id in enumerate(user_ids):
-        address_id = address_map.get(user_id, 1)
-        order_date = fake.date_time_between(start_date="-1y", end_date="now")
-
-        # Crear pedido
-        subtotal = 0
-        num_items = random.randint(1, 5)
-        items = random.sample(products, num_items)
 
-        for product_id, price in items:
-            quantity = random.randint(1, 3)
-            price_float = float(price)
-            subtotal += price_float * quantity
+def apply_seller_metrics(conn):
+    """Aplicar en un solo lote los deltas de métricas de vendedores de la carga"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regproc('aplicar_deltas_metricas_vendedor')")
+        if cursor.fetchone()[0] is None:
+            return
+        start = time.perf_counter()
+        cursor.execute("SELECT aplicar_deltas_metricas_vendedor()")
+        applied = cursor.fetchone()[0]
+    conn.commit()
+    print(
+        f"Métricas de vendedores: {applied} deltas aplicados en {time.perf_counter() - start:.2f} s"
+    )
 
-        tax = subtotal * 0.19  # 19% IVA
-        shipping = random.uniform(5, 50)
-        total = subtotal + tax + shipping
 
-        orders.append(
-            (
-                user_id,
-                address_id,
-                random.randint(1, 6),  # estado_pedido_id
-                order_date,
-                subtotal,
-                tax,
-                shipping,
-                total,
-            )
+def prepare_partitions(conn):
+    """Crear las particiones de pedido del rango de fechas generado, si está particionado"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('pedido')"
         )
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute(
+            "SELECT crear_particiones_mensuales('pedido', %s, %s)",
+            (REFERENCE_DATE - ORDER_HISTORY, REFERENCE_DATE),
+        )
+        created = cursor.fetchone()[0]
+    conn.commit()
+    print(f"pedido particionado por mes: {created} particiones creadas")
+    return True
+
+
+def reserve_range(conn, table, column, count):
+    """Reservar count IDs de la tabla y devolverlos como range"""
+    first_id = reserve_ids(conn, table, column, count)
+    return range(first_id, first_id + count)
+
+
+# Tamaño de cada tabla con --scale-factor 1; el resto escala en proporción
+BASE_COUNTS = {
+    "usuario": 1000,
+    "vendedor": 50,
+    "direccion": 800,
+    "producto": 5000,
+    "resena": 10000,
+    "pedido": 2000,
+}
+
+
+def scaled_counts(scale_factor):
+    """Número de filas por tabla para un factor de escala dado"""
+    return {
+        table: max(1, round(count * scale_factor))
+        for table, count in BASE_COUNTS.items()
+    }
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Población masiva de e_shopify_db")
+    parser.add_argument(
+        "--loader",
+        choices=LOADERS + (PIPELINE_LOADER,),
+        default="insert",
+        help="insert: executemany (un INSERT por fila); values: INSERT multi-fila por lotes; copy / copy-binary: COPY FROM STDIN en formato texto o binario; pipeline: un INSERT por fila en modo pipeline de libpq (psycopg 3)",
+    )
+    parser.add_argument(
+        "--scale-factor",
+        type=float,
+        default=1,
+        help="multiplicador del tamaño de todas las tablas (1 = 1000 usuarios, 5000 productos, ...)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="semilla de la generación; la misma semilla produce los mismos datos",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="procesos de población en paralelo, cada uno con su propia conexión",
+    )
+    parser.add_argument(
+        "--generator",
+        choices=GENERATORS,
+        default="faker",
+        help="faker: fila a fila con Faker; numpy: columnas completas con NumPy y pools de vocabulario (requiere numpy)",
+    )
+    parser.add_argument(
+        "--skew",
+        type=float,
+        default=1.0,
+        help="exponente de la Zipf de productos y usuarios populares con --generator numpy (0 = uniforme)",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="carga masiva: sin índices secundarios, claves foráneas ni trigger de calificación durante la carga; se reconstruyen al final",
+    )
+    parser.add_argument(
+        "--index-workers",
+        type=int,
+        default=4,
+        help="conexiones que reconstruyen índices en paralelo con --bulk",
+    )
+    parser.add_argument(
+        "--compare-with",
+        help="reporte de carga anterior (--report-json) contra el que se calcula el tiempo ahorrado",
+    )
+    parser.add_argument(
+        "--report-json",
+        help="ruta del reporte de carga por fase (tiempo, CPU del cliente, espera del servidor, WAL, pg_stat_*)",
+    )
+    return parser.parse_args()
 
-    # Insertar pedidos uno por uno para manejar conflictos y obtener IDs reales
-    order_items = []
-    payments = []
 
-    for i, order_data in enumerate(orders):
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    "INSERT INTO pedido (usuario_id, direccion_id, estado_pedido_id, fecha_pedido, monto_subtotal, monto_impuesto, monto_envio, monto_total) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT DO NOTHING RETURNING pedido_id",
-                    order_data,
-                )
-                result = cursor.fetchone()
-                if result:
-                    pedido_id = result[0]
-
-                    # Agregar items para este pedido
-                    num_items = random.randint(1, 5)
-                    items = random.sample(products, num_items)
-                    for product_id, price in items:
-                        quantity = random.randint(1, 3)
-                        price_float = float(price)
-                        order_items.append(
-                            (
-                                pedido_id,
-                                product_id,
-                                quantity,
-                                price_float,
-                                price_float * quantity,
-                            )
-                        )
-
-                    # Agregar pago para este pedido
-                    total = order_data[7]  # monto_total
-                    payments.append(
-                        (
-                            pedido_id,
-                            random.randint(1, 5),  # metodo_pago_id
-                            random.randint(1, 5),  # estado_pago_id
-                            total,
-                            f"REF-{pedido_id:04d}-2024",
-                        )
-                    )
-        except Exception as e:
-            print(f"Error insertando pedido {i + 1}: {e}")
-            continue
+def generator_functions(name, seed, skew):
+    """Módulo con las funciones populate_* del generador y argumentos extra de cada bloque"""
+    if name == "numpy":
+        # Importación diferida: numpy solo hace falta con --generator numpy
+        import column_gen
 
-    # Insertar items y pagos
-    if order_items:
-        with conn.cursor() as cursor:
-            cursor.executemany(
-                "INSERT INTO pedido_item (pedido_id, producto_id, cantidad, precio_unitario, subtotal) VALUES (%s, %s, %s, %s, %s)",
-                order_items,
-            )
-            cursor.executemany(
-                "INSERT INTO pago (pedido_id, metodo_pago_id, estado_pago_id, monto, referencia_pago) VALUES (%s, %s, %s, %s, %s)",
-                payments,
-            )
-
-    conn.commit()
-    print(f"{len(payments)} pedidos con {len(order_items)} items y pagos poblados")
+        return column_gen, {"columns": column_gen.ColumnSource(seed, skew)}
+    return sys.modules[__name__], {}
 
 
 def main():
-    fake = Faker("es_CO")  # Datos en español colombiano
+    args = parse_args()
+    counts = scaled_counts(args.scale_factor)
+    attributes = ProductAttributes(derive_seed(args.seed, "ProductAttributes"))
+    source, extra = generator_functions(args.generator, args.seed, args.skew)
+
+    # El pool se crea antes de abrir la conexión para que los procesos no la hereden
+    pool = None
+    if args.workers > 1:
+        pool = multiprocessing.Pool(
+            args.workers,
+            initializer=_init_worker,
+            initargs=(args.seed, args.loader, None, bool(args.report_json)),
+        )
 
     print("Conectando a la base de datos...")
     conn = connect_db()
+    _init_worker(args.seed, args.loader, conn, bool(args.report_json))
+    report = LoadReport(conn) if args.report_json or args.compare_with else None
+    bulk = BulkLoad(conn, args.index_workers) if args.bulk else None
 
-    print("Iniciando población masiva de datos...")
+    print(
+        f"Iniciando población masiva de datos (loader: {args.loader}, generador: {args.generator}, factor de escala: {args.scale_factor:g}, semilla: {args.seed}, procesos: {args.workers})..."
+    )
 
     try:
-        populate_categories(conn, fake)
-        populate_users(conn, fake, 1000)
-        populate_vendors(conn, fake, 50)
-        populate_addresses(conn, fake, 800)
-        populate_products(conn, fake, 5000)
-        populate_inventory(conn, fake)
-        populate_reviews(conn, fake, 10000)
-        populate_carts_and_orders(conn, fake, 2000)
+        before = report.snapshot() if report else None
+        populate_categories(conn, Faker("es_CO"))
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT categoria_id FROM categoria ORDER BY categoria_id")
+            category_ids = [row[0] for row in cursor.fetchall()]
+
+        # Reservar todos los IDs antes de empezar: cada bloque conoce sus claves
+        # y las de sus dependencias sin consultar la base de datos
+        user_ids = reserve_range(conn, "usuario", "usuario_id", counts["usuario"])
+        vendor_ids = reserve_range(conn, "vendedor", "vendedor_id", counts["vendedor"])
+        address_ids = reserve_range(
+            conn, "direccion", "direccion_id", counts["direccion"]
+        )
+        cart_ids = reserve_range(conn, "carrito", "carrito_id", counts["usuario"] // 2)
+        product_ids = reserve_range(conn, "producto", "producto_id", counts["producto"])
+        inventory_ids = reserve_range(
+            conn, "inventario", "inventario_id", counts["producto"]
+        )
+        review_ids = reserve_range(conn, "resena", "resena_id", counts["resena"])
+        order_ids = reserve_range(conn, "pedido", "pedido_id", counts["pedido"])
+        item_ids = reserve_range(
+            conn,
+            "pedido_item",
+            "pedido_item_id",
+            counts["pedido"] * MAX_ITEMS_PER_ORDER,
+        )
+        payment_ids = reserve_range(conn, "pago", "pago_id", counts["pedido"])
+        conn.commit()
+        partitioned = prepare_partitions(conn)
+        if bulk:
+            bulk.prepare()
+        if report:
+            print(describe(report.record("preparacion", before)))
+
+        # Etapas en orden de dependencias; las tablas de una etapa cargan a la vez
+        stages = [
+            chunk_tasks(source.populate_users, user_ids, **extra),
+            chunk_tasks(
+                source.populate_vendors,
+                vendor_ids,
+                aligned={"user_ids": user_ids[: len(vendor_ids)]},
+                **extra,
+            )
+            + chunk_tasks(
+                source.populate_addresses,
+                address_ids,
+                aligned={"user_ids": user_ids[: len(address_ids)]},
+                **extra,
+            )
+            + chunk_tasks(
+                source.populate_carts,
+                cart_ids,
+                aligned={"user_ids": user_ids[: len(cart_ids)]},
+                **extra,
+            ),
+            chunk_tasks(
+                source.populate_products,
+                product_ids,
+                vendor_ids=vendor_ids,
+                category_ids=category_ids,
+                attributes=attributes,
+                **extra,
+            ),
+            chunk_tasks(
+                source.populate_inventory,
+                inventory_ids,
+                aligned={"product_ids": product_ids},
+                **extra,
+            )
+            + chunk_tasks(
+                source.populate_reviews,
+                review_ids,
+                user_ids=user_ids,
+                product_ids=product_ids,
+                **extra,
+            )
+            + chunk_tasks(
+                source.populate_orders,
+                order_ids,
+                aligned={"item_ids": item_ids, "payment_ids": payment_ids},
+                user_ids=user_ids,
+                address_ids=address_ids,
+                product_ids=product_ids,
+                attributes=attributes,
+                partitioned=partitioned,
+                **extra,
+            ),
+        ]
+        for tasks in stages:
+            before = report.snapshot() if report else None
+            totals, busy, cpu = run_stage(pool, tasks, args.loader)
+            if report:
+                phase = report.record(", ".join(totals), before, totals, busy, cpu)
+                print(describe(phase))
+        steps = [("metricas_vendedor", lambda: apply_seller_metrics(conn))]
+        if bulk:
+            steps += bulk.steps(recalculate_ratings)
+        for name, step in steps:
+            before = report.snapshot() if report else None
+            start = time.perf_counter()
+            step()
+            if report:
+                print(describe(report.record(name, before)))
+            else:
+                print(f"  [{name}] {time.perf_counter() - start:.2f} s")
+        bulk = None
+
+        if report:
+            extra = {}
+            if args.compare_with:
+                with open(args.compare_with, encoding="utf-8") as f:
+                    extra["comparacion"] = compare_reports(
+                        json.load(f), {"fases": report.phases}
+                    )
+                comparison = extra["comparacion"]
+                print(
+                    f"Tiempo de carga: {comparison['pared_s']:.2f} s frente a {comparison['pared_referencia_s']:.2f} s de {args.compare_with} (ahorro {comparison['ahorro_s']:.2f} s, {comparison['ahorro_pct']:.0f}%)"
+                )
+            if args.report_json:
+                report.write(
+                    args.report_json,
+                    {
+                        "loader": args.loader,
+                        "generador": args.generator,
+                        "factor_escala": args.scale_factor,
+                        "semilla": args.seed,
+                        "procesos": args.workers,
+                        "masiva": args.bulk,
+                    },
+                    **extra,
+                )
+                print(f"Reporte de carga guardado en {args.report_json}")
 
         print("¡Población completada exitosamente!")
 
@@ -461,7 +1135,13 @@ def main():
     except Exception as e:
         print(f"Error durante la población: {e}")
         conn.rollback()
+        if bulk:
+            if pool:
+                pool.terminate()
+            bulk.restore()
     finally:
+        if pool:
+            pool.terminate()
         conn.close()
 
 
@@ -0,0 +1,397 @@
+import argparse
+import json
+import random
+import re
+import time
+from datetime import datetime
+
+from benchmark_stats import percentile
+from db import connect_db, wait_for_db
+
+# Modos de búsqueda:
+#   texto:     tsvector (nombre + descripción) con ranking; la última palabra es prefijo
+#   similar:   similitud de trigramas sobre el nombre; tolera errores de tipeo
+#   subcadena: ILIKE '%texto%' sobre nombre y descripción (índices GIN de trigramas)
+#   auto:      texto (o subcadena sin tsvector); si no hay resultados, similar
+SEARCH_MODES = ("auto", "texto", "similar", "subcadena")
+
+MAX_PER_PAGE = 100
+
+# Clases de selectividad del benchmark: fracción mínima de productos que coinciden
+SELECTIVITY_CLASSES = (("alta", 0.05), ("media", 0.005), ("baja", 0.0))
+
+# Palabras de la búsqueda: solo caracteres de palabra, así no hay operadores de tsquery
+QUERY_WORD = re.compile(r"\w+")
+
+TEXT_SQL = """
+SELECT producto_id, nombre, precio, ts_rank_cd(busqueda, q) as puntaje
+FROM {table}, to_tsquery('spanish', %(consulta)s) q
+WHERE activo AND busqueda @@ q
+ORDER BY puntaje DESC, producto_id
+LIMIT %(limite)s OFFSET %(desplazamiento)s
+"""
+
+SIMILAR_SQL = """
+SELECT producto_id, nombre, precio, word_similarity(%(termino)s, nombre) as puntaje
+FROM {table}
+WHERE activo AND %(termino)s <%% nombre
+ORDER BY puntaje DESC, producto_id
+LIMIT %(limite)s OFFSET %(desplazamiento)s
+"""
+
+# Coincidencias en el nombre antes que en la descripción
+SUBSTRING_SQL = """
+SELECT producto_id, nombre, precio, CASE WHEN nombre ILIKE %(patron)s THEN 1.0 ELSE 0.5 END as puntaje
+FROM {table}
+WHERE activo AND (nombre ILIKE %(patron)s OR descripcion ILIKE %(patron)s)
+ORDER BY puntaje DESC, producto_id
+LIMIT %(limite)s OFFSET %(desplazamiento)s
+"""
+
+
+def to_prefix_tsquery(text):
+    """Convertir texto libre en tsquery: palabras con AND y la última como prefijo"""
+    words = QUERY_WORD.findall(text.lower())
+    if not words:
+        return None
+    return " & ".join(words[:-1] + [words[-1] + ":*"])
+
+
+def like_pattern(text):
+    """Patrón ILIKE '%texto%' con los comodines del texto escapados"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class ProductSearch:
+    """Búsqueda de productos activos con ranking y paginación
+
+    Detecta al crearse qué modos soporta el schema: la columna busqueda
+    (tsvector) y la extensión pg_trgm solo existen en el schema optimizado.
+    En el schema base queda disponible subcadena, que recorre la tabla.
+    """
+
+    def __init__(self, conn, table="producto"):
+        self.conn = conn
+        self.table = table
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'busqueda' AND NOT attisdropped",
+                (table,),
+            )
+            self.full_text = cursor.fetchone() is not None
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            self.trigrams = cursor.fetchone() is not None
+        conn.rollback()
+
+    @property
+    def modes(self):
+        """Modos disponibles en este schema"""
+        modes = ["auto"]
+        if self.full_text:
+            modes.append("texto")
+        if self.trigrams:
+            modes.append("similar")
+        modes.append("subcadena")
+        return modes
+
+    def _run(self, sql, params, page, per_page):
+        """Ejecutar una búsqueda paginada; pide una fila extra para saber si hay más"""
+        params = dict(params, limite=per_page + 1, desplazamiento=(page - 1) * per_page)
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql.format(table=self.table), params)
+            rows = cursor.fetchall()
+        results = [
+            {
+                "producto_id": product_id,
+                "nombre": name,
+                "precio": price,
+                "puntaje": float(score),
+            }
+            for product_id, name, price, score in rows[:per_page]
+        ]
+        return results, len(rows) > per_page
+
+    def _query(self, mode, text):
+        """(sql, parámetros) de un modo concreto, o None si el texto no tiene palabras"""
+        if mode == "texto":
+            query = to_prefix_tsquery(text)
+            return (TEXT_SQL, {"consulta": query}) if query else None
+        if not text:
+            return None
+        if mode == "similar":
+            return SIMILAR_SQL, {"termino": text}
+        return SUBSTRING_SQL, {"patron": like_pattern(text)}
+
+    def search(self, text, mode="auto", page=1, per_page=20):
+        """Buscar productos; devuelve {modo, pagina, resultados, hay_mas}"""
+        if mode not in self.modes:
+            raise ValueError(
+                f"modo de búsqueda no disponible: {mode} (disponibles: {', '.join(self.modes)})"
+            )
+        if page < 1 or not 1 <= per_page <= MAX_PER_PAGE:
+            raise ValueError(f"página >= 1 y entre 1 y {MAX_PER_PAGE} resultados")
+        text = text.strip()
+        results, more = [], False
+
+        used = mode
+        if mode == "auto":
+            used = "texto" if self.full_text else "subcadena"
+        query = self._query(used, text)
+        if query:
+            results, more = self._run(*query, page, per_page)
+
+        # Sin coincidencias exactas: probar con tolerancia a errores de tipeo.
+        # Se decide igual en todas las páginas: una página vacía solo pasa a
+        # similar si la primera tampoco tiene resultados del modo exacto.
+        if mode == "auto" and not results and self.trigrams and text:
+            if page == 1 or not query or not self._run(*query, 1, 1)[0]:
+                used = "similar"
+                results, more = self._run(
+                    SIMILAR_SQL, {"termino": text}, page, per_page
+                )
+        return {"modo": used, "pagina": page, "resultados": results, "hay_mas": more}
+
+
+def with_typo(word):
+    """Intercambiar dos letras centrales (error de tipeo para el modo similar)"""
+    if len(word) < 4:
+        return word
+    i = len(word) // 2 - 1
+    return word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+
+
+def create_sample_catalog(conn, search, size):
+    """Catálogo temporal con los primeros size productos y los mismos índices"""
+    columns = "producto_id, nombre, descripcion, precio, activo"
+    if search.full_text:
+        columns += ", busqueda"
+    with conn.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS producto_muestra")
+        cursor.execute(
+            f"CREATE TEMP TABLE producto_muestra AS SELECT {columns} FROM producto ORDER BY producto_id LIMIT %s",
+            (size,),
+        )
+        cursor.execute("ALTER TABLE producto_muestra ADD PRIMARY KEY (producto_id)")
+        if search.trigrams:
+            cursor.execute(
+                "CREATE INDEX ON producto_muestra USING GIN (nombre gin_trgm_ops)"
+            )
+            cursor.execute(
+                "CREATE INDEX ON producto_muestra USING GIN (descripcion gin_trgm_ops)"
+            )
+        if search.full_text:
+            cursor.execute("CREATE INDEX ON producto_muestra USING GIN (busqueda)")
+        # Autovacuum no analiza tablas temporales
+        cursor.execute("ANALYZE producto_muestra")
+    conn.commit()
+    return ProductSearch(conn, "pg_temp.producto_muestra")
+
+
+def select_terms(conn, table, size, per_class, rng):
+    """Palabras del catálogo agrupadas por selectividad (SELECTIVITY_CLASSES)
+
+    Devuelve {clase: (palabras, selectividad media)}; la selectividad es la
+    fracción de productos cuyo nombre o descripción contiene la palabra.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT palabra, COUNT(DISTINCT producto_id) as productos
+            FROM {table}, regexp_split_to_table(lower(nombre || ' ' || COALESCE(descripcion, '')), '\\W+') palabra
+            WHERE length(palabra) >= 4
+            GROUP BY palabra
+            ORDER BY productos DESC, palabra
+            """)
+        frequencies = cursor.fetchall()
+    conn.rollback()
+
+    classes = {}
+    for word, count in frequencies:
+        for name, minimum in SELECTIVITY_CLASSES:
+            if count / size >= minimum:
+                classes.setdefault(name, []).append((word, count))
+                break
+    terms = {}
+    for name, _ in SELECTIVITY_CLASSES:
+        words = classes.get(name)
+        if not words:
+            continue
+        chosen = rng.sample(words, min(per_class, len(words)))
+        selectivity = sum(count for _, count in chosen) / len(chosen) / size
+        terms[name] = ([word for word, _ in chosen], selectivity)
+    return terms
+
+
+def time_search(conn, search, text, mode, repetitions, sequential=False):
+    """Latencias (ms) de una búsqueda y filas de la primera página"""
+    samples = []
+    rows = 0
+    for _ in range(repetitions + 1):
+        with conn.cursor() as cursor:
+            if sequential:
+                # Mismo ILIKE sin índices: el comportamiento de la "Consulta lenta"
+                cursor.execute("SET LOCAL enable_bitmapscan = off")
+                cursor.execute("SET LOCAL enable_indexscan = off")
+        start = time.perf_counter_ns()
+        result = search.search(text, mode)
+        samples.append((time.perf_counter_ns() - start) / 1_000_000)
+        rows = len(result["resultados"])
+        conn.rollback()
+    # La primera ejecución es de calentamiento
+    return samples[1:], rows
+
+
+def run_benchmark(conn, sizes, per_class, repetitions, seed):
+    """Latencia por tamaño de catálogo, selectividad y método"""
+    search = ProductSearch(conn)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM producto")
+        catalog = cursor.fetchone()[0]
+    conn.rollback()
+
+    methods = {"secuencial": "subcadena", "subcadena": "subcadena"}
+    if search.full_text:
+        methods["texto"] = "texto"
+        methods["prefijo"] = "texto"
+    if search.trigrams:
+        methods["similar"] = "similar"
+
+    rng = random.Random(seed)
+    report = []
+    for size in sorted({min(size, catalog) for size in sizes}):
+        if size < catalog:
+            target = create_sample_catalog(conn, search, size)
+            table = "pg_temp.producto_muestra"
+        else:
+            target, table = search, "producto"
+        terms = select_terms(conn, table, size, per_class, rng)
+        for selectivity_class, (words, selectivity) in terms.items():
+            for method, mode in methods.items():
+                samples, rows = [], []
+                for word in words:
+                    text = word
+                    if method == "prefijo":
+                        text = word[: max(3, len(word) // 2)]
+                    elif method == "similar":
+                        text = with_typo(word)
+                    word_samples, word_rows = time_search(
+                        conn,
+                        target,
+                        text,
+                        mode,
+                        repetitions,
+                        sequential=method == "secuencial",
+                    )
+                    samples.extend(word_samples)
+                    rows.append(word_rows)
+                samples.sort()
+                report.append(
+                    {
+                        "productos": size,
+                        "selectividad": selectivity_class,
+                        "selectividad_media": selectivity,
+                        "metodo": method,
+                        "mediana_ms": percentile(samples, 50),
+                        "p95_ms": percentile(samples, 95),
+                        "filas_mediana": percentile(sorted(rows), 50),
+                    }
+                )
+    if any(size < catalog for size in sizes):
+        with conn.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS producto_muestra")
+        conn.commit()
+    return {"catalogo": catalog, "modos": search.modes, "resultados": report}
+
+
+def parse_sizes(value):
+    """Leer la lista de tamaños de catálogo separados por comas"""
+    try:
+        sizes = [int(size) for size in value.split(",") if size.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamaños inválidos: {value}")
+    if not sizes or min(sizes) < 1:
+        raise argparse.ArgumentTypeError(f"tamaños inválidos: {value}")
+    return sizes
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Búsqueda de productos")
+    sub = parser.add_subparsers(dest="command", required=True)
+    find = sub.add_parser("buscar", help="buscar productos")
+    find.add_argument("texto", help="texto a buscar")
+    find.add_argument("--mode", choices=SEARCH_MODES, default="auto", help="modo")
+    find.add_argument("--page", type=int, default=1, help="página (desde 1)")
+    find.add_argument("--per-page", type=int, default=20, help="resultados por página")
+    bench = sub.add_parser(
+        "benchmark", help="latencia por tamaño de catálogo, selectividad y método"
+    )
+    bench.add_argument(
+        "--sizes",
+        type=parse_sizes,
+        default=[1000, 10000, 100000],
+        help="tamaños de catálogo separados por comas (se limitan al catálogo real)",
+    )
+    bench.add_argument(
+        "--terms", type=int, default=5, help="palabras por clase de selectividad"
+    )
+    bench.add_argument(
+        "--repetitions", type=int, default=10, help="repeticiones por palabra"
+    )
+    bench.add_argument("--seed", type=int, default=42, help="semilla de las palabras")
+    bench.add_argument("--output-json", help="ruta del JSON de resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+    conn = connect_db()
+    try:
+        if args.command == "buscar":
+            try:
+                result = ProductSearch(conn).search(
+                    args.texto, args.mode, args.page, args.per_page
+                )
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
+            print(f"\nModo {result['modo']}, página {result['pagina']}:")
+            for row in result["resultados"]:
+                print(
+                    f"  {row['producto_id']:>8}  {row['puntaje']:.3f}  {row['nombre']} (${row['precio']})"
+                )
+            if result["hay_mas"]:
+                print(f"  ... más resultados en la página {result['pagina'] + 1}")
+        else:
+            report = run_benchmark(
+                conn, args.sizes, args.terms, args.repetitions, args.seed
+            )
+            print(
+                f"\nCatálogo de {report['catalogo']} productos, modos: {', '.join(report['modos'])}"
+            )
+            for row in report["resultados"]:
+                print(
+                    f"{row['productos']:>8} / {row['selectividad']:<5} ({row['selectividad_media']:.3%})"
+                    f" / {row['metodo']:<10}: mediana {row['mediana_ms']:.2f} ms,"
+                    f" p95 {row['p95_ms']:.2f} ms, {row['filas_mediana']:.0f} filas"
+                )
+            if args.output_json:
+                report["fecha"] = datetime.now().isoformat(timespec="seconds")
+                report["configuracion"] = {
+                    "tamanos": args.sizes,
+                    "palabras": args.terms,
+                    "repeticiones": args.repetitions,
+                    "semilla": args.seed,
+                }
+                with open(args.output_json, "w", encoding="utf-8") as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                print(f"\nResultados JSON guardados en {args.output_json}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
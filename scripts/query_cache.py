@@ -0,0 +1,280 @@
+import json
+import pickle
+import select
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import psycopg2
+
+from db import DB_SETTINGS
+
+# Canal de notificaciones de notificar_cambio_catalogo() (schema optimizado)
+CHANNEL = "cambios_catalogo"
+
+
+def cache_key(operation, params):
+    """Clave de caché: consulta y parámetros ordenados por nombre"""
+    return (operation["clave"],) + tuple(sorted((params or {}).items()))
+
+
+def notifications_enabled(conn):
+    """Indica si el schema tiene los triggers que notifican cambios del catálogo"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM pg_trigger WHERE tgname LIKE 'trg_notificar_cambios_%'"
+        )
+        enabled = cursor.fetchone()[0] > 0
+    conn.rollback()
+    return enabled
+
+
+class SharedCache:
+    """Segundo nivel compartido por los procesos del mismo host (archivo SQLite)
+
+    Las entradas guardan las filas serializadas con pickle, sus tablas y el
+    instante de expiración (reloj del sistema, común a todos los procesos).
+    """
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._puts = 0
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS cache (clave TEXT PRIMARY KEY, filas BLOB, tablas TEXT, expira REAL)"
+        )
+        db.commit()
+
+    def _db(self):
+        """Conexión SQLite del hilo actual (sqlite3 no comparte conexiones entre hilos)"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        """(filas, tablas, segundos de vida restantes) o None"""
+        now = time.time()
+        row = (
+            self._db()
+            .execute(
+                "SELECT filas, tablas, expira FROM cache WHERE clave = ? AND expira > ?",
+                (repr(key), now),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return pickle.loads(row[0]), row[1].strip(",").split(","), row[2] - now
+
+    def put(self, key, rows, tables, ttl):
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+            (repr(key), pickle.dumps(rows), f",{','.join(tables)},", time.time() + ttl),
+        )
+        self._puts += 1
+        if self._puts % 100 == 0:
+            # Límite de tamaño: primero las expiradas, después las más próximas a expirar
+            db.execute("DELETE FROM cache WHERE expira <= ?", (time.time(),))
+            db.execute(
+                "DELETE FROM cache WHERE clave IN (SELECT clave FROM cache ORDER BY expira DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        db.commit()
+
+    def invalidate(self, table):
+        db = self._db()
+        db.execute("DELETE FROM cache WHERE tablas LIKE ?", (f"%,{table},%",))
+        db.commit()
+
+    def clear(self):
+        db = self._db()
+        db.execute("DELETE FROM cache")
+        db.commit()
+
+
+class QueryCache:
+    """Caché LRU con TTL en memoria del proceso, compartida entre hilos
+
+    Cada entrada guarda las tablas de las que depende y invalidate(tabla)
+    borra las afectadas. Un contador de generación por tabla evita guardar el
+    resultado de una consulta que empezó antes de una invalidación recibida
+    mientras se ejecutaba (ese resultado ya podría estar obsoleto).
+    """
+
+    def __init__(self, max_entries=1000, ttl=60, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "aciertos": 0,
+            "aciertos_compartidos": 0,
+            "fallos": 0,
+            "expiradas": 0,
+            "desalojadas": 0,
+            "invalidadas": 0,
+            "descartadas": 0,
+        }
+
+    def generation(self, tables):
+        """Generación actual de las tablas (se compara al guardar)"""
+        with self._lock:
+            return (self._epoch,) + tuple(self._generations.get(t, 0) for t in tables)
+
+    def get(self, key):
+        """Filas guardadas para key o None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._entries.move_to_end(key)
+                    self.stats["aciertos"] += 1
+                    return entry[0]
+                del self._entries[key]
+                self.stats["expiradas"] += 1
+        if self.shared is not None:
+            found = self.shared.get(key)
+            if found is not None:
+                rows, tables, remaining = found
+                with self._lock:
+                    self._store(key, rows, tables, now + remaining)
+                    self.stats["aciertos_compartidos"] += 1
+                return rows
+        with self._lock:
+            self.stats["fallos"] += 1
+        return None
+
+    def put(self, key, rows, tables, generation):
+        """Guardar filas leídas con generation; se descartan si hubo una invalidación"""
+        with self._lock:
+            current = (self._epoch,) + tuple(
+                self._generations.get(t, 0) for t in tables
+            )
+            if current != generation:
+                self.stats["descartadas"] += 1
+                return
+            self._store(key, rows, tables, time.monotonic() + self.ttl)
+            # Bajo el mismo bloqueo: una invalidación no puede colarse entre la
+            # comprobación y la escritura compartida (invalidate espera el
+            # bloqueo y borra después del segundo nivel)
+            if self.shared is not None:
+                self.shared.put(key, rows, tables, self.ttl)
+
+    def _store(self, key, rows, tables, expires):
+        self._entries[key] = (rows, tuple(tables), expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["desalojadas"] += 1
+
+    def invalidate(self, table):
+        """Borrar las entradas que dependen de table; devuelve cuántas se borraron"""
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            keys = [key for key, entry in self._entries.items() if table in entry[1]]
+            for key in keys:
+                del self._entries[key]
+            self.stats["invalidadas"] += len(keys)
+        if self.shared is not None:
+            self.shared.invalidate(table)
+        return len(keys)
+
+    def clear(self):
+        """Vaciar la caché (p. ej. si se pudieron perder notificaciones)"""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def hit_ratio(self):
+        hits = self.stats["aciertos"] + self.stats["aciertos_compartidos"]
+        total = hits + self.stats["fallos"]
+        return hits / total if total else 0.0
+
+
+class CacheInvalidator(threading.Thread):
+    """Escucha CHANNEL con LISTEN e invalida las entradas afectadas de la caché
+
+    Registra el desfase (ms) entre la sentencia que modificó la tabla y la
+    invalidación. Si se pierde la conexión, vacía la caché al reconectar
+    porque las notificaciones de ese intervalo se perdieron.
+    """
+
+    def __init__(self, cache, poll_interval=0.5):
+        super().__init__(daemon=True)
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.lags_ms = []
+        self.notifications = Counter()
+        self.ready = threading.Event()
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                conn = psycopg2.connect(**DB_SETTINGS)
+            except psycopg2.OperationalError:
+                time.sleep(1)
+                continue
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                self.cache.clear()
+                self.ready.set()
+                while not self._stopping.is_set():
+                    if select.select([conn], [], [], self.poll_interval)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            self._handle(conn.notifies.pop(0).payload)
+            except psycopg2.Error:
+                pass
+            finally:
+                conn.close()
+
+    def _handle(self, payload):
+        change = json.loads(payload)
+        self.cache.invalidate(change["tabla"])
+        self.notifications[change["tabla"]] += 1
+        self.lags_ms.append((time.time() - change["instante"]) * 1000)
+
+    def stop(self):
+        self._stopping.set()
+        self.join()
+
+
+def read_through(cache, conn, operation, params):
+    """Filas de una consulta desde la caché o desde la base de datos; devuelve (filas, acierto)"""
+    key = cache_key(operation, params)
+    rows = cache.get(key)
+    if rows is not None:
+        return rows, True
+    tables = operation["cache"]["tablas"]
+    generation = cache.generation(tables)
+    with conn.cursor() as cursor:
+        cursor.execute(operation["sql"], params or None)
+        rows = cursor.fetchall()
+    conn.rollback()
+    cache.put(key, rows, tables, generation)
+    return rows, False
+
+
+def is_stale(conn, operation, params, rows):
+    """Comparar filas servidas por la caché con la base de datos (sin importar el orden)"""
+    with conn.cursor() as cursor:
+        cursor.execute(operation["sql"], params or None)
+        current = cursor.fetchall()
+    conn.rollback()
+    return Counter(current) != Counter(rows)
@@ -0,0 +1,142 @@
+import time
+import tracemalloc
+
+# Modos de lectura del resultado; "none" solo mide execute() como antes
+FETCH_MODES = ("none", "buffered", "server", "stream")
+
+# Filas por FETCH del cursor de servidor (psycopg2 usa 2000 por defecto)
+DEFAULT_ITERSIZE = 2000
+
+
+def returns_rows(benchmark):
+    """Indica si la consulta devuelve filas que vale la pena transferir"""
+    return benchmark["sql"].lstrip().upper().startswith("SELECT") and not benchmark.get(
+        "filas_desde_resultado"
+    )
+
+
+def fetch_buffered(conn, sql, params, itersize):
+    """Cursor de cliente: libpq recibe todo el resultado en execute()"""
+    start = time.perf_counter_ns()
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        first = cursor.fetchone()
+        first_row = time.perf_counter_ns() - start
+        rest = cursor.fetchall()
+    rows = len(rest) + (first is not None)
+    return first_row, time.perf_counter_ns() - start, rows
+
+
+def fetch_server(conn, sql, params, itersize):
+    """Cursor con nombre (DECLARE/FETCH): itersize filas por viaje"""
+    start = time.perf_counter_ns()
+    first_row = None
+    rows = 0
+    with conn.cursor(name="benchmark_fetch") as cursor:
+        cursor.itersize = itersize
+        cursor.execute(sql, params)
+        for _ in cursor:
+            if first_row is None:
+                first_row = time.perf_counter_ns() - start
+            rows += 1
+    total = time.perf_counter_ns() - start
+    return (total if first_row is None else first_row), total, rows
+
+
+class _CopySink:
+    """Destino de COPY TO STDOUT que solo cuenta bytes y filas"""
+
+    def __init__(self):
+        self.first_write = None
+        self.bytes = 0
+        self.rows = 0
+
+    def write(self, data):
+        if self.first_write is None:
+            self.first_write = time.perf_counter_ns()
+        self.bytes += len(data)
+        self.rows += data.count(b"\n" if isinstance(data, bytes) else "\n")
+
+
+def _copy_out(conn, sql, params, sink):
+    """Transmitir el resultado de sql con COPY (...) TO STDOUT hacia sink"""
+    with conn.cursor() as cursor:
+        query = cursor.mogrify(sql.rstrip().rstrip(";"), params)
+        cursor.copy_expert(b"COPY (" + query + b") TO STDOUT", sink)
+
+
+def fetch_stream(conn, sql, params, itersize):
+    """Streaming: el servidor envía filas mientras las produce, sin decodificarlas"""
+    sink = _CopySink()
+    start = time.perf_counter_ns()
+    _copy_out(conn, sql, params, sink)
+    total = time.perf_counter_ns() - start
+    first_row = total if sink.first_write is None else sink.first_write - start
+    return first_row, total, sink.rows
+
+
+FETCHERS = {
+    "buffered": fetch_buffered,
+    "server": fetch_server,
+    "stream": fetch_stream,
+}
+
+
+def fetch(conn, sql, params, mode, itersize=DEFAULT_ITERSIZE):
+    """Ejecutar sql y leer todas las filas; devuelve (primera fila ns, total ns, filas)"""
+    return FETCHERS[mode](conn, sql, params, itersize)
+
+
+def _proc_status_kb(field):
+    """Valor en KB de /proc/self/status (None fuera de Linux)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Reiniciar VmHWM (pico de memoria residente) del proceso, si el kernel lo permite"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure_transfer(conn, sql, params, mode, itersize=DEFAULT_ITERSIZE):
+    """Bytes del resultado y memoria pico del cliente para un modo de lectura
+
+    Se ejecuta fuera de las repeticiones medidas: tracemalloc encarece cada
+    asignación de Python. La memoria residente incluye el buffer de libpq, que
+    tracemalloc no ve. Los bytes son el tamaño del resultado en formato texto
+    (lo que viaja por el protocolo sin las cabeceras de cada fila).
+    """
+    rss_before = _proc_status_kb("VmRSS")
+    peak_reset = _reset_peak_rss()
+    tracemalloc.start()
+    try:
+        fetch(conn, sql, params, mode, itersize)
+        _, python_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rss_peak = _proc_status_kb("VmHWM")
+    conn.rollback()
+
+    sink = _CopySink()
+    _copy_out(conn, sql, params, sink)
+    conn.rollback()
+
+    memory = None
+    if peak_reset and rss_before is not None and rss_peak is not None:
+        memory = max(rss_peak - rss_before, 0)
+    return {
+        "bytes": sink.bytes,
+        "memoria_pico_kb": memory,
+        "memoria_python_kb": round(python_peak / 1024),
+    }
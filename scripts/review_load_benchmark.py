@@ -0,0 +1,269 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+from faker import Faker
+
+from benchmark_stats import percentile
+from db import connect_db, wait_for_db
+from populate_db import LOADERS, load_rows
+
+# Mantenimiento de promedio_calificacion comparado:
+#   sin_trigger: triggers de resena deshabilitados (límite superior)
+#   fila:        trigger FOR EACH ROW que recalcula AVG/COUNT (versión anterior)
+#   sentencia:   triggers FOR EACH STATEMENT con tablas de transición (actual)
+VARIANTS = ("sin_trigger", "fila", "sentencia")
+
+RESENA_COLUMNS = (
+    "resena_id",
+    "usuario_id",
+    "producto_id",
+    "calificacion",
+    "comentario",
+    "util",
+)
+
+# Trigger por fila de la versión anterior del schema, recreado solo dentro de
+# la transacción medida (el ROLLBACK restaura los triggers actuales)
+ROW_TRIGGER_SQL = """
+DROP TRIGGER trg_actualizar_calificacion_insert ON resena;
+DROP TRIGGER trg_actualizar_calificacion_update ON resena;
+DROP TRIGGER trg_actualizar_calificacion_delete ON resena;
+
+CREATE FUNCTION actualizar_promedio_calificacion_fila()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE producto
+    SET
+        promedio_calificacion = (SELECT COALESCE(AVG(calificacion), 0) FROM resena WHERE producto_id = NEW.producto_id),
+        total_resenas = (SELECT COUNT(*) FROM resena WHERE producto_id = NEW.producto_id)
+    WHERE producto_id = NEW.producto_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_actualizar_calificacion
+AFTER INSERT OR UPDATE OR DELETE ON resena
+FOR EACH ROW
+EXECUTE FUNCTION actualizar_promedio_calificacion_fila();
+"""
+
+# Productos cuyo promedio, conteo o suma no coincide con las reseñas
+DIFERENCIAS_SQL = """
+SELECT COUNT(*)
+FROM producto p
+LEFT JOIN (
+    SELECT producto_id, SUM(calificacion) as suma, COUNT(*) as total
+    FROM resena
+    GROUP BY producto_id
+) r ON r.producto_id = p.producto_id
+WHERE (p.suma_calificaciones, p.total_resenas, p.promedio_calificacion)
+    IS DISTINCT FROM (COALESCE(r.suma, 0), COALESCE(r.total, 0), COALESCE(ROUND(r.suma::DECIMAL / r.total, 2), 0))
+"""
+
+
+def fetch_ids(conn):
+    """IDs de usuarios y productos existentes y el próximo resena_id libre"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT usuario_id FROM usuario ORDER BY usuario_id")
+        user_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT producto_id FROM producto ORDER BY producto_id")
+        product_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT COALESCE(MAX(resena_id), 0) + 1 FROM resena")
+        first_id = cursor.fetchone()[0]
+    conn.rollback()
+    return user_ids, product_ids, first_id
+
+
+def generate_reviews(rng, fake, count, first_id, user_ids, product_ids):
+    """Reseñas con IDs explícitos, ordenadas por producto como en populate_db"""
+    reviews = sorted(
+        (
+            (
+                rng.choice(user_ids),
+                rng.choice(product_ids),
+                rng.randint(1, 5),
+                fake.text(max_nb_chars=300),
+                rng.randint(0, 100),
+            )
+            for _ in range(count)
+        ),
+        key=lambda review: review[1],
+    )
+    return [(first_id + i,) + review for i, review in enumerate(reviews)]
+
+
+def producto_updates(cursor):
+    """Filas de producto actualizadas en la transacción actual"""
+    cursor.execute(
+        "SELECT n_tup_upd FROM pg_stat_xact_user_tables WHERE relname = 'producto'"
+    )
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def check_changes(cursor, reviews, product_ids):
+    """Modificar y borrar parte de las reseñas cargadas; devuelve productos con diferencias"""
+    ids = [review[0] for review in reviews]
+    cursor.execute(
+        "UPDATE resena SET calificacion = 6 - calificacion WHERE resena_id = ANY(%s)",
+        (ids[::7],),
+    )
+    cursor.execute(
+        "UPDATE resena SET producto_id = %s WHERE resena_id = ANY(%s)",
+        (product_ids[0], ids[1::11]),
+    )
+    cursor.execute("DELETE FROM resena WHERE resena_id = ANY(%s)", (ids[2::5],))
+    cursor.execute(DIFERENCIAS_SQL)
+    return cursor.fetchone()[0]
+
+
+def measure(conn, reviews, variant, loader, product_ids, check):
+    """Cargar las reseñas con una variante de trigger y medir (con ROLLBACK)"""
+    result = {}
+    with conn.cursor() as cursor:
+        if variant == "sin_trigger":
+            cursor.execute("ALTER TABLE resena DISABLE TRIGGER USER")
+        elif variant == "fila":
+            cursor.execute(ROW_TRIGGER_SQL)
+        updates = producto_updates(cursor)
+        start = time.perf_counter()
+        load_rows(conn, "resena", RESENA_COLUMNS, reviews, loader)
+        result["carga"] = time.perf_counter() - start
+        result["actualizaciones_producto"] = producto_updates(cursor) - updates
+        if check and variant == "sentencia":
+            result["diferencias"] = check_changes(cursor, reviews, product_ids)
+    conn.rollback()
+    return result
+
+
+def run_benchmark(conn, count, loaders, repetitions, seed, check=True):
+    """Comparar variantes de trigger por loader; medianas en ms y reseñas/s"""
+    user_ids, product_ids, first_id = fetch_ids(conn)
+    rng = random.Random(seed)
+    fake = Faker("es_ES")
+    fake.seed_instance(seed)
+
+    samples = {}
+    for repetition in range(repetitions):
+        reviews = generate_reviews(rng, fake, count, first_id, user_ids, product_ids)
+        for loader in loaders:
+            for variant in VARIANTS:
+                # La verificación modifica datos: solo en la primera repetición
+                result = measure(
+                    conn,
+                    reviews,
+                    variant,
+                    loader,
+                    product_ids,
+                    check and repetition == 0,
+                )
+                key = (variant, loader)
+                for metric, value in result.items():
+                    samples.setdefault(key, {}).setdefault(metric, []).append(value)
+
+    report = []
+    for (variant, loader), metrics in samples.items():
+        load_ms = percentile(sorted(metrics["carga"]), 50) * 1000
+        row = {
+            "variante": variant,
+            "loader": loader,
+            "carga_ms": load_ms,
+            "resenas_por_segundo": count / (load_ms / 1000) if load_ms > 0 else 0,
+            "actualizaciones_producto": max(metrics["actualizaciones_producto"]),
+        }
+        if "diferencias" in metrics:
+            row["diferencias"] = max(metrics["diferencias"])
+        report.append(row)
+
+    base = {
+        row["loader"]: row["carga_ms"]
+        for row in report
+        if row["variante"] == "sin_trigger"
+    }
+    for row in report:
+        row["sobrecarga_por_resena_ms"] = (
+            row["carga_ms"] - base[row["loader"]]
+        ) / count
+    return {"productos": len(product_ids), "resultados": report}
+
+
+def parse_loaders(value):
+    """Leer la lista de loaders separados por comas"""
+    loaders = [loader.strip() for loader in value.split(",") if loader.strip()]
+    unknown = [loader for loader in loaders if loader not in LOADERS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"loader desconocido: {', '.join(unknown)}")
+    return loaders
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Throughput de carga de reseñas según el trigger de calificación"
+    )
+    parser.add_argument(
+        "--reviews", type=int, default=10000, help="reseñas cargadas por medición"
+    )
+    parser.add_argument(
+        "--loaders",
+        type=parse_loaders,
+        default=["values", "copy"],
+        help=f"loaders separados por comas ({', '.join(LOADERS)})",
+    )
+    parser.add_argument("--repetitions", type=int, default=3, help="repeticiones")
+    parser.add_argument("--seed", type=int, default=42, help="semilla de las reseñas")
+    parser.add_argument(
+        "--no-check",
+        action="store_true",
+        help="no verificar promedios tras modificar y borrar reseñas",
+    )
+    parser.add_argument("--output-json", help="ruta del JSON de resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+    conn = connect_db()
+    try:
+        report = run_benchmark(
+            conn,
+            args.reviews,
+            args.loaders,
+            args.repetitions,
+            args.seed,
+            check=not args.no_check,
+        )
+        print(f"\n{args.reviews} reseñas por medición, {report['productos']} productos")
+        for row in report["resultados"]:
+            line = (
+                f"{row['variante']:>11} / {row['loader']:<11}: {row['carga_ms']:8.1f} ms"
+                f" ({row['resenas_por_segundo']:,.0f} reseñas/s,"
+                f" {row['sobrecarga_por_resena_ms']:+.3f} ms/reseña),"
+                f" {row['actualizaciones_producto']} actualizaciones de producto"
+            )
+            if "diferencias" in row:
+                line += f", {row['diferencias']} productos con diferencias"
+            print(line)
+        if args.output_json:
+            report["fecha"] = datetime.now().isoformat(timespec="seconds")
+            report["configuracion"] = {
+                "resenas": args.reviews,
+                "loaders": args.loaders,
+                "repeticiones": args.repetitions,
+                "semilla": args.seed,
+            }
+            with open(args.output_json, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"\nResultados JSON guardados en {args.output_json}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
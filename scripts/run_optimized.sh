@@ -32,56 +32,128 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
-# Cargar schema optimizado
+# Cargar schema optimizado; PARTITIONED=on carga la variante particionada por mes
 echo "Cargando schema optimizado..."
-cat ../sql/e-shopify-db-optimized.sql | docker-compose exec -T postgres psql -U postgres -d postgres
+cat ../sql/e-shopify-db-optimized.sql | docker-compose exec -T postgres psql -U postgres -d postgres \
+    -v particionado="${PARTITIONED:-off}"
 
 if [ $? -ne 0 ]; then
     echo "ERROR: Falló la carga del schema optimizado"
     exit 1
 fi
 
-# Poblar datos
+# Poblar datos (reporte por fase en results/poblacion_optimized.json)
 echo "Poblando datos de prueba..."
-docker-compose up populate
+if [ "${BULK_LOAD:-off}" = "on" ]; then
+    # Carga masiva: índices, claves foráneas y calificaciones se reconstruyen al
+    # final; el ahorro se mide contra el reporte de una carga normal anterior
+    compare=""
+    if [ -f ../results/poblacion_optimized.json ]; then
+        compare="--compare-with results/poblacion_optimized.json"
+    fi
+    docker-compose run --rm populate python populate_db.py \
+        --loader copy \
+        --scale-factor "${SCALE_FACTOR:-1}" \
+        --workers "${WORKERS:-1}" \
+        --seed "${SEED:-42}" \
+        --generator "${GENERATOR:-faker}" \
+        --bulk \
+        --report-json results/poblacion_optimized_masiva.json \
+        ${compare}
+else
+    POPULATE_REPORT=results/poblacion_optimized.json docker-compose up populate
+fi
 
 if [ $? -ne 0 ]; then
     echo "ERROR: Falló la población de datos"
     exit 1
 fi
 
-# Ejecutar benchmark y capturar salida
+# Estado de la caché al medir: CACHE_MODE=none|cold|warm|steady. En cold el
+# contenedor de benchmark reinicia e-shopify-db por el socket de Docker
+CACHE_VOLUMES=""
+if [ "${CACHE_MODE:-none}" = "cold" ]; then
+    CACHE_VOLUMES="-v /var/run/docker.sock:/var/run/docker.sock"
+fi
+
+# Ejecutar benchmark: el script calcula las estadísticas y escribe CSV y JSON en results/
 echo "Ejecutando benchmark..."
-benchmark_output=$(docker-compose up benchmark 2>&1)
+docker-compose run --rm ${CACHE_VOLUMES} benchmark python script_benchmark.py \
+    --label optimized \
+    --warmup "${WARMUP:-3}" \
+    --repetitions "${REPETITIONS:-30}" \
+    --fetch-mode "${FETCH_MODE:-none}" \
+    --execution-modes "${EXECUTION_MODES:-simple}" \
+    --cache-mode "${CACHE_MODE:-none}" \
+    --restart-container e-shopify-db \
+    --output-csv results/benchmark_optimized.csv \
+    --output-json results/benchmark_optimized.json
+
+if [ $? -ne 0 ]; then
+    echo "ERROR: Falló el benchmark"
+    exit 1
+fi
+
+# Prueba de carga concurrente opcional: LOAD_CLIENTS=N activa el generador de carga.
+# Con LOAD_CACHE las escrituras se confirman: sin COMMIT no hay NOTIFY, así que
+# no se medirían la invalidación ni las lecturas obsoletas
+if [ -n "${LOAD_CLIENTS}" ]; then
+    echo "Ejecutando prueba de carga con ${LOAD_CLIENTS} clientes..."
+    docker-compose run --rm benchmark python load_generator.py \
+        --label optimized \
+        --clients "${LOAD_CLIENTS}" \
+        --duration "${LOAD_DURATION:-30}" \
+        ${LOAD_CACHE:+--cache --commit} \
+        --output-json results/carga_optimized.json
+
+    if [ $? -ne 0 ]; then
+        echo "ERROR: Falló la prueba de carga"
+        exit 1
+    fi
+fi
+
+# Benchmark de checkout opcional: CHECKOUT_CLIENTS=N compradores concurrentes
+# con demanda concentrada en productos calientes (CHECKOUT_SKEW, Zipf)
+if [ -n "${CHECKOUT_CLIENTS}" ]; then
+    echo "Ejecutando benchmark de checkout con ${CHECKOUT_CLIENTS} compradores..."
+    docker-compose run --rm benchmark python checkout_benchmark.py \
+        --label optimized \
+        --clients "${CHECKOUT_CLIENTS}" \
+        --duration "${CHECKOUT_DURATION:-30}" \
+        --skew "${CHECKOUT_SKEW:-1}" \
+        --output-json results/checkout_optimized.json
+
+    if [ $? -ne 0 ]; then
+        echo "ERROR: Falló el benchmark de checkout"
+        exit 1
+    fi
+fi
+
+# Pruning de particiones y costo de archivar, solo con la variante particionada
+if [ "${PARTITIONED:-off}" = "on" ]; then
+    echo "Midiendo pruning y archivado de particiones..."
+    docker-compose run --rm benchmark python partitions.py benchmark \
+        --output-json results/particiones.json
+
+    if [ $? -ne 0 ]; then
+        echo "ERROR: Falló el benchmark de particiones"
+        exit 1
+    fi
+fi
+
+# Comparar los planes EXPLAIN con el último run baseline, si existe
+if [ -f ../results/benchmark_baseline.json ]; then
+    echo "Comparando planes con baseline..."
+    docker-compose run --rm benchmark python compare_plans.py \
+        results/benchmark_baseline.json results/benchmark_optimized.json \
+        --output-md results/comparacion_planes.md
+fi
 
 echo ""
 echo "=== RESULTADOS OPTIMIZADOS EN CSV ==="
 
-# Crear archivo CSV con los resultados
-echo "Operación/Consulta,Tiempo (ms),Filas,Descripción" > ../results/benchmark_optimized.csv
-
-# Extraer cada línea de resultados y agregar al CSV
-consulta1=$(echo "$benchmark_output" | grep "Consulta 1:" | sed 's/.*Consulta 1: Productos Electrónica - \([0-9]*\) ms - \([0-9]*\) filas.*/\1,\2/')
-consulta2=$(echo "$benchmark_output" | grep "Consulta 2:" | sed 's/.*Consulta 2: Contar pedidos - \([0-9]*\) ms - \([0-9]*\) filas.*/\1,\2/')
-operacion1=$(echo "$benchmark_output" | grep "Operación 1:" | sed 's/.*Operación 1: Insertar producto - \([0-9]*\) ms.*/\1,0/')
-operacion2=$(echo "$benchmark_output" | grep "Operación 2:" | sed 's/.*Operación 2: Actualizar precio - \([0-9]*\) ms.*/\1,0/')
-consulta3=$(echo "$benchmark_output" | grep "Consulta 3:" | sed 's/.*Consulta 3: Detalles pedidos - \([0-9]*\) ms - \([0-9]*\) filas.*/\1,\2/')
-consulta4=$(echo "$benchmark_output" | grep "Consulta 4:" | sed 's/.*Consulta 4: Promedio calificaciones - \([0-9]*\) ms - \([0-9]*\) filas.*/\1,\2/')
-consulta5=$(echo "$benchmark_output" | grep "Consulta 5:" | sed 's/.*Consulta 5: Ingresos vendedores - \([0-9]*\) ms - \([0-9]*\) filas.*/\1,\2/')
-consulta_like=$(echo "$benchmark_output" | grep "Consulta LIKE" | sed 's/.*Consulta LIKE - \([0-9]*\) ms - \([0-9]*\) filas.*/\1,\2/')
-delete_op=$(echo "$benchmark_output" | grep "DELETE producto" | sed 's/.*DELETE producto - \([0-9]*\) ms.*/\1,-/')
-
-echo "Consulta 1,$consulta1,Buscar productos de la categoría \"Electrónica\"" >> ../results/benchmark_optimized.csv
-echo "Consulta 2,$consulta2,Obtener el número total de pedidos" >> ../results/benchmark_optimized.csv
-echo "Operación 1,$operacion1,Agregar un nuevo producto" >> ../results/benchmark_optimized.csv
-echo "Operación 2,$operacion2,Actualizar el precio de un producto" >> ../results/benchmark_optimized.csv
-echo "Consulta 3,$consulta3,Obtener detalles de pedidos con productos" >> ../results/benchmark_optimized.csv
-echo "Consulta 4,$consulta4,Calcular promedio de calificaciones por producto" >> ../results/benchmark_optimized.csv
-echo "Consulta 5,$consulta5,Reporte de ingresos por vendedor" >> ../results/benchmark_optimized.csv
-echo "Consulta lenta,$consulta_like,Búsqueda de productos por nombre (LIKE)" >> ../results/benchmark_optimized.csv
-echo "Operación DELETE,$delete_op,Eliminar producto de prueba" >> ../results/benchmark_optimized.csv
-
 echo "Archivo CSV generado: ../results/benchmark_optimized.csv"
+echo "Resultados completos (con todas las muestras): ../results/benchmark_optimized.json"
 echo ""
 echo "Contenido del CSV:"
 cat ../results/benchmark_optimized.csv
@@ -0,0 +1,97 @@
+#!/bin/bash
+
+echo "=== ESTUDIO DE ESCALADO ==="
+echo "Carga cada schema a varios factores de escala, ejecuta el benchmark en cada tamaño y ajusta latencia vs filas"
+echo ""
+
+# Factores de escala y schemas a medir (variables de entorno)
+SCALES="${SCALES:-1 10 100}"
+SCHEMAS="${SCHEMAS:-baseline optimized}"
+
+# Cambiar al directorio raíz del proyecto
+cd "$(dirname "$0")/.."
+
+mkdir -p results/escalado
+
+# Cambiar al directorio docker para usar docker-compose
+cd docker
+
+# Limpiar contenedores y volúmenes de esta aplicación únicamente
+echo "Limpiando contenedores de la aplicación..."
+docker-compose down -v 2>/dev/null || true
+docker rm -f e-shopify-db e-shopify-pgadmin e-shopify-populate e-shopify-benchmark 2>/dev/null || true
+
+# Levantar PostgreSQL
+echo "Levantando PostgreSQL..."
+docker-compose up -d postgres
+
+# Esperar a que PostgreSQL esté listo
+echo "Esperando que PostgreSQL esté listo..."
+sleep 15
+
+docker-compose exec postgres pg_isready -h localhost -p 5432 -U postgres
+
+if [ $? -ne 0 ]; then
+    echo "ERROR: No se pudo conectar a PostgreSQL"
+    exit 1
+fi
+
+for schema in ${SCHEMAS}; do
+    if [ "${schema}" = "baseline" ]; then
+        sql_file=../sql/e-shopify-db.sql
+    else
+        sql_file=../sql/e-shopify-db-optimized.sql
+    fi
+
+    for scale in ${SCALES}; do
+        echo ""
+        echo "=== ${schema}, factor de escala ${scale} ==="
+
+        # Base de datos vacía en cada tamaño (el schema baseline no usa IF NOT EXISTS)
+        docker-compose exec -T postgres psql -U postgres -d postgres \
+            -c "DROP DATABASE IF EXISTS e_shopify_db WITH (FORCE)" \
+            -c "CREATE DATABASE e_shopify_db"
+
+        echo "Cargando schema ${schema}..."
+        cat "${sql_file}" | docker-compose exec -T postgres psql -U postgres -d postgres > /dev/null
+
+        if [ $? -ne 0 ]; then
+            echo "ERROR: Falló la carga del schema ${schema}"
+            exit 1
+        fi
+
+        echo "Poblando datos (factor de escala ${scale})..."
+        SCALE_FACTOR="${scale}" POPULATE_REPORT="results/escalado/poblacion_${schema}_sf${scale}.json" \
+            docker-compose up populate
+
+        if [ $? -ne 0 ]; then
+            echo "ERROR: Falló la población de datos"
+            exit 1
+        fi
+
+        # La etiqueta es el schema: scaling_report.py agrupa los tamaños por etiqueta
+        docker-compose run --rm benchmark python script_benchmark.py \
+            --label "${schema}" \
+            --warmup "${WARMUP:-3}" \
+            --repetitions "${REPETITIONS:-30}" \
+            --output-csv "results/escalado/${schema}_sf${scale}.csv" \
+            --output-json "results/escalado/${schema}_sf${scale}.json"
+
+        if [ $? -ne 0 ]; then
+            echo "ERROR: Falló el benchmark (${schema}, factor de escala ${scale})"
+            exit 1
+        fi
+    done
+done
+
+# Ajustar latencia vs filas y marcar las consultas que crecen más de lo esperado
+echo ""
+echo "Generando reporte de escalado..."
+docker-compose run --rm benchmark python scaling_report.py results/escalado \
+    --output-md results/escalado.md \
+    --output-json results/escalado_resumen.json \
+    --output-svg results/escalado
+
+echo ""
+echo "Reporte: ../results/escalado.md"
+echo "Gráficos: ../results/escalado_<schema>.svg"
@@ -0,0 +1,324 @@
+import argparse
+import glob
+import json
+import math
+import os
+
+from compare_plans import walk
+from workload import DEFAULT_WORKLOAD, load_workload
+
+# Exponente esperado de latencia ~ filas^b según el "crecimiento" de workload.json
+EXPECTED_EXPONENTS = {"constante": 0.0, "lineal": 1.0}
+
+# Colores de las series en los gráficos SVG
+COLORS = (
+    "#1f77b4",
+    "#ff7f0e",
+    "#2ca02c",
+    "#d62728",
+    "#9467bd",
+    "#8c564b",
+    "#e377c2",
+    "#7f7f7f",
+    "#bcbd22",
+    "#17becf",
+    "#000000",
+)
+
+
+def load_runs(paths):
+    """JSON de script_benchmark.py con tamaños de tabla (archivos o directorios)"""
+    runs = []
+    for path in paths:
+        files = (
+            sorted(glob.glob(os.path.join(path, "*.json")))
+            if os.path.isdir(path)
+            else [path]
+        )
+        for name in files:
+            with open(name, encoding="utf-8") as f:
+                report = json.load(f)
+            if report.get("filas_tablas") and report.get("resultados"):
+                runs.append(report)
+    return runs
+
+
+def collect(runs, workload):
+    """Puntos (filas, mediana, plan, tamaños) por (etiqueta, clave), ordenados por filas"""
+    scales = {benchmark["clave"]: benchmark.get("escala") for benchmark in workload}
+    series = {}
+    for run in runs:
+        for result in run["resultados"]:
+            scale = scales.get(result.get("clave"))
+            if not scale or result.get("modo_ejecucion", "simple") != "simple":
+                continue
+            rows = run["filas_tablas"].get(scale["tabla"])
+            if not rows:
+                continue
+            series.setdefault((run["etiqueta"], result["clave"]), []).append(
+                {
+                    "filas": rows,
+                    "mediana_ms": result["mediana_ms"],
+                    "plan": result.get("plan"),
+                    "filas_tablas": run["filas_tablas"],
+                    "nombre": result["nombre"],
+                }
+            )
+    for points in series.values():
+        points.sort(key=lambda point: point["filas"])
+    return series
+
+
+def fit_power(points):
+    """Ajuste mínimos cuadrados de log(latencia) = log(a) + b log(filas); devuelve (a, b, r2)"""
+    xs = [math.log(point["filas"]) for point in points]
+    ys = [math.log(max(point["mediana_ms"], 1e-6)) for point in points]
+    n = len(xs)
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return math.exp(mean_y), 0.0, 0.0
+    b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    a = mean_y - b * mean_x
+    total = sum((y - mean_y) ** 2 for y in ys)
+    residual = sum((y - (a + b * x)) ** 2 for x, y in zip(xs, ys))
+    r2 = 1 - residual / total if total else 1.0
+    return math.exp(a), b, r2
+
+
+def seq_scans(point, min_rows):
+    """Tablas con Seq Scan en el plan del punto que tienen al menos min_rows filas"""
+    if not point["plan"]:
+        return []
+    tables = []
+    for _, node in walk(point["plan"]["Plan"]):
+        if node["Node Type"] != "Seq Scan":
+            continue
+        table = node.get("Relation Name")
+        rows = point["filas_tablas"].get(table, node.get("Plan Rows", 0))
+        if rows >= min_rows and table not in tables:
+            tables.append(table)
+    return tables
+
+
+def analyze(series, workload, tolerance, min_rows):
+    """Exponente de crecimiento por consulta y alertas frente a lo esperado"""
+    scales = {benchmark["clave"]: benchmark["escala"] for benchmark in workload}
+    report = []
+    for (label, key), points in sorted(series.items()):
+        scale = scales[key]
+        expected = EXPECTED_EXPONENTS[scale["crecimiento"]]
+        row = {
+            "etiqueta": label,
+            "clave": key,
+            "nombre": points[0]["nombre"],
+            "tabla": scale["tabla"],
+            "crecimiento_esperado": scale["crecimiento"],
+            "puntos": [
+                {
+                    "filas": point["filas"],
+                    "mediana_ms": point["mediana_ms"],
+                    "por_segundo": (
+                        1000 / point["mediana_ms"] if point["mediana_ms"] else None
+                    ),
+                }
+                for point in points
+            ],
+            "alertas": [],
+        }
+        if len(points) >= 2:
+            coefficient, exponent, r2 = fit_power(points)
+            row["exponente"] = exponent
+            row["r2"] = r2
+            row["coeficiente_ms"] = coefficient
+            if exponent > expected + tolerance:
+                row["alertas"].append(
+                    f"crece como filas^{exponent:.2f}, se esperaba filas^{expected:.0f}"
+                )
+        # Un Seq Scan sobre una tabla grande en una consulta que debería usar índice
+        if scale["crecimiento"] == "constante":
+            tables = seq_scans(points[-1], min_rows)
+            if tables:
+                row["alertas"].append(f"Seq Scan sobre {', '.join(tables)}")
+        report.append(row)
+    return report
+
+
+def render_markdown(report, tolerance):
+    """Tabla de latencias por tamaño, exponentes ajustados y alertas"""
+    lines = [
+        "# Estudio de escalado",
+        "",
+        "Latencia mediana por tamaño de la tabla principal de cada consulta y ajuste"
+        f" latencia = a · filas^b. Se marca ⚠ si b supera lo esperado en más de {tolerance}"
+        " o si una consulta que debería ser constante recorre una tabla grande.",
+    ]
+    for label in sorted({row["etiqueta"] for row in report}):
+        rows = [row for row in report if row["etiqueta"] == label]
+        lines += [
+            "",
+            f"## {label}",
+            "",
+            "| Consulta | Tabla | Filas | Mediana (ms) | ops/s | b | Esperado | Alertas |",
+            "|----------|-------|-------|--------------|-------|---|----------|---------|",
+        ]
+        for row in rows:
+            points = row["puntos"]
+            sizes = " / ".join(f"{point['filas']:,}" for point in points)
+            medians = " / ".join(f"{point['mediana_ms']:.3f}" for point in points)
+            throughput = " / ".join(
+                f"{point['por_segundo']:.0f}" if point["por_segundo"] else "-"
+                for point in points
+            )
+            exponent = f"{row['exponente']:.2f}" if "exponente" in row else "-"
+            alerts = "⚠ " + "; ".join(row["alertas"]) if row["alertas"] else ""
+            lines.append(
+                f"| {row['nombre']} | {row['tabla']} | {sizes} | {medians} | {throughput}"
+                f" | {exponent} | {row['crecimiento_esperado']} | {alerts} |"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def render_svg(label, rows, width=760, height=440):
+    """Gráfico log-log de latencia mediana vs filas, una línea por consulta"""
+    left, right, top, bottom = 60, 220, 30, 40
+    points = [
+        point for row in rows for point in row["puntos"] if point["mediana_ms"] > 0
+    ]
+    if not points:
+        return None
+    min_x = math.floor(math.log10(min(point["filas"] for point in points)))
+    max_x = math.ceil(math.log10(max(point["filas"] for point in points)))
+    min_y = math.floor(math.log10(min(point["mediana_ms"] for point in points)))
+    max_y = math.ceil(math.log10(max(point["mediana_ms"] for point in points)))
+    max_x, max_y = max(max_x, min_x + 1), max(max_y, min_y + 1)
+
+    def x_of(value):
+        fraction = (math.log10(value) - min_x) / (max_x - min_x)
+        return left + fraction * (width - left - right)
+
+    def y_of(value):
+        fraction = (math.log10(value) - min_y) / (max_y - min_y)
+        return height - bottom - fraction * (height - top - bottom)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="sans-serif" font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<text x="{left}" y="18" font-size="13">{label}: latencia mediana (ms) vs filas</text>',
+    ]
+    for exponent in range(min_x, max_x + 1):
+        x = x_of(10**exponent)
+        parts.append(
+            f'<line x1="{x:.1f}" y1="{top}" x2="{x:.1f}" y2="{height - bottom}" stroke="#ddd"/>'
+        )
+        parts.append(
+            f'<text x="{x:.1f}" y="{height - bottom + 15}" text-anchor="middle">1e{exponent}</text>'
+        )
+    for exponent in range(min_y, max_y + 1):
+        y = y_of(10**exponent)
+        parts.append(
+            f'<line x1="{left}" y1="{y:.1f}" x2="{width - right}" y2="{y:.1f}" stroke="#ddd"/>'
+        )
+        parts.append(
+            f'<text x="{left - 5}" y="{y + 4:.1f}" text-anchor="end">{10 ** exponent:g}</text>'
+        )
+    for index, row in enumerate(rows):
+        color = COLORS[index % len(COLORS)]
+        coordinates = " ".join(
+            f"{x_of(point['filas']):.1f},{y_of(point['mediana_ms']):.1f}"
+            for point in row["puntos"]
+            if point["mediana_ms"] > 0
+        )
+        stroke = 3 if row["alertas"] else 1.5
+        parts.append(
+            f'<polyline points="{coordinates}" fill="none" stroke="{color}" stroke-width="{stroke}"/>'
+        )
+        y = top + 14 * index
+        legend = row["nombre"] + (" ⚠" if row["alertas"] else "")
+        parts.append(
+            f'<line x1="{width - right + 10}" y1="{y}" x2="{width - right + 30}" y2="{y}" stroke="{color}" stroke-width="{stroke}"/>'
+        )
+        parts.append(f'<text x="{width - right + 35}" y="{y + 4}">{legend}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts) + "\n"
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Ajuste de latencia vs tamaño de datos a partir de varios runs del benchmark"
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="JSON de script_benchmark.py o directorios con JSON"
+    )
+    parser.add_argument(
+        "--workload", default=DEFAULT_WORKLOAD, help="archivo JSON de consultas"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="margen sobre el exponente esperado antes de marcar una consulta",
+    )
+    parser.add_argument(
+        "--min-rows",
+        type=int,
+        default=10000,
+        help="filas a partir de las que un Seq Scan en una consulta constante se marca",
+    )
+    parser.add_argument("--output-md", help="ruta del reporte Markdown")
+    parser.add_argument("--output-json", help="ruta del resumen JSON")
+    parser.add_argument(
+        "--output-svg",
+        help="prefijo de los gráficos SVG (uno por etiqueta: <prefijo>_<etiqueta>.svg)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workload = load_workload(args.workload)
+    runs = load_runs(args.paths)
+    series = collect(runs, workload)
+    if not series:
+        print("No hay runs con tamaños de tabla (filas_tablas) en los JSON indicados.")
+        return
+    report = analyze(series, workload, args.tolerance, args.min_rows)
+
+    for row in report:
+        exponent = (
+            f"b = {row['exponente']:.2f}" if "exponente" in row else "un solo tamaño"
+        )
+        line = (
+            f"{row['etiqueta']} / {row['nombre']}: {exponent}"
+            f" (esperado {row['crecimiento_esperado']}, {len(row['puntos'])} tamaños de {row['tabla']})"
+        )
+        if row["alertas"]:
+            line += " - ⚠ " + "; ".join(row["alertas"])
+        print(line)
+
+    if args.output_md:
+        with open(args.output_md, "w", encoding="utf-8") as f:
+            f.write(render_markdown(report, args.tolerance))
+        print(f"\nReporte Markdown guardado en {args.output_md}")
+    if args.output_svg:
+        for label in sorted({row["etiqueta"] for row in report}):
+            svg = render_svg(label, [row for row in report if row["etiqueta"] == label])
+            if svg:
+                path = f"{args.output_svg}_{label}.svg"
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(svg)
+                print(f"Gráfico guardado en {path}")
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"tolerancia": args.tolerance, "consultas": report},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"Resumen JSON guardado en {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,136 +1,639 @@
+import argparse
+import csv
+import json
+import random
+import sys
 import time
-import psycopg2
+from datetime import datetime
 
-print("SCRIPT BENCHMARK INICIADO")
+from benchmark_stats import percentile, summarize
+from buffer_cache import (
+    CACHE_MODES,
+    BufferAccounting,
+    ColdCache,
+    SteadyState,
+    prewarm,
+)
+from db import EXECUTION_MODES, SimpleExecutor, connect_db, make_executor, wait_for_db
+from load_generator import DEFAULT_MIX, parse_mix
+from result_fetch import (
+    DEFAULT_ITERSIZE,
+    FETCH_MODES,
+    fetch,
+    measure_transfer,
+    returns_rows,
+)
+from workload import (
+    DEFAULT_WORKLOAD,
+    ParameterSampler,
+    default_params,
+    load_workload,
+    split_supported,
+)
 
+CSV_COLUMNS = [
+    ("Operación/Consulta", "nombre"),
+    ("Modo", "modo_ejecucion"),
+    ("Filas", "filas"),
+    ("Repeticiones", "n"),
+    ("Mínimo (ms)", "min_ms"),
+    ("Mediana (ms)", "mediana_ms"),
+    ("Media (ms)", "media_ms"),
+    ("P95 (ms)", "p95_ms"),
+    ("P99 (ms)", "p99_ms"),
+    ("Máximo (ms)", "max_ms"),
+    ("Desv. estándar (ms)", "desviacion_ms"),
+    ("IC95 inferior (ms)", "ic95_inferior_ms"),
+    ("IC95 superior (ms)", "ic95_superior_ms"),
+    ("Primera fila mediana (ms)", "primera_fila_mediana_ms"),
+    ("Bytes", "bytes"),
+    ("Memoria pico (KB)", "memoria_pico_kb"),
+    ("Bloques hit mediana", "bloques_hit_mediana"),
+    ("Bloques read mediana", "bloques_read_mediana"),
+    ("Tasa de aciertos", "tasa_aciertos"),
+    ("I/O lectura mediana (ms)", "io_lectura_mediana_ms"),
+    ("Fracción I/O", "fraccion_io"),
+    ("Descripción", "descripcion"),
+]
 
-def wait_for_db(host, port, user, password, dbname, max_attempts=30):
-    """Espera a que la base de datos esté lista."""
-    for attempt in range(max_attempts):
-        try:
-            conn = psycopg2.connect(
-                host=host, port=port, user=user, password=password, dbname=dbname
+# Tablas cuyo tamaño se guarda en el JSON (eje x de scaling_report.py)
+SIZE_TABLES = ("usuario", "vendedor", "producto", "pedido", "pedido_item", "resena")
+
+
+def table_sizes(conn):
+    """Filas de cada tabla de SIZE_TABLES al momento del benchmark"""
+    sizes = {}
+    with conn.cursor() as cursor:
+        for table in SIZE_TABLES:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            sizes[table] = cursor.fetchone()[0]
+    conn.rollback()
+    return sizes
+
+
+def run_once(
+    executor, benchmark, params=None, fetch_mode="none", itersize=None, accounting=None
+):
+    """Ejecutar una repetición y devolver (tiempo en ns, filas, primera fila en ns)
+
+    Con fetch_mode "none" solo se mide execute(); con los demás modos se mide
+    hasta leer la última fila de las consultas que devuelven filas. Obtener la
+    conexión también se mide (modos connect y pooled). Con accounting se
+    activa track_io_timing y se publican las estadísticas de la sesión.
+    """
+    start = time.perf_counter_ns()
+    with executor.connection() as conn:
+        acquire = time.perf_counter_ns() - start
+        first_row = None
+        with conn.cursor() as cursor:
+            if accounting:
+                accounting.before_query(cursor)
+            if benchmark.get("preparacion"):
+                cursor.execute(benchmark["preparacion"])
+            sql, values = executor.statement(conn, benchmark["sql"], params)
+            if fetch_mode != "none" and returns_rows(benchmark):
+                first_row, elapsed, rows = fetch(
+                    conn, sql, values, fetch_mode, itersize or DEFAULT_ITERSIZE
+                )
+                first_row += acquire
+            else:
+                start = time.perf_counter_ns()
+                cursor.execute(sql, values)
+                elapsed = time.perf_counter_ns() - start
+                if benchmark.get("filas_desde_resultado"):
+                    rows = cursor.fetchone()[0]
+                else:
+                    rows = cursor.rowcount
+        conn.rollback()
+        if accounting:
+            accounting.after_query(conn)
+    return acquire + elapsed, rows, first_row
+
+
+def _explain(conn, benchmark, options, params):
+    """Plan JSON de la consulta con las opciones de EXPLAIN indicadas"""
+    with conn.cursor() as cursor:
+        if benchmark.get("preparacion"):
+            cursor.execute(benchmark["preparacion"])
+        cursor.execute(
+            f"EXPLAIN ({options}, FORMAT JSON) " + benchmark["sql"].rstrip(";"),
+            params or None,
+        )
+        plan = cursor.fetchone()[0]
+    conn.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def capture_plan(conn, benchmark, params=None):
+    """Plan real de la consulta con EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)"""
+    return _explain(conn, benchmark, "ANALYZE, BUFFERS", params)
+
+
+def plan_shape(node):
+    """Forma de un plan: tipos de nodo e índices, sin costos ni filas"""
+    label = node["Node Type"]
+    if node.get("Index Name"):
+        label += f"[{node['Index Name']}]"
+    children = [plan_shape(child) for child in node.get("Plans", [])]
+    return label + (f"({', '.join(children)})" if children else "")
+
+
+def run_benchmark(
+    conn,
+    benchmark,
+    warmup,
+    repetitions,
+    sampler,
+    seed,
+    explain=False,
+    fetch_mode="none",
+    itersize=DEFAULT_ITERSIZE,
+    executor=None,
+    accounting=None,
+    before_repetition=None,
+):
+    """Calentar y medir una consulta u operación con parámetros generados
+
+    before_repetition, si se indica, prepara la caché antes de cada repetición
+    medida y devuelve la conexión y el ejecutor a usar (el modo cold reconecta).
+    """
+    executor = executor or SimpleExecutor(conn)
+    rng = random.Random(f"{seed}:{benchmark['clave']}")
+    for _ in range(warmup):
+        run_once(
+            executor, benchmark, sampler.draw(benchmark, rng), fetch_mode, itersize
+        )
+    samples = []
+    first_rows = []
+    rows = []
+    shapes = {}
+    buffers = []
+    for _ in range(repetitions):
+        params = sampler.draw(benchmark, rng)
+        if before_repetition:
+            conn, executor = before_repetition()
+        if accounting:
+            before = accounting.snapshot(conn)
+        elapsed, count, first_row = run_once(
+            executor, benchmark, params, fetch_mode, itersize, accounting
+        )
+        if accounting:
+            after = accounting.snapshot(conn)
+            buffers.append([end - start for end, start in zip(after, before)])
+        samples.append(elapsed)
+        rows.append(count)
+        if first_row is not None:
+            first_rows.append(first_row)
+        if explain and params:
+            # EXPLAIN sin ANALYZE: solo planifica, para contar planes distintos
+            shape = plan_shape(_explain(conn, benchmark, "COSTS OFF", params)["Plan"])
+            shapes[shape] = shapes.get(shape, 0) + 1
+    result = {
+        "clave": benchmark["clave"],
+        "nombre": benchmark["nombre"],
+        "descripcion": benchmark["descripcion"],
+        "sql": benchmark["sql"],
+        # Mediana: con parámetros generados las filas varían entre repeticiones
+        "filas": round(percentile(sorted(rows), 50)),
+    }
+    result.update(summarize(samples))
+    result["muestras_ms"] = [sample / 1e6 for sample in samples]
+    result["filas_muestras"] = rows
+    if buffers:
+        result.update(buffer_summary(buffers, samples, accounting.io_timing))
+    if first_rows:
+        first_row_stats = summarize(first_rows)
+        result["primera_fila_mediana_ms"] = first_row_stats["mediana_ms"]
+        result["primera_fila_p95_ms"] = first_row_stats["p95_ms"]
+        result.update(
+            measure_transfer(
+                conn,
+                benchmark["sql"],
+                default_params(benchmark) or None,
+                fetch_mode,
+                itersize,
             )
-            conn.close()
-            print("Base de datos lista.")
-            return True
-        except psycopg2.OperationalError:
-            print(f"Esperando BD... intento {attempt + 1}/{max_attempts}")
-            time.sleep(2)
-    return False
+        )
+    if explain:
+        # Después de las repeticiones medidas, para no alterar los tiempos;
+        # con los parámetros por defecto para que los runs sean comparables
+        result["plan"] = capture_plan(conn, benchmark, default_params(benchmark))
+        if shapes:
+            result["planes_distintos"] = shapes
+    return result
 
 
-def main():
-    # Configuración de conexión - IP del contenedor postgres
-    db_settings = {
-        "host": "postgres",
-        "port": 5432,
-        "user": "postgres",
-        "password": "password",
-        "dbname": "e_shopify_db",
+def buffer_summary(buffers, samples, io_timing):
+    """Bloques hit/read y tiempo de lectura por repetición, y su resumen
+
+    fraccion_io es el tiempo de lectura sobre el tiempo medido (totales de
+    todas las repeticiones): cerca de 0, la consulta está limitada por CPU;
+    cerca de 1, por I/O.
+    """
+    hits, reads, read_ms = (list(column) for column in zip(*buffers))
+    blocks = sum(hits) + sum(reads)
+    summary = {
+        "bloques_hit_muestras": hits,
+        "bloques_read_muestras": reads,
+        "bloques_hit_mediana": percentile(sorted(hits), 50),
+        "bloques_read_mediana": percentile(sorted(reads), 50),
+        "tasa_aciertos": sum(hits) / blocks if blocks else None,
     }
+    if io_timing:
+        summary["io_lectura_muestras_ms"] = read_ms
+        summary["io_lectura_mediana_ms"] = percentile(sorted(read_ms), 50)
+        summary["fraccion_io"] = sum(read_ms) / (sum(samples) / 1e6)
+    return summary
 
-    # Esperar a que la BD esté lista
-    if not wait_for_db(**db_settings):
-        print("No se pudo conectar a la base de datos.")
-        return
 
-    # Conectar con logging
-    conn = psycopg2.connect(**db_settings)
+def parse_modes(text):
+    """Leer una lista de modos de ejecución separados por comas"""
+    modes = [mode.strip() for mode in text.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in EXECUTION_MODES]
+    if unknown or not modes:
+        raise argparse.ArgumentTypeError(
+            f"modos inválidos: {text} (válidos: {', '.join(EXECUTION_MODES)})"
+        )
+    return modes
 
-    print("\n=== EVALUACIÓN DE RENDIMIENTO - PASO 3 ===")
-    print("Ejecutando consultas frecuentes con medición manual de tiempos...\n")
 
-    try:
-        # Ejecutar consultas de prueba con medición manual
-        with conn.cursor() as cursor:
-            # Consulta 1: Productos de categoría Electrónica
-            start = time.time()
-            cursor.execute(
-                "SELECT p.producto_id, p.nombre, p.precio, c.nombre as categoria FROM producto p JOIN categoria c ON p.categoria_id = c.categoria_id WHERE c.nombre = 'Electrónica' ORDER BY p.precio DESC;"
-            )
-            end = time.time()
-            print(
-                f"Consulta 1: Productos Electrónica - {int((end - start) * 1000)} ms - {cursor.rowcount} filas"
-            )
+def compare_modes(results):
+    """Diferencias de mediana entre modos de ejecución por consulta
 
-            # Consulta 2: Contar pedidos
-            start = time.time()
-            cursor.execute("SELECT COUNT(*) FROM pedido;")
-            end = time.time()
-            result = cursor.fetchone()
-            print(
-                f"Consulta 2: Contar pedidos - {int((end - start) * 1000)} ms - {result[0]} filas"
-            )
+    simple - prepared aproxima el costo de análisis y planificación por
+    sentencia; connect - pooled, el costo de abrir una conexión por petición.
+    """
+    medians = {}
+    for result in results:
+        medians.setdefault(result["nombre"], {})[result["modo_ejecucion"]] = result[
+            "mediana_ms"
+        ]
+    comparison = []
+    for name, by_mode in medians.items():
+        row = {"nombre": name, "medianas_ms": by_mode}
+        if "simple" in by_mode and "prepared" in by_mode:
+            row["planificacion_ms"] = by_mode["simple"] - by_mode["prepared"]
+        if "connect" in by_mode and "pooled" in by_mode:
+            row["conexion_ms"] = by_mode["connect"] - by_mode["pooled"]
+        comparison.append(row)
+    return comparison
 
-            # Operación 1: Insertar producto
-            start = time.time()
-            cursor.execute(
-                "INSERT INTO producto (vendedor_id, categoria_id, nombre, descripcion, precio, activo) VALUES (1, 1, 'Producto de Prueba', 'Descripción', 99.99, TRUE);"
-            )
-            end = time.time()
-            print(f"Operación 1: Insertar producto - {int((end - start) * 1000)} ms")
 
-            # Operación 2: Actualizar precio
-            start = time.time()
-            cursor.execute(
-                "UPDATE producto SET precio = 109.99 WHERE nombre = 'Producto de Prueba';"
+def write_csv(path, results):
+    """Guardar el resumen de resultados en CSV"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([header for header, _ in CSV_COLUMNS])
+        for result in results:
+            writer.writerow(
+                [
+                    (
+                        f"{result[key]:.3f}"
+                        if isinstance(result.get(key), float)
+                        else result.get(key, "")
+                    )
+                    for _, key in CSV_COLUMNS
+                ]
             )
-            end = time.time()
-            print(f"Operación 2: Actualizar precio - {int((end - start) * 1000)} ms")
 
-            # Consulta 3: Detalles de pedidos
-            start = time.time()
-            cursor.execute(
-                "SELECT p.pedido_id, u.nombre as cliente, p.fecha_pedido, ep.nombre as estado, pi.producto_id, pr.nombre as producto, pi.cantidad, pi.precio_unitario, pi.subtotal FROM pedido p JOIN usuario u ON p.usuario_id = u.usuario_id JOIN estado_pedido ep ON p.estado_pedido_id = ep.estado_pedido_id JOIN pedido_item pi ON p.pedido_id = pi.pedido_id JOIN producto pr ON pi.producto_id = pr.producto_id ORDER BY p.pedido_id LIMIT 10;"
-            )
-            end = time.time()
-            print(
-                f"Consulta 3: Detalles pedidos - {int((end - start) * 1000)} ms - {cursor.rowcount} filas"
-            )
 
-            # Consulta 4: Promedio de calificaciones
-            start = time.time()
-            cursor.execute(
-                "SELECT p.producto_id, p.nombre, AVG(r.calificacion) as promedio FROM producto p LEFT JOIN resena r ON p.producto_id = r.producto_id GROUP BY p.producto_id, p.nombre HAVING AVG(r.calificacion) > 4.0;"
-            )
-            end = time.time()
-            print(
-                f"Consulta 4: Promedio calificaciones - {int((end - start) * 1000)} ms - {cursor.rowcount} filas"
-            )
+def write_json(path, label, args, results, comparison=None, sizes=None, cache=None):
+    """Guardar resultados completos (incluidas las muestras) en JSON"""
+    report = {
+        "etiqueta": label,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "filas_tablas": sizes,
+        "configuracion": {
+            "calentamiento": args.warmup,
+            "repeticiones": args.repetitions,
+            "planes": args.explain,
+            "carga": args.workload,
+            "semilla": args.seed,
+            "parametros_fijos": args.fixed_params,
+            "modo_lectura": args.fetch_mode,
+            "itersize": args.itersize,
+            "modos_ejecucion": args.execution_modes,
+            "modo_cache": args.cache_mode,
+        },
+        "cache": cache,
+        "resultados": results,
+    }
+    if comparison:
+        report["comparacion_modos"] = comparison
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
 
-            # Consulta 5: Ingresos por vendedor
-            start = time.time()
-            cursor.execute(
-                "SELECT v.nombre_tienda, SUM(pi.subtotal) as ingresos_totales FROM vendedor v JOIN producto pr ON v.vendedor_id = pr.vendedor_id JOIN pedido_item pi ON pr.producto_id = pi.producto_id GROUP BY v.vendedor_id, v.nombre_tienda ORDER BY ingresos_totales DESC;"
-            )
-            end = time.time()
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Benchmark de consultas e_shopify_db")
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=3,
+        help="repeticiones de calentamiento (no medidas) por consulta",
+    )
+    parser.add_argument(
+        "--repetitions",
+        type=int,
+        default=30,
+        help="repeticiones medidas por consulta",
+    )
+    parser.add_argument(
+        "--label", default="benchmark", help="etiqueta del run (baseline, optimized)"
+    )
+    parser.add_argument("--output-csv", help="ruta del CSV de resumen")
+    parser.add_argument("--output-json", help="ruta del JSON con todas las muestras")
+    parser.add_argument(
+        "--workload", default=DEFAULT_WORKLOAD, help="archivo JSON de consultas"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=42, help="semilla de los parámetros generados"
+    )
+    parser.add_argument(
+        "--fixed-params",
+        action="store_true",
+        help='usar siempre los parámetros "defecto" del archivo de consultas',
+    )
+    parser.add_argument(
+        "--fetch-mode",
+        choices=FETCH_MODES,
+        default="none",
+        help="lectura de filas: none (solo execute), buffered (cursor de cliente),"
+        " server (cursor con nombre) o stream (COPY TO STDOUT)",
+    )
+    parser.add_argument(
+        "--itersize",
+        type=int,
+        default=DEFAULT_ITERSIZE,
+        help="filas por FETCH del cursor de servidor (--fetch-mode server)",
+    )
+    parser.add_argument(
+        "--execution-modes",
+        type=parse_modes,
+        default=["simple"],
+        help="modos separados por comas: simple (conexión persistente), prepared"
+        " (PREPARE/EXECUTE), connect (conexión nueva por petición) y pooled (pool)",
+    )
+    parser.add_argument(
+        "--no-explain",
+        dest="explain",
+        action="store_false",
+        help="no capturar EXPLAIN (ANALYZE, BUFFERS) de cada consulta",
+    )
+    parser.add_argument(
+        "--cache-mode",
+        choices=CACHE_MODES,
+        default="none",
+        help="estado de la caché al medir: none (el que haya), cold (reinicio de"
+        " PostgreSQL y caché del SO vaciada antes de cada repetición), warm"
+        " (pg_prewarm de tablas e índices) o steady (working set de la mezcla)",
+    )
+    parser.add_argument(
+        "--restart-command",
+        help="comando de shell que reinicia PostgreSQL (--cache-mode cold)",
+    )
+    parser.add_argument(
+        "--restart-container",
+        help="contenedor de PostgreSQL a reiniciar por el socket de Docker"
+        " (--cache-mode cold, si no se indica --restart-command)",
+    )
+    parser.add_argument(
+        "--steady-mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="pesos de la mezcla que forma el working set (--cache-mode steady),"
+        " p. ej. consulta1=50,like=30,resena=20",
+    )
+    parser.add_argument(
+        "--steady-operations",
+        type=int,
+        default=200,
+        help="operaciones de la mezcla antes de medir cada consulta (--cache-mode steady)",
+    )
+    parser.add_argument(
+        "--steady-interleave",
+        type=int,
+        default=5,
+        help="operaciones de la mezcla antes de cada repetición (--cache-mode steady)",
+    )
+    parser.add_argument(
+        "--no-buffers",
+        dest="buffers",
+        action="store_false",
+        help="no contar bloques hit/read ni tiempo de I/O por repetición",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print("SCRIPT BENCHMARK INICIADO")
+
+    if "prepared" in args.execution_modes and args.fetch_mode in ("server", "stream"):
+        print("El modo prepared solo admite --fetch-mode none o buffered.")
+        sys.exit(1)
+    if args.cache_mode == "cold" and not (
+        args.restart_command or args.restart_container
+    ):
+        print("El modo cold necesita --restart-command o --restart-container.")
+        sys.exit(1)
+
+    # Esperar a que la BD esté lista
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        sys.exit(1)
+
+    conn = connect_db()
+    executors = {mode: make_executor(mode, conn) for mode in args.execution_modes}
+    benchmarks, skipped = split_supported(conn, load_workload(args.workload))
+    if skipped:
+        print(f"Sin soporte en este schema, se omiten: {', '.join(skipped)}")
+    steady_mix = {
+        key: weight for key, weight in args.steady_mix.items() if key not in skipped
+    }
+    sampler = ParameterSampler(conn, fixed=args.fixed_params)
+    sampler.prepare(benchmarks)
+    sizes = table_sizes(conn)
+
+    operations = {benchmark["clave"]: benchmark for benchmark in benchmarks}
+    unknown = [key for key in steady_mix if key not in operations]
+    if args.cache_mode == "steady" and unknown:
+        print(
+            f"Operaciones desconocidas: {', '.join(unknown)} (válidas: {', '.join(operations)})"
+        )
+        conn.close()
+        sys.exit(1)
+
+    accounting = None
+    if args.buffers and conn.server_version >= 150000:
+        accounting = BufferAccounting(conn)
+        if not accounting.io_timing:
+            print("Sin permiso para activar track_io_timing: solo se cuentan bloques.")
+    elif args.buffers:
+        print("El conteo de bloques por repetición requiere PostgreSQL 15 o superior.")
+
+    # Estado de la caché: cold y steady reemplazan el calentamiento
+    warmup = args.warmup
+    cache = {"modo": args.cache_mode}
+    cold = steady = None
+    if args.cache_mode == "cold":
+        cold = ColdCache(args.restart_command, args.restart_container)
+        warmup = 0
+    elif args.cache_mode == "warm":
+        loaded = prewarm(conn)
+        cache["pg_prewarm"] = loaded is not None
+        if loaded is None:
             print(
-                f"Consulta 5: Ingresos vendedores - {int((end - start) * 1000)} ms - {cursor.rowcount} filas"
+                "pg_prewarm no disponible: se usa solo el calentamiento por consulta."
             )
-
-            # Consulta lenta: LIKE search
-            start = time.time()
-            cursor.execute(
-                "SELECT nombre, precio FROM producto WHERE nombre LIKE '%Laptop%';"
+        else:
+            relations, blocks, shared_buffers = loaded
+            cache.update(
+                relaciones=relations,
+                bloques_cargados=blocks,
+                shared_buffers_bloques=shared_buffers,
             )
-            end = time.time()
             print(
-                f"Consulta LIKE - {int((end - start) * 1000)} ms - {cursor.rowcount} filas"
+                f"pg_prewarm: {blocks} bloques de {relations} tablas e índices"
+                f" (shared_buffers: {shared_buffers} bloques)"
             )
+    elif args.cache_mode == "steady":
+        steady = SteadyState(
+            operations,
+            steady_mix,
+            sampler,
+            args.steady_operations,
+            args.steady_interleave,
+            args.seed,
+        )
+        warmup = 0
+
+    def before_repetition(mode):
+        """Preparar la caché antes de cada repetición medida del modo de ejecución"""
 
-            # DELETE producto de prueba
-            start = time.time()
-            cursor.execute("DELETE FROM producto WHERE nombre = 'Producto de Prueba';")
-            end = time.time()
-            print(f"DELETE producto - {int((end - start) * 1000)} ms")
+        def prepare():
+            nonlocal conn
+            if cold:
+                # El reinicio cierra todas las sesiones: se reconecta cada ejecutor
+                cold.reset()
+                for executor in executors.values():
+                    executor.close()
+                conn.close()
+                conn = connect_db()
+                executors.update(
+                    {name: make_executor(name, conn) for name in executors}
+                )
+            elif steady:
+                steady.run(conn, steady.interleave)
+            return conn, executors[mode]
 
-        conn.commit()
-        print("\nDatos de prueba limpiados.")
+        return prepare if cold or steady else None
+
+    print("\n=== EVALUACIÓN DE RENDIMIENTO - PASO 3 ===")
+    print(
+        f"Ejecutando consultas frecuentes: {warmup} repeticiones de calentamiento y {args.repetitions} medidas"
+        f" (caché: {args.cache_mode})...\n"
+    )
+
+    results = []
+    comparison = None
+    try:
+        for benchmark in benchmarks:
+            for index, mode in enumerate(args.execution_modes):
+                if steady:
+                    steady.run(conn, steady.burst)
+                result = run_benchmark(
+                    conn,
+                    benchmark,
+                    warmup,
+                    args.repetitions,
+                    sampler,
+                    args.seed,
+                    # El plan no depende del modo: se captura una sola vez
+                    args.explain and index == 0,
+                    args.fetch_mode,
+                    args.itersize,
+                    executors[mode],
+                    accounting,
+                    before_repetition(mode),
+                )
+                result["modo_ejecucion"] = mode
+                results.append(result)
+                label = f" [{mode}]" if len(executors) > 1 else ""
+                print(
+                    f"{benchmark['nombre']}{label}: {benchmark['titulo']} - mediana {result['mediana_ms']:.3f} ms"
+                    f" (p95 {result['p95_ms']:.3f} ms, IC95 {result['ic95_inferior_ms']:.3f}-{result['ic95_superior_ms']:.3f} ms)"
+                    f" - {result['filas']} filas"
+                )
+                if "bytes" in result:
+                    memory = result["memoria_pico_kb"]
+                    print(
+                        f"  primera fila {result['primera_fila_mediana_ms']:.3f} ms,"
+                        f" {result['bytes']} bytes,"
+                        f" memoria pico {'-' if memory is None else memory} KB"
+                        f" (Python {result['memoria_python_kb']} KB)"
+                    )
+                if "bloques_hit_mediana" in result:
+                    line = (
+                        f"  bloques hit {result['bloques_hit_mediana']:g},"
+                        f" read {result['bloques_read_mediana']:g} (medianas)"
+                    )
+                    if "fraccion_io" in result:
+                        line += (
+                            f", lectura {result['io_lectura_mediana_ms']:.3f} ms"
+                            f" ({result['fraccion_io']:.0%} del tiempo)"
+                        )
+                    print(line)
+                if len(result.get("planes_distintos", {})) > 1:
+                    print(
+                        f"  {len(result['planes_distintos'])} planes distintos según los parámetros"
+                    )
+        if len(executors) > 1:
+            comparison = compare_modes(results)
+            print("\n=== COMPARACIÓN DE MODOS DE EJECUCIÓN ===")
+            for row in comparison:
+                parts = []
+                if "planificacion_ms" in row:
+                    parts.append(
+                        f"análisis/planificación {row['planificacion_ms']:.3f} ms"
+                    )
+                if "conexion_ms" in row:
+                    parts.append(f"conexión {row['conexion_ms']:.3f} ms")
+                if parts:
+                    print(f"{row['nombre']}: {', '.join(parts)}")
+        if cold:
+            cache.update(cold.describe())
+            if cold.os_cache_error:
+                print(
+                    f"Caché del sistema operativo no vaciada ({cold.os_cache_error}):"
+                    " solo shared buffers empieza vacío."
+                )
+        elif steady:
+            cache.update(steady.describe())
+        print("\nDatos de prueba revertidos (cada repetición termina con ROLLBACK).")
     except Exception as e:
+        # Sin archivos de resultados: un CSV truncado se confundiría con uno completo
         print(f"Error: {e}")
+        for executor in executors.values():
+            executor.close()
+        conn.close()
+        sys.exit(1)
 
+    for executor in executors.values():
+        executor.close()
     conn.close()
+
+    if args.output_csv:
+        write_csv(args.output_csv, results)
+        print(f"Resumen CSV guardado en {args.output_csv}")
+    if args.output_json:
+        write_json(
+            args.output_json, args.label, args, results, comparison, sizes, cache
+        )
+        print(f"Resultados JSON guardados en {args.output_json}")
     print("Evaluación completada.")
 
 
@@ -0,0 +1,238 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import psycopg2.extras
+
+from benchmark_stats import percentile
+from db import connect_db, wait_for_db
+
+# Modos de eshopify.metricas_vendedor comparados por el benchmark; "pausado"
+# no mantiene nada y representa el costo de escritura con REFRESH completo
+MODES = ("pausado", "inmediato", "diferido")
+
+# Un INSERT de pedido_item por pedido (OLTP) o uno para todos (carga masiva)
+GRANULARITIES = ("pedido", "lote")
+
+# Diferencias entre las métricas incrementales y las recalculadas desde cero
+DIFERENCIAS_SQL = """
+SELECT COUNT(*)
+FROM v_metricas_vendedor_recalculadas r
+LEFT JOIN metricas_vendedor m ON m.vendedor_id = r.vendedor_id
+WHERE (m.total_pedidos, m.total_items_vendidos, m.ingresos_totales, m.ultima_venta)
+    IS DISTINCT FROM (r.total_pedidos, r.total_items_vendidos, r.ingresos_totales, r.ultima_venta)
+"""
+
+
+def apply_deltas(conn):
+    """Aplicar los deltas pendientes; devuelve (deltas, segundos)"""
+    start = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT aplicar_deltas_metricas_vendedor()")
+        applied = cursor.fetchone()[0]
+    conn.commit()
+    return applied, time.perf_counter() - start
+
+
+def reconcile(conn):
+    """Recalcular las métricas desde cero; devuelve (vendedores corregidos, segundos)"""
+    start = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT reconciliar_metricas_vendedor()")
+        fixed = cursor.fetchone()[0]
+    conn.commit()
+    return fixed, time.perf_counter() - start
+
+
+def fetch_catalog(conn):
+    """Productos activos con precio y pares (usuario, dirección) para generar pedidos"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT producto_id, precio FROM producto WHERE activo ORDER BY producto_id"
+        )
+        products = cursor.fetchall()
+        cursor.execute(
+            "SELECT usuario_id, direccion_id FROM direccion ORDER BY direccion_id"
+        )
+        addresses = cursor.fetchall()
+    conn.rollback()
+    return products, addresses
+
+
+def generate_orders(rng, products, addresses, count):
+    """Pedidos de 1-5 ítems: lista de ((usuario, dirección, subtotal), ítems)"""
+    orders = []
+    for _ in range(count):
+        items = []
+        for product_id, price in rng.sample(products, rng.randint(1, 5)):
+            quantity = rng.randint(1, 3)
+            items.append((product_id, quantity, price, price * quantity))
+        subtotal = sum((item[3] for item in items), Decimal("0"))
+        orders.append((rng.choice(addresses) + (subtotal,), items))
+    return orders
+
+
+def insert_orders(cursor, orders, granularity):
+    """Insertar los pedidos y sus ítems; devuelve los segundos de escritura"""
+    start = time.perf_counter()
+    batch = []
+    for (user_id, address_id, subtotal), items in orders:
+        cursor.execute(
+            "INSERT INTO pedido (usuario_id, direccion_id, estado_pedido_id, monto_subtotal, monto_total) VALUES (%s, %s, 1, %s, %s) RETURNING pedido_id",
+            (user_id, address_id, subtotal, subtotal),
+        )
+        order_id = cursor.fetchone()[0]
+        rows = [(order_id,) + item for item in items]
+        if granularity == "pedido":
+            psycopg2.extras.execute_values(
+                cursor,
+                "INSERT INTO pedido_item (pedido_id, producto_id, cantidad, precio_unitario, subtotal) VALUES %s",
+                rows,
+            )
+        else:
+            batch.extend(rows)
+    if batch:
+        psycopg2.extras.execute_values(
+            cursor,
+            "INSERT INTO pedido_item (pedido_id, producto_id, cantidad, precio_unitario, subtotal) VALUES %s",
+            batch,
+            page_size=len(batch),
+        )
+    return time.perf_counter() - start
+
+
+def measure(conn, orders, mode, granularity):
+    """Escribir los pedidos en un modo y medir la actualización de métricas (con ROLLBACK)"""
+    result = {}
+    with conn.cursor() as cursor:
+        cursor.execute("SET LOCAL eshopify.metricas_vendedor = %s", (mode,))
+        result["escritura"] = insert_orders(cursor, orders, granularity)
+        start = time.perf_counter()
+        if mode == "pausado":
+            cursor.execute("REFRESH MATERIALIZED VIEW mv_metricas_vendedor")
+            result["refresco"] = time.perf_counter() - start
+            start = time.perf_counter()
+            cursor.execute("SELECT reconciliar_metricas_vendedor()")
+            result["reconciliacion"] = time.perf_counter() - start
+        elif mode == "diferido":
+            cursor.execute("SELECT aplicar_deltas_metricas_vendedor()")
+            result["aplicacion"] = time.perf_counter() - start
+        cursor.execute(DIFERENCIAS_SQL)
+        result["diferencias"] = cursor.fetchone()[0]
+    conn.rollback()
+    return result
+
+
+def run_benchmark(conn, orders_per_run, repetitions, seed):
+    """Comparar modos y granularidades; medianas en ms"""
+    products, addresses = fetch_catalog(conn)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM pedido_item")
+        item_rows = cursor.fetchone()[0]
+    conn.rollback()
+
+    rng = random.Random(seed)
+    samples = {}
+    for _ in range(repetitions):
+        orders = generate_orders(rng, products, addresses, orders_per_run)
+        for granularity in GRANULARITIES:
+            for mode in MODES:
+                result = measure(conn, orders, mode, granularity)
+                key = (mode, granularity)
+                for metric, value in result.items():
+                    samples.setdefault(key, {}).setdefault(metric, []).append(value)
+
+    report = []
+    for (mode, granularity), metrics in samples.items():
+        row = {"modo": mode, "granularidad": granularity}
+        for metric, values in metrics.items():
+            if metric == "diferencias":
+                row[metric] = max(values)
+            else:
+                row[f"{metric}_ms"] = percentile(sorted(values), 50) * 1000
+        report.append(row)
+
+    base = {
+        row["granularidad"]: row["escritura_ms"]
+        for row in report
+        if row["modo"] == "pausado"
+    }
+    for row in report:
+        row["sobrecarga_por_pedido_ms"] = (
+            row["escritura_ms"] - base[row["granularidad"]]
+        ) / orders_per_run
+        # Tiempo mínimo hasta que un pedido confirmado aparece en las métricas
+        row["desfase_minimo_ms"] = row.get("refresco_ms", row.get("aplicacion_ms", 0))
+    return {"filas_pedido_item": item_rows, "resultados": report}
+
+
+def parse_args():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Mantenimiento de métricas de vendedores (metricas_vendedor)"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("aplicar", help="aplicar los deltas pendientes (modo diferido)")
+    sub.add_parser("reconciliar", help="recalcular desde cero y corregir diferencias")
+    bench = sub.add_parser(
+        "benchmark", help="costo de escritura y desfase frente a REFRESH completo"
+    )
+    bench.add_argument(
+        "--orders", type=int, default=200, help="pedidos escritos por medición"
+    )
+    bench.add_argument("--repetitions", type=int, default=5, help="repeticiones")
+    bench.add_argument("--seed", type=int, default=42, help="semilla de los pedidos")
+    bench.add_argument("--output-json", help="ruta del JSON de resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not wait_for_db():
+        print("No se pudo conectar a la base de datos.")
+        return
+    conn = connect_db()
+    try:
+        if args.command == "aplicar":
+            applied, elapsed = apply_deltas(conn)
+            print(f"{applied} deltas aplicados en {elapsed * 1000:.1f} ms")
+        elif args.command == "reconciliar":
+            fixed, elapsed = reconcile(conn)
+            print(
+                f"Reconciliación en {elapsed * 1000:.1f} ms: {fixed} vendedores corregidos"
+            )
+        else:
+            report = run_benchmark(conn, args.orders, args.repetitions, args.seed)
+            print(
+                f"\n{report['filas_pedido_item']} filas en pedido_item, {args.orders} pedidos por medición"
+            )
+            for row in report["resultados"]:
+                line = (
+                    f"{row['modo']:>9} / {row['granularidad']:<6}: escritura {row['escritura_ms']:.1f} ms"
+                    f" ({row['sobrecarga_por_pedido_ms']:+.3f} ms/pedido),"
+                    f" desfase mínimo {row['desfase_minimo_ms']:.1f} ms"
+                )
+                if "reconciliacion_ms" in row:
+                    line += f", reconciliación {row['reconciliacion_ms']:.1f} ms"
+                if row["diferencias"]:
+                    line += f" - {row['diferencias']} vendedores con diferencias"
+                print(line)
+            if args.output_json:
+                report["fecha"] = datetime.now().isoformat(timespec="seconds")
+                report["configuracion"] = {
+                    "pedidos": args.orders,
+                    "repeticiones": args.repetitions,
+                    "semilla": args.seed,
+                }
+                with open(args.output_json, "w", encoding="utf-8") as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                print(f"\nResultados JSON guardados en {args.output_json}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import json
+import os
+import re
+
+# Carga de trabajo por defecto, junto a este script
+DEFAULT_WORKLOAD = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "workload.json"
+)
+
+# Palabras de al menos 4 letras de los nombres de producto (términos de búsqueda)
+WORD_PATTERN = re.compile(r"\w{4,}")
+
+
+def load_workload(path=DEFAULT_WORKLOAD):
+    """Leer la definición de consultas y parámetros desde un archivo JSON"""
+    with open(path, encoding="utf-8") as f:
+        workload = json.load(f)
+    benchmarks = workload["consultas"]
+    keys = [benchmark["clave"] for benchmark in benchmarks]
+    duplicated = {key for key in keys if keys.count(key) > 1}
+    if duplicated:
+        raise ValueError(f"claves repetidas en {path}: {', '.join(sorted(duplicated))}")
+    for benchmark in benchmarks:
+        for name, spec in benchmark.get("parametros", {}).items():
+            if spec["tipo"] not in GENERATORS:
+                raise ValueError(
+                    f"{benchmark['clave']}.{name}: tipo de parámetro desconocido {spec['tipo']}"
+                )
+    return benchmarks
+
+
+def default_params(benchmark):
+    """Parámetros fijos ("defecto") de una consulta"""
+    params = {}
+    for name, spec in benchmark.get("parametros", {}).items():
+        if spec["tipo"] == "rango":
+            params[f"{name}_min"], params[f"{name}_max"] = spec["defecto"]
+        else:
+            params[name] = spec["defecto"]
+    return params
+
+
+def split_supported(conn, benchmarks):
+    """(operaciones disponibles, claves omitidas) según el schema de la base
+
+    "requiere" lista columnas tabla.columna que solo existen en algunos
+    schemas (por ejemplo producto.busqueda, del schema optimizado); las
+    operaciones a las que les falta alguna se omiten.
+    """
+    supported, skipped = [], []
+    with conn.cursor() as cursor:
+        for benchmark in benchmarks:
+            available = True
+            for column in benchmark.get("requiere", []):
+                table, _, name = column.partition(".")
+                cursor.execute(
+                    "SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = %s AND NOT attisdropped",
+                    (table, name),
+                )
+                available = available and cursor.fetchone() is not None
+            if available:
+                supported.append(benchmark)
+            else:
+                skipped.append(benchmark["clave"])
+    conn.rollback()
+    return supported, skipped
+
+
+def _sample_value(sampler, name, spec, rng):
+    """Valor de una columna real; repetidos pesan según su frecuencia"""
+    return {name: rng.choice(sampler.values(spec["sql"]))}
+
+
+def _sample_word(sampler, name, spec, rng):
+    """Palabra de un texto real, con formato opcional (p. ej. "%{}%")"""
+    word = rng.choice(sampler.words(spec["sql"]))
+    return {name: spec.get("formato", "{}").format(word)}
+
+
+def _sample_range(sampler, name, spec, rng):
+    """Rango [min, max] entre dos cuantiles separados por "ancho" (0-1)"""
+    values = sampler.values(spec["sql"])
+    width = int(len(values) * spec.get("ancho", 0.1))
+    low = rng.randrange(max(len(values) - width, 1))
+    high = min(low + width, len(values) - 1)
+    return {f"{name}_min": values[low], f"{name}_max": values[high]}
+
+
+def _sample_integer(sampler, name, spec, rng):
+    """Entero uniforme entre "min" y "max" (incluidos)"""
+    return {name: rng.randint(spec["min"], spec["max"])}
+
+
+# Generadores por "tipo" de parámetro
+GENERATORS = {
+    "muestra": _sample_value,
+    "termino": _sample_word,
+    "rango": _sample_range,
+    "entero": _sample_integer,
+}
+
+
+class ParameterSampler:
+    """Valores reales de la base de datos para generar parámetros
+
+    Las consultas "sql" de los parámetros se ejecutan una sola vez y sus
+    resultados se ordenan, de modo que con la misma semilla y los mismos datos
+    se generan siempre los mismos parámetros. Después de prepare() solo se lee
+    la caché, así que el sampler puede compartirse entre hilos.
+    """
+
+    def __init__(self, conn, fixed=False):
+        self.conn = conn
+        self.fixed = fixed
+        self._values = {}
+        self._words = {}
+
+    def values(self, sql):
+        """Valores (ordenados) de la primera columna de sql"""
+        if sql not in self._values:
+            with self.conn.cursor() as cursor:
+                cursor.execute(sql)
+                values = sorted(row[0] for row in cursor if row[0] is not None)
+            self.conn.rollback()
+            if not values:
+                raise ValueError(f"la consulta de parámetros no devolvió filas: {sql}")
+            self._values[sql] = values
+        return self._values[sql]
+
+    def words(self, sql):
+        """Palabras de los textos de sql, con repetición"""
+        if sql not in self._words:
+            words = [
+                word
+                for text in self.values(sql)
+                for word in WORD_PATTERN.findall(text)
+                if not word.isdigit()
+            ]
+            self._words[sql] = sorted(words)
+        return self._words[sql]
+
+    def prepare(self, benchmarks):
+        """Cargar por adelantado los valores de todas las consultas"""
+        if self.fixed:
+            return
+        for benchmark in benchmarks:
+            for spec in benchmark.get("parametros", {}).values():
+                if spec["tipo"] == "termino":
+                    self.words(spec["sql"])
+                elif "sql" in spec:
+                    self.values(spec["sql"])
+
+    def draw(self, benchmark, rng):
+        """Parámetros de una ejecución (los fijos si fixed=True)"""
+        if self.fixed:
+            return default_params(benchmark)
+        params = {}
+        for name, spec in benchmark.get("parametros", {}).items():
+            params.update(GENERATORS[spec["tipo"]](self, name, spec, rng))
+        return params
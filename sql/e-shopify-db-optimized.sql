@@ -4,7 +4,11 @@
 -- Este archivo contiene la estructura base más las optimizaciones implementadas:
 -- - Índices compuestos para consultas frecuentes.
 -- - Desnormalización controlada (promedio de calificaciones).
+-- - Búsqueda de productos: trigramas (pg_trgm) y texto completo (tsvector).
 -- - Vista materializada para reportes.
+-- - Métricas de vendedores con mantenimiento incremental (deltas).
+-- - Notificación de cambios del catálogo para invalidar cachés (LISTEN/NOTIFY).
+-- - Particionamiento mensual opcional de pedidos (psql -v particionado=on).
 -- ============================================================================
 
 -- Crear la base de datos (si no existe)
@@ -13,6 +17,13 @@ CREATE DATABASE IF NOT EXISTS e_shopify_db;
 -- Conectar a la base de datos
 \c e_shopify_db;
 
+-- Variante particionada opcional: psql -v particionado=on particiona por mes
+-- pedido, historial_estado_pedido y notificacion (ver PARTICIONAMIENTO)
+\if :{?particionado}
+\else
+\set particionado off
+\endif
+
 -- ============================================================================
 -- ESTRUCTURA BASE (De e-shopify-db.sql original)
 -- ============================================================================
@@ -167,7 +178,11 @@ CREATE TABLE IF NOT EXISTS carrito_item (
 );
 
 CREATE TABLE IF NOT EXISTS pedido (
+\if :particionado
+    pedido_id SERIAL,
+\else
     pedido_id SERIAL PRIMARY KEY,
+\endif
     usuario_id INT NOT NULL,
     direccion_id INT NOT NULL,
     estado_pedido_id INT NOT NULL,
@@ -184,7 +199,13 @@ CREATE TABLE IF NOT EXISTS pedido (
     CONSTRAINT chk_monto_impuesto CHECK (monto_impuesto >= 0),
     CONSTRAINT chk_monto_envio CHECK (monto_envio >= 0),
     CONSTRAINT chk_monto_total CHECK (monto_total >= 0)
+\if :particionado
+    -- La clave primaria de una tabla particionada debe incluir la columna de partición
+    , CONSTRAINT pk_pedido PRIMARY KEY (pedido_id, fecha_pedido)
+) PARTITION BY RANGE (fecha_pedido);
+\else
 );
+\endif
 
 CREATE TABLE IF NOT EXISTS pedido_item (
     pedido_item_id SERIAL PRIMARY KEY,
@@ -193,7 +214,11 @@ CREATE TABLE IF NOT EXISTS pedido_item (
     cantidad INT NOT NULL,
     precio_unitario DECIMAL(10, 2) NOT NULL,
     subtotal DECIMAL(10, 2) NOT NULL,
+\if :particionado
+    -- Sin FK a pedido (su clave incluye fecha_pedido): trg_borrar_dependientes_pedido hace el CASCADE
+\else
     CONSTRAINT fk_pedido_item_pedido FOREIGN KEY (pedido_id) REFERENCES pedido(pedido_id) ON DELETE CASCADE,
+\endif
     CONSTRAINT fk_pedido_item_producto FOREIGN KEY (producto_id) REFERENCES producto(producto_id),
     CONSTRAINT chk_cantidad_pedido_item CHECK (cantidad > 0),
     CONSTRAINT chk_precio_unitario_pedido_item CHECK (precio_unitario > 0),
@@ -209,14 +234,22 @@ CREATE TABLE IF NOT EXISTS pago (
     fecha_pago TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     referencia_pago VARCHAR(100),
     fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+\if :particionado
+    -- Sin FK a pedido (su clave incluye fecha_pedido): trg_borrar_dependientes_pedido hace el CASCADE
+\else
     CONSTRAINT fk_pago_pedido FOREIGN KEY (pedido_id) REFERENCES pedido(pedido_id) ON DELETE CASCADE,
+\endif
     CONSTRAINT fk_pago_metodo FOREIGN KEY (metodo_pago_id) REFERENCES metodo_pago(metodo_pago_id),
     CONSTRAINT fk_pago_estado FOREIGN KEY (estado_pago_id) REFERENCES estado_pago(estado_pago_id),
     CONSTRAINT chk_monto_pago CHECK (monto > 0)
 );
 
 CREATE TABLE IF NOT EXISTS notificacion (
+\if :particionado
+    notificacion_id SERIAL,
+\else
     notificacion_id SERIAL PRIMARY KEY,
+\endif
     usuario_id INT NOT NULL,
     tipo VARCHAR(50) NOT NULL,
     asunto VARCHAR(255) NOT NULL,
@@ -228,21 +261,39 @@ CREATE TABLE IF NOT EXISTS notificacion (
     CONSTRAINT chk_tipo_notificacion CHECK (tipo IN ('PEDIDO', 'PAGO', 'PRODUCTO', 'RESENA', 'SISTEMA')),
     CONSTRAINT chk_asunto CHECK (asunto != ''),
     CONSTRAINT chk_mensaje CHECK (mensaje != '')
+\if :particionado
+    , CONSTRAINT pk_notificacion PRIMARY KEY (notificacion_id, fecha_creacion)
+) PARTITION BY RANGE (fecha_creacion);
+\else
 );
+\endif
 
 CREATE TABLE IF NOT EXISTS historial_estado_pedido (
+\if :particionado
+    historial_id SERIAL,
+\else
     historial_id SERIAL PRIMARY KEY,
+\endif
     pedido_id INT NOT NULL,
     estado_anterior_id INT,
     estado_nuevo_id INT NOT NULL,
     fecha_cambio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     usuario_id INT,
     razon TEXT,
+\if :particionado
+    -- Sin FK a pedido (su clave incluye fecha_pedido): trg_borrar_dependientes_pedido hace el CASCADE
+\else
     CONSTRAINT fk_historial_pedido FOREIGN KEY (pedido_id) REFERENCES pedido(pedido_id) ON DELETE CASCADE,
+\endif
     CONSTRAINT fk_historial_estado_anterior FOREIGN KEY (estado_anterior_id) REFERENCES estado_pedido(estado_pedido_id),
     CONSTRAINT fk_historial_estado_nuevo FOREIGN KEY (estado_nuevo_id) REFERENCES estado_pedido(estado_pedido_id),
     CONSTRAINT fk_historial_usuario FOREIGN KEY (usuario_id) REFERENCES usuario(usuario_id) ON DELETE SET NULL
+\if :particionado
+    , CONSTRAINT pk_historial_estado_pedido PRIMARY KEY (historial_id, fecha_cambio)
+) PARTITION BY RANGE (fecha_cambio);
+\else
 );
+\endif
 
 -- ============================================================================
 -- ÍNDICES ORIGINALES (De e-shopify-db.sql)
@@ -260,37 +311,259 @@ CREATE INDEX IF NOT EXISTS idx_carrito_usuario ON carrito(usuario_id);
 CREATE INDEX IF NOT EXISTS idx_notificacion_usuario ON notificacion(usuario_id);
 CREATE INDEX IF NOT EXISTS idx_notificacion_leida ON notificacion(leida);
 
+-- ============================================================================
+-- PARTICIONAMIENTO (variante opcional: psql -v particionado=on)
+-- ============================================================================
+-- pedido, historial_estado_pedido y notificacion solo crecen: particionadas
+-- por mes, las consultas acotadas por fecha leen solo las particiones del
+-- rango (partition pruning) y archivar un mes es un DETACH, sin DELETE masivo
+-- ni VACUUM posterior. Las particiones se crean con anticipación: sin
+-- partición DEFAULT, insertar fuera de rango es un error.
+
+-- Crear las particiones mensuales que falten entre dos fechas (tabla_AAAA_MM)
+CREATE OR REPLACE FUNCTION crear_particiones_mensuales(tabla TEXT, desde TIMESTAMP, hasta TIMESTAMP)
+RETURNS INT AS $$
+DECLARE
+    mes TIMESTAMP := date_trunc('month', desde);
+    particion TEXT;
+    creadas INT := 0;
+BEGIN
+    WHILE mes <= hasta LOOP
+        particion := format('%s_%s', tabla, to_char(mes, 'YYYY_MM'));
+        IF to_regclass(particion) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                particion, tabla, mes, mes + INTERVAL '1 month'
+            );
+            creadas := creadas + 1;
+        END IF;
+        mes := mes + INTERVAL '1 month';
+    END LOOP;
+    RETURN creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Particiones de las tablas particionadas con sus límites y tamaño
+CREATE OR REPLACE VIEW v_particiones AS
+SELECT
+    padre.relname as tabla,
+    hija.relname as particion,
+    (regexp_match(pg_get_expr(hija.relpartbound, hija.oid), 'FROM \(''([^'']+)''\)'))[1]::TIMESTAMP as desde,
+    (regexp_match(pg_get_expr(hija.relpartbound, hija.oid), 'TO \(''([^'']+)''\)'))[1]::TIMESTAMP as hasta,
+    GREATEST(hija.reltuples, 0)::BIGINT as filas_estimadas,
+    pg_total_relation_size(hija.oid) as bytes
+FROM pg_inherits i
+JOIN pg_class padre ON padre.oid = i.inhparent
+JOIN pg_class hija ON hija.oid = i.inhrelid
+WHERE padre.relkind = 'p' AND hija.relkind = 'r';
+
+-- Archivar las particiones que terminan antes de una fecha: DETACH y renombrar
+-- a archivo_<particion> (o DROP si eliminar); devuelve cuántas se archivaron.
+-- DETACH y DROP no disparan trg_borrar_dependientes_pedido: los pedido_item y
+-- pago de cada partición de pedido se mueven antes a archivo_pedido_item_AAAA_MM
+-- y archivo_pago_AAAA_MM (o se borran), con las métricas de vendedores
+-- diferidas y aplicadas una sola vez al final. historial_estado_pedido se
+-- archiva por sus propias particiones.
+CREATE OR REPLACE FUNCTION desasociar_particiones(tabla TEXT, antes_de TIMESTAMP, eliminar BOOLEAN DEFAULT FALSE)
+RETURNS INT AS $$
+DECLARE
+    p RECORD;
+    dependiente TEXT;
+    archivo TEXT;
+    archivadas INT := 0;
+    modo TEXT := COALESCE(NULLIF(current_setting('eshopify.metricas_vendedor', true), ''), 'inmediato');
+BEGIN
+    IF tabla = 'pedido' AND modo = 'inmediato' THEN
+        PERFORM set_config('eshopify.metricas_vendedor', 'diferido', true);
+    END IF;
+    FOR p IN
+        SELECT particion FROM v_particiones
+        WHERE v_particiones.tabla = desasociar_particiones.tabla AND hasta <= antes_de
+        ORDER BY desde
+    LOOP
+        IF tabla = 'pedido' THEN
+            FOREACH dependiente IN ARRAY ARRAY['pedido_item', 'pago'] LOOP
+                IF eliminar THEN
+                    EXECUTE format(
+                        'DELETE FROM %I WHERE pedido_id IN (SELECT pedido_id FROM %I)',
+                        dependiente, p.particion
+                    );
+                ELSE
+                    archivo := 'archivo_' || dependiente || substr(p.particion, length(tabla) + 1);
+                    EXECUTE format('CREATE TABLE %I (LIKE %I)', archivo, dependiente);
+                    EXECUTE format(
+                        'WITH movidas AS (DELETE FROM %I WHERE pedido_id IN (SELECT pedido_id FROM %I) RETURNING *)
+                         INSERT INTO %I SELECT * FROM movidas',
+                        dependiente, p.particion, archivo
+                    );
+                END IF;
+            END LOOP;
+        END IF;
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', tabla, p.particion);
+        IF eliminar THEN
+            EXECUTE format('DROP TABLE %I', p.particion);
+        ELSE
+            EXECUTE format('ALTER TABLE %I RENAME TO %I', p.particion, 'archivo_' || p.particion);
+        END IF;
+        archivadas := archivadas + 1;
+    END LOOP;
+    IF tabla = 'pedido' AND modo = 'inmediato' THEN
+        PERFORM set_config('eshopify.metricas_vendedor', 'inmediato', true);
+        PERFORM aplicar_deltas_metricas_vendedor();
+    END IF;
+    RETURN archivadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ON DELETE CASCADE de pedido en la variante particionada (sin FK a pedido)
+CREATE OR REPLACE FUNCTION borrar_dependientes_pedido()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM pedido_item WHERE pedido_id IN (SELECT pedido_id FROM filas_viejas);
+    DELETE FROM pago WHERE pedido_id IN (SELECT pedido_id FROM filas_viejas);
+    DELETE FROM historial_estado_pedido WHERE pedido_id IN (SELECT pedido_id FROM filas_viejas);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+\if :particionado
+DROP TRIGGER IF EXISTS trg_borrar_dependientes_pedido ON pedido;
+CREATE TRIGGER trg_borrar_dependientes_pedido
+AFTER DELETE ON pedido
+REFERENCING OLD TABLE AS filas_viejas
+FOR EACH STATEMENT
+EXECUTE FUNCTION borrar_dependientes_pedido();
+
+-- Particiones iniciales: el último año y los próximos 3 meses (populate_db.py
+-- crea además las del rango de fechas que genera)
+SELECT tabla, crear_particiones_mensuales(tabla, LOCALTIMESTAMP - INTERVAL '12 months', LOCALTIMESTAMP + INTERVAL '3 months')
+FROM unnest(ARRAY['pedido', 'historial_estado_pedido', 'notificacion']) as tabla;
+\endif
+
 -- ============================================================================
 -- OPTIMIZACIONES (PASO 4, 5 Y 6)
 -- ============================================================================
 
 -- Índices compuestos para consultas frecuentes
 CREATE INDEX IF NOT EXISTS idx_producto_categoria_precio ON producto(categoria_id, precio DESC);
-CREATE INDEX IF NOT EXISTS idx_pedido_usuario_fecha ON pedido(usuario_id, fecha_pedido DESC);
+-- pedido_id desempata fechas iguales: la paginación por keyset (order_history.py)
+-- busca (fecha_pedido, pedido_id) < (cursor) sin releer las páginas anteriores
+CREATE INDEX IF NOT EXISTS idx_pedido_usuario_fecha ON pedido(usuario_id, fecha_pedido DESC, pedido_id DESC);
+-- Ítems de una página de pedidos (y el ON DELETE CASCADE desde pedido)
+CREATE INDEX IF NOT EXISTS idx_pedido_item_pedido ON pedido_item(pedido_id);
 CREATE INDEX IF NOT EXISTS idx_producto_nombre_lower ON producto(lower(nombre));
 
+-- Búsqueda de productos
+-- Un B-tree no sirve para LIKE '%texto%' (comodín al inicio): los índices GIN
+-- de trigramas resuelven LIKE/ILIKE por subcadena y la similitud con errores
+-- de tipeo; la columna busqueda (nombre con peso A, descripción con peso B)
+-- resuelve la búsqueda de texto completo con ranking y prefijos
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_producto_nombre_trgm ON producto USING GIN (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_producto_descripcion_trgm ON producto USING GIN (descripcion gin_trgm_ops);
+ALTER TABLE producto ADD COLUMN IF NOT EXISTS busqueda TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('spanish', COALESCE(nombre, '')), 'A') ||
+    setweight(to_tsvector('spanish', COALESCE(descripcion, '')), 'B')
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_producto_busqueda ON producto USING GIN (busqueda);
+
 -- Desnormalización: Agregar columnas para promedio de calificaciones
 ALTER TABLE producto ADD COLUMN IF NOT EXISTS promedio_calificacion DECIMAL(3, 2) DEFAULT 0;
 ALTER TABLE producto ADD COLUMN IF NOT EXISTS total_resenas INT DEFAULT 0;
+-- Suma acumulada de calificaciones: el promedio se ajusta en O(1) sin releer las reseñas
+ALTER TABLE producto ADD COLUMN IF NOT EXISTS suma_calificaciones BIGINT DEFAULT 0;
 
 -- Función para actualizar promedio
+-- Se dispara una vez por sentencia y ajusta suma y conteo en O(1) por
+-- producto con las tablas de transición, sin releer las reseñas: una carga
+-- masiva actualiza cada producto una sola vez. Las filas viejas (UPDATE o
+-- DELETE) restan de su producto y las nuevas suman. Antes de actualizar se
+-- bloquean las filas de producto con SELECT ... ORDER BY producto_id FOR NO
+-- KEY UPDATE: el orden de un UPDATE ... FROM depende del plan (un hash join
+-- no lo respeta), así que solo así cargas concurrentes las bloquean en el
+-- mismo orden y no se producen deadlocks.
 CREATE OR REPLACE FUNCTION actualizar_promedio_calificacion()
 RETURNS TRIGGER AS $$
 BEGIN
-    UPDATE producto
-    SET
-        promedio_calificacion = (SELECT COALESCE(AVG(calificacion), 0) FROM resena WHERE producto_id = NEW.producto_id),
-        total_resenas = (SELECT COUNT(*) FROM resena WHERE producto_id = NEW.producto_id)
-    WHERE producto_id = NEW.producto_id;
-    RETURN NEW;
+    IF TG_OP = 'DELETE' THEN
+        PERFORM 1 FROM producto
+        WHERE producto_id IN (SELECT producto_id FROM filas_viejas)
+        ORDER BY producto_id
+        FOR NO KEY UPDATE;
+    ELSIF TG_OP = 'INSERT' THEN
+        PERFORM 1 FROM producto
+        WHERE producto_id IN (SELECT producto_id FROM filas_nuevas)
+        ORDER BY producto_id
+        FOR NO KEY UPDATE;
+    ELSE
+        PERFORM 1 FROM producto
+        WHERE producto_id IN (
+            SELECT producto_id FROM filas_viejas
+            UNION
+            SELECT producto_id FROM filas_nuevas
+        )
+        ORDER BY producto_id
+        FOR NO KEY UPDATE;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE producto p
+        SET
+            suma_calificaciones = p.suma_calificaciones + d.suma,
+            total_resenas = p.total_resenas + d.total,
+            promedio_calificacion = CASE
+                WHEN p.total_resenas + d.total > 0
+                THEN ROUND((p.suma_calificaciones + d.suma)::DECIMAL / (p.total_resenas + d.total), 2)
+                ELSE 0
+            END
+        FROM (
+            SELECT producto_id, -SUM(calificacion) as suma, -COUNT(*) as total
+            FROM filas_viejas
+            GROUP BY producto_id
+        ) d
+        WHERE p.producto_id = d.producto_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE producto p
+        SET
+            suma_calificaciones = p.suma_calificaciones + d.suma,
+            total_resenas = p.total_resenas + d.total,
+            promedio_calificacion = CASE
+                WHEN p.total_resenas + d.total > 0
+                THEN ROUND((p.suma_calificaciones + d.suma)::DECIMAL / (p.total_resenas + d.total), 2)
+                ELSE 0
+            END
+        FROM (
+            SELECT producto_id, SUM(calificacion) as suma, COUNT(*) as total
+            FROM filas_nuevas
+            GROUP BY producto_id
+        ) d
+        WHERE p.producto_id = d.producto_id;
+    END IF;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
--- Trigger para mantener consistencia
+-- Triggers para mantener consistencia (uno por evento: cada uno declara sus tablas de transición)
 DROP TRIGGER IF EXISTS trg_actualizar_calificacion ON resena;
-CREATE TRIGGER trg_actualizar_calificacion
-AFTER INSERT OR UPDATE OR DELETE ON resena
-FOR EACH ROW
+DROP TRIGGER IF EXISTS trg_actualizar_calificacion_insert ON resena;
+CREATE TRIGGER trg_actualizar_calificacion_insert
+AFTER INSERT ON resena
+REFERENCING NEW TABLE AS filas_nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_promedio_calificacion();
+
+DROP TRIGGER IF EXISTS trg_actualizar_calificacion_update ON resena;
+CREATE TRIGGER trg_actualizar_calificacion_update
+AFTER UPDATE ON resena
+REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_promedio_calificacion();
+
+DROP TRIGGER IF EXISTS trg_actualizar_calificacion_delete ON resena;
+CREATE TRIGGER trg_actualizar_calificacion_delete
+AFTER DELETE ON resena
+REFERENCING OLD TABLE AS filas_viejas
+FOR EACH STATEMENT
 EXECUTE FUNCTION actualizar_promedio_calificacion();
 
 -- Vista materializada para reportes de vendedores
@@ -311,6 +584,325 @@ GROUP BY v.vendedor_id, v.nombre_tienda;
 -- Índice en la vista materializada
 CREATE INDEX IF NOT EXISTS idx_mv_metricas_ingresos ON mv_metricas_vendedor(ingresos_totales DESC);
 
+-- Métricas de vendedores con mantenimiento incremental
+-- mv_metricas_vendedor solo se actualiza con un REFRESH completo, cuyo costo
+-- crece con todo el historial de pedidos. metricas_vendedor guarda los mismos
+-- agregados y los ajusta con los cambios (deltas) de pedido_item y pedido.
+-- Modo por sesión/transacción con SET eshopify.metricas_vendedor:
+--   'inmediato' (por defecto): cada sentencia aplica sus deltas al terminar
+--   'diferido': solo se registran deltas; aplicar_deltas_metricas_vendedor() los aplica por lotes
+--   'pausado': no se registra nada; requiere reconciliar_metricas_vendedor() después
+CREATE TABLE IF NOT EXISTS metricas_vendedor (
+    vendedor_id INT PRIMARY KEY,
+    total_pedidos INT NOT NULL DEFAULT 0,
+    total_items_vendidos BIGINT NOT NULL DEFAULT 0,
+    ingresos_totales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    ultima_venta TIMESTAMP,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_metricas_vendedor FOREIGN KEY (vendedor_id) REFERENCES vendedor(vendedor_id) ON DELETE CASCADE
+);
+
+-- Ítems de cada vendedor por pedido, para contar pedidos distintos sin COUNT(DISTINCT)
+CREATE TABLE IF NOT EXISTS metricas_vendedor_pedido (
+    vendedor_id INT NOT NULL,
+    pedido_id INT NOT NULL,
+    items INT NOT NULL,
+    PRIMARY KEY (vendedor_id, pedido_id)
+);
+CREATE INDEX IF NOT EXISTS idx_metricas_vendedor_pedido_vacios ON metricas_vendedor_pedido(items) WHERE items <= 0;
+
+-- Cambios pendientes de aplicar (items = +1 alta, -1 baja, 0 cambio de fecha)
+CREATE TABLE IF NOT EXISTS metricas_vendedor_delta (
+    vendedor_id INT NOT NULL,
+    pedido_id INT NOT NULL,
+    items INT NOT NULL,
+    cantidad INT NOT NULL,
+    subtotal DECIMAL(10, 2) NOT NULL,
+    fecha_pedido TIMESTAMP,
+    fecha_registro TIMESTAMP DEFAULT clock_timestamp()
+);
+
+-- Métricas calculadas desde cero (misma definición que mv_metricas_vendedor)
+CREATE OR REPLACE VIEW v_metricas_vendedor_recalculadas AS
+SELECT
+    v.vendedor_id,
+    COUNT(DISTINCT pi.pedido_id)::INT as total_pedidos,
+    COALESCE(SUM(pi.cantidad), 0) as total_items_vendidos,
+    COALESCE(SUM(pi.subtotal), 0) as ingresos_totales,
+    MAX(p.fecha_pedido) as ultima_venta
+FROM vendedor v
+LEFT JOIN producto pr ON v.vendedor_id = pr.vendedor_id
+LEFT JOIN pedido_item pi ON pr.producto_id = pi.producto_id
+LEFT JOIN pedido p ON pi.pedido_id = p.pedido_id
+GROUP BY v.vendedor_id;
+
+-- Reemplazo de mv_metricas_vendedor siempre actualizado
+CREATE OR REPLACE VIEW v_metricas_vendedor AS
+SELECT
+    v.vendedor_id,
+    v.nombre_tienda,
+    COALESCE(m.total_pedidos, 0) as total_pedidos,
+    COALESCE(m.total_items_vendidos, 0) as total_items_vendidos,
+    COALESCE(m.ingresos_totales, 0) as ingresos_totales,
+    m.ultima_venta
+FROM vendedor v
+LEFT JOIN metricas_vendedor m ON v.vendedor_id = m.vendedor_id;
+
+-- Aplicar (y consumir) los deltas pendientes; devuelve cuántos se aplicaron
+CREATE OR REPLACE FUNCTION aplicar_deltas_metricas_vendedor()
+RETURNS INT AS $$
+DECLARE
+    aplicados INT;
+    recalcular INT[];
+BEGIN
+    WITH consumidos AS (
+        DELETE FROM metricas_vendedor_delta RETURNING *
+    ),
+    por_pedido AS (
+        SELECT vendedor_id, pedido_id, SUM(items) as items
+        FROM consumidos
+        GROUP BY vendedor_id, pedido_id
+    ),
+    antes AS (
+        SELECT pp.vendedor_id, pp.items, COALESCE(mvp.items, 0) as items_antes
+        FROM por_pedido pp
+        LEFT JOIN metricas_vendedor_pedido mvp
+            ON mvp.vendedor_id = pp.vendedor_id AND mvp.pedido_id = pp.pedido_id
+    ),
+    pares AS (
+        INSERT INTO metricas_vendedor_pedido (vendedor_id, pedido_id, items)
+        SELECT vendedor_id, pedido_id, items
+        FROM por_pedido
+        WHERE items <> 0
+        ORDER BY vendedor_id, pedido_id
+        ON CONFLICT (vendedor_id, pedido_id)
+        DO UPDATE SET items = metricas_vendedor_pedido.items + EXCLUDED.items
+    ),
+    pedidos AS (
+        SELECT
+            vendedor_id,
+            SUM(CASE
+                WHEN items_antes <= 0 AND items_antes + items > 0 THEN 1
+                WHEN items_antes > 0 AND items_antes + items <= 0 THEN -1
+                ELSE 0
+            END) as total_pedidos
+        FROM antes
+        GROUP BY vendedor_id
+    ),
+    por_vendedor AS (
+        SELECT
+            c.vendedor_id,
+            COALESCE(MAX(pe.total_pedidos), 0) as total_pedidos,
+            SUM(c.cantidad) as total_items_vendidos,
+            SUM(c.subtotal) as ingresos_totales,
+            MAX(c.fecha_pedido) FILTER (WHERE c.items > 0) as ultima_venta,
+            -- Bajas y cambios de fecha pueden reducir MAX(fecha_pedido)
+            bool_or(c.items <= 0) as recalcular
+        FROM consumidos c
+        LEFT JOIN pedidos pe ON pe.vendedor_id = c.vendedor_id
+        GROUP BY c.vendedor_id
+    ),
+    actualizados AS (
+        INSERT INTO metricas_vendedor (vendedor_id, total_pedidos, total_items_vendidos, ingresos_totales, ultima_venta)
+        SELECT vendedor_id, total_pedidos, total_items_vendidos, ingresos_totales, ultima_venta
+        FROM por_vendedor
+        ORDER BY vendedor_id
+        ON CONFLICT (vendedor_id) DO UPDATE SET
+            total_pedidos = metricas_vendedor.total_pedidos + EXCLUDED.total_pedidos,
+            total_items_vendidos = metricas_vendedor.total_items_vendidos + EXCLUDED.total_items_vendidos,
+            ingresos_totales = metricas_vendedor.ingresos_totales + EXCLUDED.ingresos_totales,
+            ultima_venta = GREATEST(metricas_vendedor.ultima_venta, EXCLUDED.ultima_venta),
+            fecha_actualizacion = CURRENT_TIMESTAMP
+        RETURNING vendedor_id
+    )
+    SELECT
+        (SELECT COUNT(*) FROM consumidos),
+        (SELECT array_agg(pv.vendedor_id) FROM por_vendedor pv JOIN actualizados a ON a.vendedor_id = pv.vendedor_id WHERE pv.recalcular)
+    INTO aplicados, recalcular;
+
+    IF recalcular IS NOT NULL THEN
+        DELETE FROM metricas_vendedor_pedido WHERE items <= 0;
+        UPDATE metricas_vendedor m
+        SET ultima_venta = (
+            SELECT MAX(p.fecha_pedido)
+            FROM metricas_vendedor_pedido mvp
+            JOIN pedido p ON p.pedido_id = mvp.pedido_id
+            WHERE mvp.vendedor_id = m.vendedor_id
+        )
+        WHERE m.vendedor_id = ANY(recalcular);
+    END IF;
+    RETURN aplicados;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Registrar los deltas de pedido_item (un disparo por sentencia, con tablas de transición)
+CREATE OR REPLACE FUNCTION registrar_deltas_pedido_item()
+RETURNS TRIGGER AS $$
+DECLARE
+    modo TEXT := COALESCE(NULLIF(current_setting('eshopify.metricas_vendedor', true), ''), 'inmediato');
+BEGIN
+    IF modo = 'pausado' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO metricas_vendedor_delta (vendedor_id, pedido_id, items, cantidad, subtotal, fecha_pedido)
+        SELECT pr.vendedor_id, o.pedido_id, -1, -o.cantidad, -o.subtotal, NULL
+        FROM filas_viejas o
+        JOIN producto pr ON pr.producto_id = o.producto_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO metricas_vendedor_delta (vendedor_id, pedido_id, items, cantidad, subtotal, fecha_pedido)
+        SELECT pr.vendedor_id, n.pedido_id, 1, n.cantidad, n.subtotal, p.fecha_pedido
+        FROM filas_nuevas n
+        JOIN producto pr ON pr.producto_id = n.producto_id
+        JOIN pedido p ON p.pedido_id = n.pedido_id;
+    END IF;
+    IF modo = 'inmediato' THEN
+        PERFORM aplicar_deltas_metricas_vendedor();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_metricas_pedido_item_insert ON pedido_item;
+CREATE TRIGGER trg_metricas_pedido_item_insert
+AFTER INSERT ON pedido_item
+REFERENCING NEW TABLE AS filas_nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION registrar_deltas_pedido_item();
+
+DROP TRIGGER IF EXISTS trg_metricas_pedido_item_update ON pedido_item;
+CREATE TRIGGER trg_metricas_pedido_item_update
+AFTER UPDATE ON pedido_item
+REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION registrar_deltas_pedido_item();
+
+DROP TRIGGER IF EXISTS trg_metricas_pedido_item_delete ON pedido_item;
+CREATE TRIGGER trg_metricas_pedido_item_delete
+AFTER DELETE ON pedido_item
+REFERENCING OLD TABLE AS filas_viejas
+FOR EACH STATEMENT
+EXECUTE FUNCTION registrar_deltas_pedido_item();
+
+-- Cambios de fecha_pedido: pueden mover ultima_venta de los vendedores del pedido
+CREATE OR REPLACE FUNCTION registrar_deltas_pedido()
+RETURNS TRIGGER AS $$
+DECLARE
+    modo TEXT := COALESCE(NULLIF(current_setting('eshopify.metricas_vendedor', true), ''), 'inmediato');
+BEGIN
+    IF modo = 'pausado' THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO metricas_vendedor_delta (vendedor_id, pedido_id, items, cantidad, subtotal, fecha_pedido)
+    SELECT DISTINCT pr.vendedor_id, n.pedido_id, 0, 0, 0, n.fecha_pedido
+    FROM filas_nuevas n
+    JOIN filas_viejas o ON o.pedido_id = n.pedido_id
+    JOIN pedido_item pi ON pi.pedido_id = n.pedido_id
+    JOIN producto pr ON pr.producto_id = pi.producto_id
+    WHERE n.fecha_pedido IS DISTINCT FROM o.fecha_pedido;
+    IF FOUND AND modo = 'inmediato' THEN
+        PERFORM aplicar_deltas_metricas_vendedor();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_metricas_pedido_update ON pedido;
+CREATE TRIGGER trg_metricas_pedido_update
+AFTER UPDATE ON pedido
+REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION registrar_deltas_pedido();
+
+-- Reconciliación: recalcular desde cero y corregir lo que no coincida
+-- (p. ej. tras el modo 'pausado' o si un producto cambia de vendedor).
+-- Bloquea las escrituras en pedido/pedido_item mientras se ejecuta.
+-- Devuelve cuántos vendedores tenían métricas incorrectas.
+CREATE OR REPLACE FUNCTION reconciliar_metricas_vendedor()
+RETURNS INT AS $$
+DECLARE
+    corregidos INT;
+BEGIN
+    LOCK TABLE pedido, pedido_item IN SHARE MODE;
+    DELETE FROM metricas_vendedor_delta;
+
+    DELETE FROM metricas_vendedor_pedido;
+    INSERT INTO metricas_vendedor_pedido (vendedor_id, pedido_id, items)
+    SELECT pr.vendedor_id, pi.pedido_id, COUNT(*)
+    FROM pedido_item pi
+    JOIN producto pr ON pr.producto_id = pi.producto_id
+    GROUP BY pr.vendedor_id, pi.pedido_id;
+
+    WITH corregidos AS (
+        INSERT INTO metricas_vendedor (vendedor_id, total_pedidos, total_items_vendidos, ingresos_totales, ultima_venta)
+        SELECT r.vendedor_id, r.total_pedidos, r.total_items_vendidos, r.ingresos_totales, r.ultima_venta
+        FROM v_metricas_vendedor_recalculadas r
+        LEFT JOIN metricas_vendedor m ON m.vendedor_id = r.vendedor_id
+        WHERE m.vendedor_id IS NULL
+           OR (m.total_pedidos, m.total_items_vendidos, m.ingresos_totales, m.ultima_venta)
+              IS DISTINCT FROM (r.total_pedidos, r.total_items_vendidos, r.ingresos_totales, r.ultima_venta)
+        ON CONFLICT (vendedor_id) DO UPDATE SET
+            total_pedidos = EXCLUDED.total_pedidos,
+            total_items_vendidos = EXCLUDED.total_items_vendidos,
+            ingresos_totales = EXCLUDED.ingresos_totales,
+            ultima_venta = EXCLUDED.ultima_venta,
+            fecha_actualizacion = CURRENT_TIMESTAMP
+        RETURNING vendedor_id
+    )
+    SELECT COUNT(*) INTO corregidos FROM corregidos;
+    RETURN corregidos;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Invalidación de cachés de aplicación (query_cache.py)
+-- Cada sentencia que modifica una tabla del catálogo envía un NOTIFY por el
+-- canal cambios_catalogo con la tabla y el instante de la sentencia. Postgres
+-- entrega la notificación solo si la transacción confirma, así que un ROLLBACK
+-- no invalida nada. Por sentencia y no por fila: una carga masiva notifica
+-- una vez por lote.
+CREATE OR REPLACE FUNCTION notificar_cambio_catalogo()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('cambios_catalogo', json_build_object(
+        'tabla', TG_TABLE_NAME,
+        'operacion', TG_OP,
+        'instante', extract(epoch FROM clock_timestamp())
+    )::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notificar_cambios_producto ON producto;
+CREATE TRIGGER trg_notificar_cambios_producto
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON producto
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_cambio_catalogo();
+
+DROP TRIGGER IF EXISTS trg_notificar_cambios_categoria ON categoria;
+CREATE TRIGGER trg_notificar_cambios_categoria
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON categoria
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_cambio_catalogo();
+
+DROP TRIGGER IF EXISTS trg_notificar_cambios_vendedor ON vendedor;
+CREATE TRIGGER trg_notificar_cambios_vendedor
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON vendedor
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_cambio_catalogo();
+
+DROP TRIGGER IF EXISTS trg_notificar_cambios_resena ON resena;
+CREATE TRIGGER trg_notificar_cambios_resena
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON resena
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_cambio_catalogo();
+
+DROP TRIGGER IF EXISTS trg_notificar_cambios_pedido_item ON pedido_item;
+CREATE TRIGGER trg_notificar_cambios_pedido_item
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pedido_item
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_cambio_catalogo();
+
 -- ============================================================================
 -- DATOS DE PRUEBA (Iguales al original)
 -- ============================================================================
@@ -505,8 +1097,12 @@ ON CONFLICT DO NOTHING;
 -- Recálculo inicial de promedios (después de insertar datos)
 UPDATE producto p
 SET
-    promedio_calificacion = (SELECT COALESCE(AVG(calificacion), 0) FROM resena r WHERE r.producto_id = p.producto_id),
-    total_resenas = (SELECT COUNT(*) FROM resena r WHERE r.producto_id = p.producto_id);
+    promedio_calificacion = (SELECT COALESCE(ROUND(AVG(calificacion), 2), 0) FROM resena r WHERE r.producto_id = p.producto_id),
+    total_resenas = (SELECT COUNT(*) FROM resena r WHERE r.producto_id = p.producto_id),
+    suma_calificaciones = (SELECT COALESCE(SUM(calificacion), 0) FROM resena r WHERE r.producto_id = p.producto_id);
+
+-- Métricas iniciales de vendedores (incluye los que aún no tienen ventas)
+SELECT reconciliar_metricas_vendedor();
 
 -- ============================================================================
 -- CONSULTAS DE VALIDACIÓN OPTIMIZADAS
@@ -526,11 +1122,19 @@ FROM pedido
 WHERE usuario_id = 1
 ORDER BY fecha_pedido DESC;
 
--- 3. Búsqueda por nombre (Usa idx_producto_nombre_lower)
+-- 3. Búsqueda por nombre (Usa idx_producto_nombre_trgm; el B-tree de lower(nombre) no sirve con '%' al inicio)
 -- EXPLAIN ANALYZE
 SELECT nombre, precio
 FROM producto
-WHERE lower(nombre) LIKE lower('%laptop%');
+WHERE nombre ILIKE '%laptop%';
+
+-- 3b. Búsqueda de texto completo con ranking y prefijo (Usa idx_producto_busqueda)
+-- EXPLAIN ANALYZE
+SELECT nombre, precio, ts_rank_cd(busqueda, to_tsquery('spanish', 'lapt:*')) as puntaje
+FROM producto
+WHERE busqueda @@ to_tsquery('spanish', 'lapt:*')
+ORDER BY puntaje DESC, producto_id
+LIMIT 20;
 
 -- 4. Productos con calificaciones altas (Lectura directa, sin JOIN)
 -- EXPLAIN ANALYZE
@@ -546,6 +1150,10 @@ SELECT * FROM mv_metricas_vendedor ORDER BY ingresos_totales DESC;
 -- Para refrescar la vista materializada (ejecutar periódicamente)
 -- REFRESH MATERIALIZED VIEW mv_metricas_vendedor;
 
+-- 6. Reporte de vendedores sin REFRESH (mantenimiento incremental)
+-- EXPLAIN ANALYZE
+SELECT * FROM v_metricas_vendedor ORDER BY ingresos_totales DESC;
+
 -- ============================================================================
 -- FIN DEL ARCHIVO OPTIMIZADO
 -- ============================================================================
\ No newline at end of file